@@ -0,0 +1,24 @@
+/**
+ * FlexSearch document index options
+ * Shared by search.js and the build-time exporter (scraper/export_flexsearch.js),
+ * so a pre-built index always matches the one the browser would build itself.
+ */
+
+const SEARCH_INDEX_OPTIONS = {
+    document: {
+        id: 'id',
+        index: ['title', 'subtitle', 'author', 'content'],
+        store: ['id', 'title', 'author']
+    },
+    tokenize: 'forward',
+    context: {
+        resolution: 9,
+        depth: 3,
+        bidirectional: true
+    },
+    cache: true
+};
+
+if (typeof module !== 'undefined') {
+    module.exports = { SEARCH_INDEX_OPTIONS };
+}
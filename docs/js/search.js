@@ -4,9 +4,12 @@
  */
 
 // Global state
-let searchIndex = null;
+let searchIndexes = [];  // One FlexSearch index per loaded shard, or one for the whole index
 let documentsData = [];
 let metadataMap = {};
+let paragraphIndex = null;
+let paragraphIndexLoad = null;
+let indexSource = null;  // Checksums of the loaded index, to validate derived files
 let isReady = false;
 
 // DOM elements
@@ -22,76 +25,226 @@ const noResultsDiv = document.getElementById('no-results');
 let searchTimeout = null;
 
 /**
- * Initialize search on page load
+ * Fetch a JSON file, failing on HTTP errors
  */
-async function initSearch() {
-    try {
-        console.log('Loading search index...');
+function fetchJSON(url, label) {
+    return fetch(url).then(r => {
+        if (!r.ok) throw new Error(`Failed to load ${label}: ${r.status}`);
+        return r.json();
+    });
+}
 
-        // Load both JSON files in parallel
-        const [indexData, metaData] = await Promise.all([
-            fetch('search-index.json').then(r => {
-                if (!r.ok) throw new Error(`Failed to load search index: ${r.status}`);
-                return r.json();
-            }),
-            fetch('stories-metadata.json').then(r => {
-                if (!r.ok) throw new Error(`Failed to load metadata: ${r.status}`);
-                return r.json();
-            })
-        ]);
+/**
+ * Fetch an optional JSON file (shard manifest, pre-built export), or null
+ */
+function fetchOptionalJSON(url) {
+    return fetch(url)
+        .then(r => r.ok ? r.json() : null)
+        .catch(() => null);
+}
 
-        console.log(`Loaded ${indexData.length} stories`);
+/**
+ * Fetch the paragraph-level inverted index on the first search. It is about as
+ * large as the search index itself, so the page does not wait for it; until it
+ * arrives, snippets come from scanning paragraphs.
+ */
+function loadParagraphIndex() {
+    if (paragraphIndexLoad) return;
 
-        // Store data
-        documentsData = indexData;
+    paragraphIndexLoad = fetchOptionalJSON('paragraph-index.json').then(postings => {
+        if (!postings) return;
 
-        // Create metadata map for quick lookup
-        metaData.forEach(item => {
-            metadataMap[item.id] = item;
-        });
+        // Postings are only usable if built from exactly the loaded index
+        if (!builtFromIndex(postings.source)) {
+            console.warn('Paragraph index is stale, scanning paragraphs instead');
+            return;
+        }
+
+        paragraphIndex = new ParagraphIndex(postings);
+        if (searchInput.value.trim()) {
+            performSearch(searchInput.value.trim());
+        }
+    });
+}
+
+/**
+ * Whether a file's recorded source checksums match the loaded index
+ */
+function builtFromIndex(source) {
+    if (!source || !indexSource) return false;
+    if (indexSource.shards) {
+        return (source.shards || []).join(',') === indexSource.shards.join(',');
+    }
+    return indexSource.sha256 !== null && source.sha256 === indexSource.sha256;
+}
+
+/**
+ * Hex SHA-256 of a buffer, or null where Web Crypto is unavailable
+ */
+async function sha256Hex(buffer) {
+    if (!window.crypto || !window.crypto.subtle) return null;
+
+    const digest = await window.crypto.subtle.digest('SHA-256', buffer);
+    return Array.from(new Uint8Array(digest))
+        .map(b => b.toString(16).padStart(2, '0'))
+        .join('');
+}
+
+/**
+ * Create an empty FlexSearch document index
+ * (options live in search-config.js, shared with the build-time exporter)
+ */
+function createSearchIndex() {
+    return new FlexSearch.Document(SEARCH_INDEX_OPTIONS);
+}
 
-        // Initialize FlexSearch
-        searchIndex = new FlexSearch.Document({
-            document: {
-                id: 'id',
-                index: ['title', 'subtitle', 'author', 'content'],
-                store: ['id', 'title', 'author']
-            },
-            tokenize: 'forward',
-            context: {
-                resolution: 9,
-                depth: 3,
-                bidirectional: true
-            },
-            cache: true
+/**
+ * Import a pre-built index; returns null on failure
+ */
+function importIndex(exported) {
+    const index = createSearchIndex();
+    try {
+        Object.entries(exported.keys).forEach(([key, data]) => {
+            index.import(key, data);
         });
+        return index;
+    } catch (error) {
+        console.warn('Pre-built index could not be imported, re-indexing:', error);
+        return null;
+    }
+}
+
+/**
+ * Add stories to the document store and make them searchable, importing the
+ * pre-built export when one is given
+ */
+function addDocuments(docs, exported = null) {
+    docs.forEach(doc => {
+        documentsData[doc.id] = doc;
+    });
 
-        // Add all documents to index
-        documentsData.forEach(doc => {
+    let index = exported && importIndex(exported);
+    if (!index) {
+        index = createSearchIndex();
+        docs.forEach(doc => {
             // Flatten content array for indexing
             const docForIndex = {
                 ...doc,
                 content: doc.content.join(' ')  // FlexSearch needs string, not array
             };
-            searchIndex.add(docForIndex);
+            index.add(docForIndex);
         });
+    }
+    searchIndexes.push(index);
+}
 
-        console.log('Search index ready');
+/**
+ * Fetch every shard and its pre-built export in parallel, indexing each
+ * shard as it arrives. Resolves once the first shard is searchable.
+ */
+function loadShards(manifest) {
+    const shardLoads = manifest.shards.map(shard => {
+        // The checksum in the query string busts caches when a shard changes
+        const version = `?v=${shard.sha256.slice(0, 12)}`;
+        const exportFile = shard.file.replace(/\.json$/, '.flexsearch.json');
+
+        return Promise.all([
+            fetchJSON(shard.file + version, `shard ${shard.id}`),
+            fetchOptionalJSON(exportFile + version)
+        ]).then(([docs, exported]) => {
+            // The export is fresh if it was built from exactly this shard
+            const fresh = exported && exported.source.sha256 === shard.sha256;
+            addDocuments(docs, fresh ? exported : null);
+            console.log(`Loaded shard ${shard.id} (${docs.length} stories${fresh ? ', pre-built' : ''})`);
+
+            // Refresh visible results as more of the corpus arrives
+            if (isReady && searchInput.value.trim()) {
+                performSearch(searchInput.value.trim());
+            }
+        });
+    });
 
-        // Show search interface
-        loadingDiv.classList.add('hidden');
-        searchInterface.classList.remove('hidden');
-        isReady = true;
+    Promise.allSettled(shardLoads).then(results => {
+        const failed = results.filter(r => r.status === 'rejected');
+        failed.forEach(r => console.error('Failed to load shard:', r.reason));
+    });
+
+    return Promise.any(shardLoads);
+}
+
+/**
+ * Load the unsharded search-index.json together with its pre-built export
+ */
+async function loadIndex() {
+    const [response, exported] = await Promise.all([
+        fetch('search-index.json'),
+        fetchOptionalJSON('flexsearch-index.json')
+    ]);
+    if (!response.ok) throw new Error(`Failed to load search index: ${response.status}`);
+
+    const buffer = await response.arrayBuffer();
+    const indexData = JSON.parse(new TextDecoder().decode(buffer));
+    console.log(`Loaded ${indexData.length} stories`);
+
+    // The export is fresh if it was built from exactly these bytes
+    indexSource = { sha256: await sha256Hex(buffer) };
+    const fresh = exported && builtFromIndex(exported.source);
+    if (exported && !fresh) console.warn('Pre-built index is stale, re-indexing');
+
+    addDocuments(indexData, fresh ? exported : null);
+}
+
+/**
+ * Show the search box and wire up events
+ */
+function showSearchInterface() {
+    loadingDiv.classList.add('hidden');
+    searchInterface.classList.remove('hidden');
+    isReady = true;
+
+    // Focus search input
+    searchInput.focus();
+
+    // Setup event listeners
+    searchInput.addEventListener('input', handleSearchInput);
+    searchInput.addEventListener('keydown', handleKeyboard);
+
+    // Load and display word cloud
+    loadWordCloud();
+}
+
+/**
+ * Initialize search on page load
+ */
+async function initSearch() {
+    try {
+        console.log('Loading search index...');
+
+        // Load the shard manifest (if any) and metadata in parallel
+        const [manifest, metaData] = await Promise.all([
+            fetchOptionalJSON('search-index-manifest.json'),
+            fetchJSON('stories-metadata.json', 'metadata')
+        ]);
+
+        // Create metadata map for quick lookup
+        metaData.forEach(item => {
+            metadataMap[item.id] = item;
+        });
 
-        // Focus search input
-        searchInput.focus();
+        if (manifest) {
+            indexSource = { shards: manifest.shards.map(shard => shard.sha256) };
 
-        // Setup event listeners
-        searchInput.addEventListener('input', handleSearchInput);
-        searchInput.addEventListener('keydown', handleKeyboard);
+            // Start searching as soon as the first shard is in
+            console.log(`Loading ${manifest.stories} stories from ${manifest.shards.length} shards`);
+            await loadShards(manifest);
+        } else {
+            await loadIndex();
+        }
 
-        // Load and display word cloud
-        loadWordCloud();
+        console.log('Search index ready');
+
+        // Show search interface
+        showSearchInterface();
 
     } catch (error) {
         console.error('Failed to initialize search:', error);
@@ -139,9 +292,11 @@ function performSearch(query) {
         return;
     }
 
+    loadParagraphIndex();
+
     try {
         // Search using FlexSearch
-        const searchResults = searchIndex.search(query, {
+        const searchResults = searchAll(query, {
             limit: 100,
             enrich: true
         });
@@ -160,6 +315,167 @@ function performSearch(query) {
     }
 }
 
+/**
+ * Search every loaded index. Each field's results are interleaved by rank, so
+ * no shard's hits all come before another's.
+ */
+function searchAll(query, options) {
+    const fields = new Map();
+    searchIndexes.forEach(index => {
+        index.search(query, options).forEach(({ field, result }) => {
+            if (!fields.has(field)) fields.set(field, []);
+            fields.get(field).push(result);
+        });
+    });
+
+    return Array.from(fields, ([field, lists]) => {
+        const result = [];
+        const longest = Math.max(...lists.map(list => list.length));
+        for (let rank = 0; rank < longest; rank++) {
+            lists.forEach(list => {
+                if (rank < list.length) result.push(list[rank]);
+            });
+        }
+        return { field, result: result.slice(0, options.limit) };
+    });
+}
+
+/**
+ * Paragraph-level inverted index built by scraper/postings.py.
+ * Terms are sorted; each term's postings are base64 varints decoded on first use.
+ */
+class ParagraphIndex {
+    constructor(data) {
+        this.terms = data.terms;
+        this.encoded = data.postings;
+        this.decoded = new Map();
+    }
+
+    /**
+     * Index of the first term >= value
+     */
+    lowerBound(value) {
+        let lo = 0;
+        let hi = this.terms.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1;
+            if (this.terms[mid] < value) lo = mid + 1;
+            else hi = mid;
+        }
+        return lo;
+    }
+
+    /**
+     * Decode one term's postings into [{story, paragraph, positions}]
+     */
+    postingsAt(termIdx) {
+        if (this.decoded.has(termIdx)) return this.decoded.get(termIdx);
+
+        const bytes = Uint8Array.from(atob(this.encoded[termIdx]), c => c.charCodeAt(0));
+        const numbers = [];
+        let value = 0;
+        let shift = 0;
+        for (const byte of bytes) {
+            value += (byte & 0x7f) * 2 ** shift;
+            if (byte & 0x80) {
+                shift += 7;
+            } else {
+                numbers.push(value);
+                value = 0;
+                shift = 0;
+            }
+        }
+
+        const postings = [];
+        let story = 0;
+        let paragraph = 0;
+        for (let i = 0; i < numbers.length;) {
+            const storyDelta = numbers[i++];
+            story += storyDelta;
+            paragraph = storyDelta === 0 && postings.length ? paragraph + numbers[i++] : numbers[i++];
+
+            const positions = [];
+            let position = 0;
+            for (let count = numbers[i++]; count > 0; count--) {
+                position += numbers[i++];
+                positions.push(position);
+            }
+            postings.push({ story, paragraph, positions });
+        }
+
+        this.decoded.set(termIdx, postings);
+        return postings;
+    }
+
+    /**
+     * Postings for a term, or for every term starting with it
+     * (capped, so one-letter prefixes stay cheap)
+     */
+    lookup(term, prefix, maxTerms = 100) {
+        const start = this.lowerBound(term);
+        if (!prefix) {
+            return this.terms[start] === term ? this.postingsAt(start) : [];
+        }
+
+        const postings = [];
+        for (let i = start; i < this.terms.length && i < start + maxTerms; i++) {
+            if (!this.terms[i].startsWith(term)) break;
+            postings.push(...this.postingsAt(i));
+        }
+        return postings;
+    }
+
+    /**
+     * Paragraphs containing the query terms as a phrase, the last one as a prefix
+     * (matching words as they are typed). Returns Map(story id -> paragraph indexes).
+     */
+    search(terms) {
+        // Candidate paragraphs with the positions where the phrase could start
+        let candidates = new Map();
+        this.lookup(terms[0], terms.length === 1).forEach(posting => {
+            const key = `${posting.story}:${posting.paragraph}`;
+            const starts = candidates.get(key) || new Set();
+            posting.positions.forEach(pos => starts.add(pos));
+            candidates.set(key, starts);
+        });
+
+        for (let offset = 1; offset < terms.length && candidates.size; offset++) {
+            const isLast = offset === terms.length - 1;
+            const next = new Map();
+
+            this.lookup(terms[offset], isLast).forEach(posting => {
+                const key = `${posting.story}:${posting.paragraph}`;
+                const starts = candidates.get(key);
+                if (!starts) return;
+
+                const kept = next.get(key) || new Set();
+                posting.positions.forEach(pos => {
+                    if (starts.has(pos - offset)) kept.add(pos - offset);
+                });
+                if (kept.size) next.set(key, kept);
+            });
+
+            candidates = next;
+        }
+
+        const hits = new Map();
+        candidates.forEach((_, key) => {
+            const [story, paragraph] = key.split(':').map(Number);
+            if (!hits.has(story)) hits.set(story, []);
+            hits.get(story).push(paragraph);
+        });
+        hits.forEach(paragraphs => paragraphs.sort((a, b) => a - b));
+        return hits;
+    }
+}
+
+/**
+ * Lowercase word tokens, matching the \\w+ tokenizer in scraper/postings.py
+ */
+function tokenize(text) {
+    return text.toLowerCase().match(/[\p{L}\p{N}_]+/gu) || [];
+}
+
 /**
  * Extract matching paragraphs from search results
  */
@@ -167,6 +483,12 @@ function extractMatches(searchResults, query) {
     const matches = [];
     const queryLower = query.toLowerCase();
 
+    // Jump straight to matching paragraphs via the inverted index when loaded
+    const queryTerms = tokenize(query);
+    const paragraphHits = paragraphIndex && queryTerms.length
+        ? paragraphIndex.search(queryTerms)
+        : null;
+
     // FlexSearch returns array of field results
     // Each field has array of results with doc and result
     const processedIds = new Set();
@@ -189,14 +511,25 @@ function extractMatches(searchResults, query) {
             // Find paragraphs containing the query
             const matchingParagraphs = [];
 
-            doc.content.forEach((paragraph, idx) => {
-                if (paragraph.toLowerCase().includes(queryLower)) {
-                    matchingParagraphs.push({
-                        text: paragraph,
-                        index: idx
-                    });
-                }
-            });
+            if (paragraphHits) {
+                (paragraphHits.get(docId) || []).forEach(idx => {
+                    if (idx < doc.content.length) {
+                        matchingParagraphs.push({
+                            text: doc.content[idx],
+                            index: idx
+                        });
+                    }
+                });
+            } else {
+                doc.content.forEach((paragraph, idx) => {
+                    if (paragraph.toLowerCase().includes(queryLower)) {
+                        matchingParagraphs.push({
+                            text: paragraph,
+                            index: idx
+                        });
+                    }
+                });
+            }
 
             // If no exact matches in content, still show the story (matched in title/author)
             if (matchingParagraphs.length === 0) {
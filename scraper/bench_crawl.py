@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Benchmark the scrapers end to end against a local stand-in for the site
+
+Serves a recorded corpus from the response cache (populate it with
+`python3 scrape_all.py --cache`) on localhost: archive, tag page, sitemaps and
+/p/ story pages, with the recorded origin rewritten to the local one so every
+link stays offline. Without a cache, or with --from-index, the corpus is
+synthesized from docs/search-index.json instead: one story page per indexed
+story plus a tag page, archive page and sitemap linking them, so the benchmark
+runs the same on any checkout. Latency can be added to every request, and 429s
+and server errors to story requests. Each scraper then runs scrape_all() in
+its own process, and the harness reports pages/s, p50/p99 story fetch and
+parse times, and peak RSS. Only fetching and parsing the stories is timed:
+discovery runs first, and the scraped stories are counted, not indexed.
+
+--save writes the results as JSON; --baseline compares against a saved run
+and exits with status 1 if any scraper got slower or bigger than --tolerance
+allows, so the benchmark can gate scraper performance changes.
+
+Usage:
+    python3 bench_crawl.py
+    python3 bench_crawl.py --latency 50 --throttle 0.05 --fail 0.02 --workers 8
+    python3 bench_crawl.py --save bench.json
+    python3 bench_crawl.py --from-index --save bench.json
+    python3 bench_crawl.py --baseline bench.json
+"""
+
+import argparse
+import contextlib
+import html
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from xml.sax.saxutils import escape
+
+from discovery import DEFAULT_BASE_URL
+from html_cache import DEFAULT_CACHE_DIR, HtmlCache
+from instrumentation import percentile
+
+try:
+    import resource
+except ImportError:  # Not on Windows; peak RSS is reported as n/a
+    resource = None
+
+SCRAPERS = ('scrape', 'scrape_all')
+
+DEFAULT_INDEX_PATH = os.path.join('..', 'docs', 'search-index.json')
+
+# Metrics compared against a baseline, and whether higher is better
+GATED_METRICS = {
+    'pages_per_sec': True,
+    'fetch_p99_ms': False,
+    'parse_p99_ms': False,
+    'peak_rss_mb': False,
+}
+
+# (status, headers, body)
+Page = Tuple[int, Dict[str, str], bytes]
+
+
+def load_corpus(cache_dir: str, origin: Optional[str] = None) -> Tuple[str, Dict[str, Page]]:
+    """Recorded pages of one origin, keyed by path and query
+
+    Returns the origin and its pages; bodies are rewritten to the local origin
+    later, once the server's port is known.
+    """
+    cache = HtmlCache(cache_dir)
+    origins = Counter('{0.scheme}://{0.netloc}'.format(urlsplit(url)) for url in cache._latest)
+    if origin is None:
+        origin = DEFAULT_BASE_URL if DEFAULT_BASE_URL in origins else (origins.most_common(1) or [('', 0)])[0][0]
+
+    pages = {}
+    for url in cache._latest:
+        parts = urlsplit(url)
+        if f"{parts.scheme}://{parts.netloc}" == origin:
+            response = cache.lookup(url)
+            key = parts.path + (f"?{parts.query}" if parts.query else '')
+            # Bodies are rewritten, so only the content type of the recorded headers still holds
+            headers = {'Content-Type': response.headers['Content-Type']} if 'Content-Type' in response.headers else {}
+            pages[key] = (response.status_code, headers, response.content)
+
+    return origin, pages
+
+
+def _story_page(story: Dict, meta: Dict) -> bytes:
+    """A story page in the site's markup, with the fields the extractors read"""
+    authors = ''.join(f'<a class="pencraft-author-name">{html.escape(name)}</a>'
+                      for name in meta.get('author', '').split(', ') if name and name != 'Unknown')
+    date = f'<time datetime="{html.escape(meta["date"])}">{html.escape(meta["date"])}</time>' if meta.get('date') else ''
+    subtitle = f'<h3 class="subtitle">{html.escape(story["subtitle"])}</h3>' if story.get('subtitle') else ''
+    paragraphs = ''.join(f'<p>{html.escape(text)}</p>' for text in story['content'])
+    tags = ''.join(f'<a class="post-tag">{html.escape(tag)}</a>' for tag in story.get('tags', []))
+
+    return (f'<!DOCTYPE html><html><head><title>{html.escape(story["title"])}</title></head><body>'
+            f'<article class="post"><div class="post-header"><h1 class="post-title">{html.escape(story["title"])}</h1>'
+            f'{subtitle}<div class="byline-wrapper">{authors}{date}</div></div>'
+            f'<div class="available-content"><div class="body markup">{paragraphs}</div></div>'
+            f'<div class="post-footer">{tags}</div></article></body></html>').encode('utf-8')
+
+
+def synthesize_corpus(index_path: str = DEFAULT_INDEX_PATH) -> Tuple[str, Dict[str, Page]]:
+    """Pages of a stand-in site rebuilt from search-index.json and its metadata
+
+    Story URLs come from stories-metadata.json beside the index (or
+    /p/story-<id> without it); links point at the live origin, which the
+    server rewrites like a recorded corpus.
+    """
+    with open(index_path, 'r', encoding='utf-8') as f:
+        stories = json.load(f)
+
+    metadata_path = os.path.join(os.path.dirname(index_path), 'stories-metadata.json')
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = {item['id']: item for item in json.load(f)}
+
+    html_type = {'Content-Type': 'text/html; charset=utf-8'}
+    pages: Dict[str, Page] = {}
+    for story in stories:
+        meta = metadata.get(story['id'], {})
+        path = urlsplit(meta.get('url', '')).path
+        if not path.startswith('/p/'):
+            path = f"/p/story-{story['id']}"
+        pages[path] = (200, html_type, _story_page(story, meta))
+
+    story_paths = sorted(pages)
+    links = ''.join(f'<a class="post-preview-title" href="{DEFAULT_BASE_URL}{path}">{path}</a>'
+                    for path in story_paths)
+    listing = f'<!DOCTYPE html><html><body><div class="portable-archive-list">{links}</div></body></html>'
+    pages['/t/stories'] = pages['/archive'] = (200, html_type, listing.encode('utf-8'))
+
+    urls = ''.join(f'<url><loc>{escape(DEFAULT_BASE_URL + path)}</loc></url>' for path in story_paths)
+    sitemap = ('<?xml version="1.0" encoding="UTF-8"?>'
+               f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+    pages['/sitemap.xml'] = (200, {'Content-Type': 'application/xml'}, sitemap.encode('utf-8'))
+
+    return DEFAULT_BASE_URL, pages
+
+
+class Faults:
+    """Injected latency and errors, drawn from a seeded generator"""
+
+    def __init__(self, latency_ms: float = 0.0, throttle: float = 0.0, fail: float = 0.0,
+                 retry_after: int = 1, seed: int = 0):
+        self.latency = latency_ms / 1000
+        self.throttle = throttle
+        self.fail = fail
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self, is_story: bool) -> Tuple[float, Optional[int]]:
+        """(delay in seconds, injected status or None) for one request"""
+        with self._lock:
+            # Latency varies +-50% around the mean
+            delay = self.latency * self._random.uniform(0.5, 1.5)
+            roll = self._random.random()
+
+        if is_story and roll < self.throttle:
+            return delay, 429
+        if is_story and roll < self.throttle + self.fail:
+            return delay, 500
+        return delay, None
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves the recorded corpus, with faults"""
+
+    def do_GET(self):
+        server = self.server
+        delay, injected = server.faults.draw('/p/' in self.path)
+        time.sleep(delay)
+
+        page = server.pages.get(self.path)
+        status = injected or (page[0] if page else 404)
+        with server.lock:
+            server.statuses[status] += 1
+
+        self.send_response(status)
+        if injected == 429:
+            self.send_header('Retry-After', str(server.faults.retry_after))
+
+        body = page[2] if page and not injected else b''
+        if body and 'Content-Type' in page[1]:
+            self.send_header('Content-Type', page[1]['Content-Type'])
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Local HTTP server standing in for the Substack site"""
+
+    daemon_threads = True
+
+    def __init__(self, origin: str, pages: Dict[str, Page], faults: Faults):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.faults = faults
+        self.lock = threading.Lock()
+        self.statuses: Counter = Counter()
+
+        # Links, sitemaps and canonical URLs must all point back here
+        old, new = origin.encode(), self.base_url.encode()
+        self.pages = {path: (status, headers, body.replace(old, new))
+                      for path, (status, headers, body) in pages.items()}
+
+    def take_statuses(self) -> Counter:
+        with self.lock:
+            statuses, self.statuses = self.statuses, Counter()
+        return statuses
+
+
+class TimedFetcher:
+    """Records how long each story page request takes"""
+
+    def __init__(self, fetcher, times: List[float]):
+        self.fetcher = fetcher
+        self.times = times
+
+    def get(self, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.fetcher.get(url, **kwargs)
+        finally:
+            if '/p/' in url:
+                self.times.append(time.perf_counter() - start)
+
+    def close(self) -> None:
+        self.fetcher.close()
+
+
+class TimedParser:
+    """Records how long each story page takes to parse and extract"""
+
+    def __init__(self, parser, times: List[float]):
+        self.parser = parser
+        self.times = times
+
+    def __call__(self, content: bytes, url: str):
+        start = time.perf_counter()
+        try:
+            return self.parser(content, url)
+        finally:
+            self.times.append(time.perf_counter() - start)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process and its finished children"""
+    if resource is None:
+        return None
+
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def run_scraper(name: str, base_url: str, options: Dict, verbose: bool) -> Dict:
+    """Run one scraper's scrape_all() and time its fetch and parse (in a fresh process)"""
+    output_dir = tempfile.mkdtemp(prefix='bench-crawl-')
+    fetch_times: List[float] = []
+    parse_times: List[float] = []
+
+    if name == 'scrape':
+        from scrape import ProtocolizedScraper
+        scraper = ProtocolizedScraper(limit=options['limit'], rate=options['rate'],
+                                      output_dir=output_dir, base_url=base_url)
+    else:
+        from scrape_all import ProtocolizedScraperEnhanced
+        scraper = ProtocolizedScraperEnhanced(limit=options['limit'], workers=options['workers'],
+                                              rate=options['rate'], parse_workers=options['parse_workers'],
+                                              output_dir=output_dir, base_url=base_url)
+
+    # Time the HTTP backend itself, not waits in the rate limiter
+    scraper.fetcher.fetcher = TimedFetcher(scraper.fetcher.fetcher, fetch_times)
+    # Pages parsed in worker processes cannot report back their times
+    if not getattr(scraper, 'parse_workers', 0):
+        scraper.story_parser = TimedParser(scraper.story_parser, parse_times)
+
+    # Stories stream out of lazy generators, so draining them instead of
+    # writing the index times exactly the fetching and parsing
+    crawl_seconds: List[float] = []
+
+    def count_stories(stories) -> int:
+        start = time.perf_counter()
+        scraped = sum(1 for _ in stories)
+        crawl_seconds.append(time.perf_counter() - start)
+        return scraped
+
+    scraper.build_index = count_stories
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            stories = scraper.scrape_all()  # Number scraped
+            elapsed = crawl_seconds[0] if crawl_seconds else 0.0
+    finally:
+        scraper.close()
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    def ms(times: List[float], pct: float) -> Optional[float]:
+        return round(percentile(times, pct) * 1000, 2) if times else None
+
+    return {
+        'stories': stories,
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(stories / elapsed, 2) if elapsed else 0.0,
+        'fetch_p50_ms': ms(fetch_times, 50),
+        'fetch_p99_ms': ms(fetch_times, 99),
+        'parse_p50_ms': ms(parse_times, 50),
+        'parse_p99_ms': ms(parse_times, 99),
+        'peak_rss_mb': round(_peak_rss_mb(), 1) if resource else None,
+    }
+
+
+def _child(queue, *args) -> None:
+    queue.put(run_scraper(*args))
+
+
+def run_in_process(name: str, base_url: str, options: Dict, verbose: bool) -> Dict:
+    """run_scraper in a spawned process, so each peak RSS is its own"""
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(queue, name, base_url, options, verbose))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _fmt(value: Optional[float], width: int, digits: int = 1) -> str:
+    return f"{value:{width}.{digits}f}" if value is not None else f"{'n/a':>{width}}"
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Metrics that regressed by more than tolerance against the baseline"""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, higher_is_better in GATED_METRICS.items():
+            old, new = baseline.get(name, {}).get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+
+            change = (new - old) / old
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append(f"{name} {metric}: {new} vs {old} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scrapers against a local copy of the site')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Response cache to serve pages from')
+    parser.add_argument('--from-index', nargs='?', const=DEFAULT_INDEX_PATH, metavar='PATH',
+                        help='Synthesize the pages from a search-index.json instead of the cache '
+                             f'(default {DEFAULT_INDEX_PATH}; also used when the cache has no stories)')
+    parser.add_argument('--origin', help='Recorded origin to serve (default: the live site, or the most cached)')
+    parser.add_argument('--scrapers', nargs='+', choices=SCRAPERS, default=list(SCRAPERS), help='Scrapers to run')
+    parser.add_argument('--limit', type=int, help='Stories per scraper')
+    parser.add_argument('--workers', type=int, default=4, help='Fetch threads for scrape_all')
+    parser.add_argument('--parse-workers', type=int, default=0, help='Parse processes for scrape_all')
+    parser.add_argument('--rate', type=float, default=100.0, help='Scraper rate limit (requests per second)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Mean added latency per request (ms)')
+    parser.add_argument('--throttle', type=float, default=0.0, help='Fraction of story requests answered 429')
+    parser.add_argument('--fail', type=float, default=0.0, help='Fraction of story requests answered 500')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for injected latency and faults')
+    parser.add_argument('--save', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against results saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative regression before failing (with --baseline)')
+    parser.add_argument('--verbose', action='store_true', help='Show the scrapers\' own output')
+    args = parser.parse_args()
+
+    source = None
+    if not args.from_index:
+        origin, pages = load_corpus(args.cache_dir, args.origin)
+        source = f"recorded from {origin}"
+        if not any(path.startswith('/p/') for path in pages):
+            print(f"⚠️  No cached story pages in {args.cache_dir}, synthesizing them from {DEFAULT_INDEX_PATH}")
+            source = None
+
+    if source is None:
+        index_path = args.from_index or DEFAULT_INDEX_PATH
+        if not os.path.exists(index_path):
+            print(f"❌ No cached story pages and no {index_path} (run scrape_all.py --cache first)")
+            sys.exit(1)
+        origin, pages = synthesize_corpus(index_path)
+        source = f"synthesized from {index_path}"
+
+    story_pages = sum(1 for path in pages if path.startswith('/p/'))
+
+    faults = Faults(args.latency, args.throttle, args.fail, args.retry_after, args.seed)
+    server = StandInServer(origin, pages, faults)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"⏱️  Serving {len(pages)} pages ({story_pages} stories) {source} on {server.base_url}")
+    print(f"   latency {args.latency:g} ms, {args.throttle:.0%} 429s, {args.fail:.0%} failures\n")
+    print(f"   {'scraper':11} {'stories':>7} {'wall s':>7} {'pages/s':>8} {'fetch p50/p99 ms':>17} "
+          f"{'parse p50/p99 ms':>17} {'requests':>8} {'429':>4} {'5xx':>4} {'peak RSS':>9}")
+
+    options = {'limit': args.limit, 'workers': args.workers, 'parse_workers': args.parse_workers,
+               'rate': args.rate}
+    results = {}
+    try:
+        for name in args.scrapers:
+            metrics = run_in_process(name, server.base_url, options, args.verbose)
+            statuses = server.take_statuses()
+            metrics['requests'] = sum(statuses.values())
+            metrics['throttled'] = statuses[429]
+            metrics['server_errors'] = sum(count for status, count in statuses.items() if status >= 500)
+            results[name] = metrics
+
+            print(f"   {name:11} {metrics['stories']:7} {metrics['seconds']:7.2f} {metrics['pages_per_sec']:8.1f} "
+                  f"{_fmt(metrics['fetch_p50_ms'], 8)}/{_fmt(metrics['fetch_p99_ms'], 8)} "
+                  f"{_fmt(metrics['parse_p50_ms'], 8)}/{_fmt(metrics['parse_p99_ms'], 8)} "
+                  f"{metrics['requests']:8} {metrics['throttled']:4} {metrics['server_errors']:4} "
+                  f"{_fmt(metrics['peak_rss_mb'], 6)} MB")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'options': vars(args), 'results': results}, f, indent=2)
+        print(f"\n💾 Saved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ Regressed by more than {args.tolerance:.0%} against {args.baseline}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"\n✅ Within {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
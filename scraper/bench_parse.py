@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark HTML parser backends on a saved corpus of story pages
+
+Reads story pages from the response cache (populate it with
+`python3 scrape_all.py --cache`), then parses and extracts every page with each
+parser backend, with and without the targeted story strainer, using the
+single-pass StoryExtractor. Results are checked against a baseline of
+html.parser, full tree and the per-field selectors of extract_reference.py.
+"""
+
+import argparse
+import time
+from typing import Dict, List, Optional
+
+from extract_reference import SelectorExtractor
+from html_cache import DEFAULT_CACHE_DIR, HtmlCache
+from parsing import PARSERS, parse_html
+from scrape_all import ProtocolizedScraperEnhanced
+
+
+def extract(scraper: ProtocolizedScraperEnhanced, content: bytes, parser: str, targeted: bool,
+            single_pass: bool = True) -> Dict:
+    """Parse one page and extract every field from it"""
+    soup = parse_html(content, parser, targeted=targeted)
+    if single_pass:
+        return scraper.extractor.extract(soup, scraper._is_valid_paragraph)
+
+    # Reference path: one selector pass per field
+    return SelectorExtractor.for_scraper(scraper).extract(soup, scraper._is_valid_paragraph)
+
+
+def run(pages: List[bytes], scraper, parser: str, targeted: bool,
+        baseline: Optional[List[Dict]]) -> Optional[List[Dict]]:
+    """Time one backend/mode over the corpus and print a result row"""
+    single_pass = baseline is not None
+    try:
+        start = time.perf_counter()
+        results = [extract(scraper, page, parser, targeted, single_pass) for page in pages]
+        elapsed = time.perf_counter() - start
+    except Exception as e:  # Backend not installed (bs4.FeatureNotFound)
+        print(f"   {parser:12} {'targeted' if targeted else 'full':9} {'one-pass' if single_pass else 'selectors':9} "
+              f"skipped: {e}")
+        return None
+
+    mismatches = 0
+    if baseline is not None:
+        mismatches = sum(1 for a, b in zip(results, baseline) if a != b)
+
+    print(f"   {parser:12} {'targeted' if targeted else 'full':9} {'one-pass' if single_pass else 'selectors':9} "
+          f"{elapsed * 1000:8.1f} ms  {len(pages) / elapsed:8.1f} pages/s  "
+          f"{mismatches} mismatches")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTML parser backends')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Response cache directory')
+    parser.add_argument('--repeat', type=int, default=1, help='Parse the corpus this many times')
+    args = parser.parse_args()
+
+    cache = HtmlCache(args.cache_dir)
+    story_urls = sorted(url for url in cache._latest if '/p/' in url)
+    pages = [cache.lookup(url).content for url in story_urls] * args.repeat
+
+    if not pages:
+        print(f"❌ No cached story pages in {args.cache_dir} (run scrape_all.py --cache first)")
+        return
+
+    print(f"⏱️  Parsing {len(pages)} pages ({sum(map(len, pages)) / 1024:.0f} KB)")
+
+    scraper = ProtocolizedScraperEnhanced(replay=True, cache_dir=args.cache_dir)
+    baseline = run(pages, scraper, 'html.parser', False, None)
+
+    for backend in PARSERS:
+        for targeted in (False, True):
+            run(pages, scraper, backend, targeted, baseline)
+
+
+if __name__ == '__main__':
+    main()
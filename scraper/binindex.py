@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Binary columnar search index for memory-mapped, read-only use
+
+search-index.json has to be parsed into Python objects by every process that
+searches it. search-index.bin holds the same stories plus ready-made postings
+in flat little-endian arrays, so MmapIndex can map the file and read terms,
+postings and paragraphs straight out of the page cache. Opening it is O(1),
+and worker processes on one machine share a single copy of it.
+
+Layout (every section starts on an 8-byte boundary):
+
+    header     magic, version, story count, field count,
+               per-field average length, then (offset, size) of each section
+    strings    story slot starts (u32), string offsets (u64), UTF-8 blob;
+               each story's slots are title, subtitle, author, url, date,
+               tags (JSON) and then one per paragraph
+    per field  token counts per story (u32), term offsets (u32), term blob
+               (sorted UTF-8), postings offsets (u64), postings blob
+
+Postings use the varint encoding from postings.py.
+"""
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Sequence, Union
+
+from postings import FIELDS, Posting, PostingsBuilder, decode_postings
+from records import Story
+
+BINARY_INDEX_NAME = 'search-index.bin'
+
+MAGIC = b'PSIB'
+VERSION = 1
+
+# Fixed string slots before a story's paragraphs
+STORY_SLOTS = ('title', 'subtitle', 'author', 'url', 'date', 'tags')
+
+_HEADER = struct.Struct('<4sIII')
+_SECTION = struct.Struct('<QQ')
+
+
+def _to_bytes(values: array) -> bytes:
+    """Array contents in little-endian byte order"""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class BinaryIndexBuilder:
+    """Collects stories in id order and writes search-index.bin"""
+
+    def __init__(self, content_postings: PostingsBuilder):
+        # Content postings are shared with the paragraph index
+        self.postings = {field: PostingsBuilder() for field in FIELDS if field != 'content'}
+        self.postings['content'] = content_postings
+        self.lengths = {field: array('I') for field in FIELDS}
+
+        self.story_slots = array('I', [0])
+        self.string_offsets = array('Q', [0])
+        self.strings = bytearray()
+
+    def _add_string(self, text: str) -> None:
+        self.strings += text.encode('utf-8')
+        self.string_offsets.append(len(self.strings))
+
+    def add(self, story_id: int, story: Story, content: List[str], content_tokens: int) -> None:
+        """Add one story; its content must already be in the shared postings"""
+        for field in ('title', 'subtitle', 'author'):
+            self.lengths[field].append(self.postings[field].add(story_id, [getattr(story, field)]))
+        self.lengths['content'].append(content_tokens)
+
+        for slot in STORY_SLOTS:
+            value = getattr(story, slot)
+            self._add_string(json.dumps(value, ensure_ascii=False) if slot == 'tags' else value)
+        for paragraph in content:
+            self._add_string(paragraph)
+
+        self.story_slots.append(len(self.string_offsets) - 1)
+
+    def write(self, path: str) -> None:
+        """Write the index file"""
+        stories = len(self.story_slots) - 1
+        sections: List[bytes] = [
+            _to_bytes(self.story_slots),
+            _to_bytes(self.string_offsets),
+            bytes(self.strings),
+        ]
+
+        averages = []
+        for field in FIELDS:
+            lengths = self.lengths[field]
+            averages.append(sum(lengths) / stories if stories else 0.0)
+
+            term_offsets = array('I', [0])
+            term_blob = bytearray()
+            postings_offsets = array('Q', [0])
+            postings_blob = bytearray()
+            for term, data in self.postings[field].encoded():
+                term_blob += term.encode('utf-8')
+                term_offsets.append(len(term_blob))
+                postings_blob += data
+                postings_offsets.append(len(postings_blob))
+
+            sections += [
+                _to_bytes(lengths),
+                _to_bytes(term_offsets),
+                bytes(term_blob),
+                _to_bytes(postings_offsets),
+                bytes(postings_blob),
+            ]
+
+        header = _HEADER.pack(MAGIC, VERSION, stories, len(FIELDS)) + struct.pack(f'<{len(FIELDS)}d', *averages)
+        offset = len(header) + 4 + _SECTION.size * len(sections)
+
+        directory = []
+        for section in sections:
+            offset += -offset % 8
+            directory.append((offset, len(section)))
+            offset += len(section)
+
+        with open(path, 'wb') as f:
+            f.write(header)
+            f.write(struct.pack('<I', len(sections)))
+            for section_offset, size in directory:
+                f.write(_SECTION.pack(section_offset, size))
+
+            for section, (section_offset, _) in zip(sections, directory):
+                f.write(b'\0' * (section_offset - f.tell()))
+                f.write(section)
+
+
+class StringTable(Sequence):
+    """Strings read on demand from an offsets array and a UTF-8 blob"""
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return str(self._blob[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+
+class MmapIndex:
+    """Read-only view of search-index.bin with the InvertedIndex interface"""
+
+    def __init__(self, path: str, cache_terms: int = 4096):
+        if sys.byteorder != 'little':
+            raise ValueError("search-index.bin can only be mapped on little-endian hosts")
+
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Every view of the mapping, so close() can release them before unmapping
+        self._views: List[memoryview] = []
+        try:
+            self._map_sections(path)
+        except Exception:
+            self.close()
+            raise
+
+        # Frequently searched terms are decoded once per process
+        self._decode = lru_cache(maxsize=cache_terms)(self._decode_postings)
+
+    def _view(self, view: memoryview) -> memoryview:
+        self._views.append(view)
+        return view
+
+    def _map_sections(self, path: str) -> None:
+        buf = self._view(memoryview(self._mmap))
+
+        magic, version, stories, field_count = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION or field_count != len(FIELDS):
+            raise ValueError(f"{path} is not a version {VERSION} binary search index")
+
+        offset = _HEADER.size
+        averages = struct.unpack_from(f'<{field_count}d', buf, offset)
+        offset += 8 * field_count
+
+        (section_count,) = struct.unpack_from('<I', buf, offset)
+        offset += 4
+        sections = []
+        for i in range(section_count):
+            section_offset, size = _SECTION.unpack_from(buf, offset + i * _SECTION.size)
+            if section_offset + size > len(buf):
+                raise ValueError(f"{path} is truncated")
+            sections.append(self._view(buf[section_offset:section_offset + size]))
+        if len(sections) != 3 + 5 * len(FIELDS):
+            raise ValueError(f"{path} has {len(sections)} sections, expected {3 + 5 * len(FIELDS)}")
+
+        self._num_stories = stories
+        self._story_slots = self._view(sections[0].cast('I'))
+        self._strings = StringTable(self._view(sections[1].cast('Q')), sections[2])
+
+        self._lengths: Dict[str, memoryview] = {}
+        self._terms: Dict[str, StringTable] = {}
+        self._postings_offsets: Dict[str, memoryview] = {}
+        self._postings_blobs: Dict[str, memoryview] = {}
+        self._avg_lengths = dict(zip(FIELDS, averages))
+
+        for i, field in enumerate(FIELDS):
+            lengths, term_offsets, term_blob, postings_offsets, postings_blob = sections[3 + 5 * i:8 + 5 * i]
+            self._lengths[field] = self._view(lengths.cast('I'))
+            self._terms[field] = StringTable(self._view(term_offsets.cast('I')), term_blob)
+            self._postings_offsets[field] = self._view(postings_offsets.cast('Q'))
+            self._postings_blobs[field] = postings_blob
+
+    def close(self) -> None:
+        """Unmap the file; the index can't be read afterwards"""
+        if hasattr(self, '_decode'):
+            self._decode.cache_clear()
+        # Casts and slices first, the view of the whole mapping last
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    @property
+    def num_stories(self) -> int:
+        return self._num_stories
+
+    def terms(self, field: str) -> StringTable:
+        """Every term in a field, sorted (decoded lazily)"""
+        return self._terms[field]
+
+    def postings(self, field: str, term: str) -> List[Posting]:
+        """Postings for one exact term, in story and paragraph order"""
+        terms = self._terms[field]
+        i = bisect_left(terms, term)
+        if i == len(terms) or terms[i] != term:
+            return []
+
+        return self._decode(field, i)
+
+    def _decode_postings(self, field: str, i: int) -> List[Posting]:
+        offsets = self._postings_offsets[field]
+        return decode_postings(bytes(self._postings_blobs[field][offsets[i]:offsets[i + 1]]))
+
+    def field_length(self, field: str, story_id: int) -> int:
+        """Number of tokens in one story's field"""
+        return self._lengths[field][story_id]
+
+    def avg_field_length(self, field: str) -> float:
+        return self._avg_lengths[field]
+
+    def story(self, story_id: int) -> Dict:
+        """One story's fields, decoded from the string table"""
+        first, end = self._story_slots[story_id], self._story_slots[story_id + 1]
+        values = self._strings[first:first + len(STORY_SLOTS)]
+
+        story = dict(zip(STORY_SLOTS, values))
+        story['id'] = story_id
+        story['tags'] = json.loads(story['tags'])
+        story['content'] = self._strings[first + len(STORY_SLOTS):end]
+        return story
+
+    def paragraph(self, story_id: int, paragraph_idx: int) -> str:
+        first = self._story_slots[story_id] + len(STORY_SLOTS)
+        if not 0 <= paragraph_idx < self._story_slots[story_id + 1] - first:
+            raise IndexError(paragraph_idx)
+        return self._strings[first + paragraph_idx]
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Persistent crawl state for incremental scraping
+
+Records each story URL's ETag, Last-Modified and content hash together with the
+story dict extracted from it, so later runs can send conditional GETs and skip
+re-parsing pages that have not changed.
+
+The sitemap's <lastmod> for the URL is stored too. When this run's sitemap
+gives a lastmod that has not advanced past the stored one, the stored story is
+used without requesting the page at all.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Union
+
+from records import Story
+
+DEFAULT_STATE_PATH = '../crawl-state.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    story TEXT,
+    fetched_at REAL,
+    checked_at REAL,
+    lastmod TEXT
+)
+"""
+
+# Columns added since the first schema, for databases created before them
+MIGRATIONS = {
+    'lastmod': 'ALTER TABLE pages ADD COLUMN lastmod TEXT',
+}
+
+
+def content_hash(content: bytes) -> str:
+    """Stable hash of a response body"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Parse a sitemap W3C datetime (a date, or a date and time); None if invalid"""
+    if not value:
+        return None
+
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+    # Dates and times without an offset are taken as UTC
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class CrawlState:
+    """SQLite-backed store of per-URL validators and extracted stories"""
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()  # Scraper workers share one connection and the counters
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+        self.start_run()
+
+    def start_run(self) -> None:
+        """Forget the previous run's sitemap lastmods and zero the per-run counters"""
+        # Sitemap lastmod of each URL seen this run, set by the scraper
+        self.lastmods: Dict[str, str] = {}
+
+        self.skipped = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.updated = 0
+
+    def _migrate(self) -> None:
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(pages)')}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                self._conn.execute(statement)
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return the stored row for a URL, or None if never crawled"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etag, last_modified, content_hash, story, lastmod FROM pages WHERE url = ?',
+                (url,),
+            ).fetchone()
+
+        if not row:
+            return None
+
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'content_hash': row[2],
+            'story': Story.from_dict(json.loads(row[3])) if row[3] else None,
+            'lastmod': row[4],
+        }
+
+    def fresh_story(self, url: str) -> Optional[Story]:
+        """Return the stored story if the sitemap lastmod has not advanced since it was fetched"""
+        lastmod = parse_lastmod(self.lastmods.get(url))
+        if lastmod is None:
+            return None
+
+        entry = self.get(url)
+        if not entry or not entry['story']:
+            return None
+
+        stored = parse_lastmod(entry['lastmod'])
+        if stored is None or lastmod > stored:
+            return None
+
+        self._touch(url)
+        with self._lock:
+            self.skipped += 1
+        return entry['story']
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Build If-None-Match / If-Modified-Since headers for a known URL"""
+        entry = self.get(url)
+        if not entry or not entry['story']:
+            return {}
+
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        return headers
+
+    def unchanged_story(self, url: str, response) -> Optional[Story]:
+        """Return the stored story if the response shows the page has not changed"""
+        entry = self.get(url)
+        if not entry or not entry['story']:
+            return None
+
+        if response.status_code == 304:
+            self._touch(url)
+            with self._lock:
+                self.not_modified += 1
+            return entry['story']
+
+        if response.status_code == 200 and entry['content_hash'] == content_hash(response.content):
+            # Same bytes without validator support: refresh validators, skip parsing
+            self._store(url, response, entry['story'])
+            with self._lock:
+                self.unchanged += 1
+            return entry['story']
+
+        return None
+
+    def save(self, url: str, response, story: Union[Story, Dict]) -> None:
+        """Store validators, content hash and the extracted story for a URL"""
+        self._store(url, response, story)
+        with self._lock:
+            self.updated += 1
+
+    def _store(self, url: str, response, story: Union[Story, Dict]) -> None:
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pages '
+                '(url, etag, last_modified, content_hash, story, fetched_at, checked_at, lastmod) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    url,
+                    response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'),
+                    content_hash(response.content),
+                    json.dumps(Story.coerce(story).to_dict(), ensure_ascii=False),
+                    now,
+                    now,
+                    self.lastmods.get(url),
+                ),
+            )
+            self._conn.commit()
+
+    def _touch(self, url: str) -> None:
+        """Record that a URL was revalidated without changes"""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE pages SET checked_at = ?, lastmod = COALESCE(?, lastmod) WHERE url = ?',
+                (time.time(), self.lastmods.get(url), url),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
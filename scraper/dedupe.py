@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate paragraph detection for the index build
+
+Substack pages repeat footers, series intros, pull quotes and cross-posted
+blurbs that read like story text and so get past the boilerplate filter. Every
+paragraph gets a 64-bit SimHash of its word 3-grams; paragraphs whose
+fingerprints differ in at most max_distance bits are near-duplicates.
+
+Fingerprints are split into max_distance + 1 bands. Two fingerprints within
+max_distance bits of each other must agree exactly on at least one band, so
+each paragraph is only compared with the earlier ones sharing a band bucket,
+and a pass over the whole corpus stays roughly linear.
+
+The copy in the earliest-dated story is kept (undated stories count as
+newest, and the URL breaks ties), so a story keeps its own lead paragraph when
+a later story cross-posts it, whatever order the index lists them in. A
+paragraph is a duplicate only if it matches one from a different story; a line
+repeated within a single story is left alone.
+
+Usage:
+    python3 dedupe.py                    # report duplicates in ../docs/search-index.json
+    python3 dedupe.py --max-distance 5 --show 20
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from postings import tokenize
+from records import Story
+
+FINGERPRINT_BITS = 64
+
+
+def _feature_hash(feature: str) -> str:
+    """Stable 64-bit hash of one feature, as a string of bits"""
+    digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+    return format(int.from_bytes(digest, 'little'), '064b')
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """64-bit SimHash of the text's lowercase word n-grams"""
+    words = tokenize(text)
+    if len(words) > shingle:
+        features = [' '.join(words[i:i + shingle]) for i in range(len(words) - shingle + 1)]
+    else:
+        features = [' '.join(words)]
+
+    # Bit j is set when most features have it set; columns of the bit strings count the votes
+    bits = [_feature_hash(feature) for feature in features]
+    half = len(bits) / 2
+    fingerprint = 0
+    for column in zip(*bits):
+        fingerprint = (fingerprint << 1) | (column.count('1') > half)
+    return fingerprint
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def _age_key(story: Story) -> Tuple[bool, str, str]:
+    """Oldest first, undated stories last, URL breaking ties"""
+    return (not story.date, story.date, story.url)
+
+
+class ParagraphDeduper:
+    """Drops (or just counts) paragraphs already seen in an older story
+
+    Pass every story to scan() first, then feed them in index order through
+    filter(); it returns the paragraphs to write. Without scan(), the first
+    copy in the order filter() sees them is kept. With drop=False everything is
+    kept and only the statistics are gathered, to preview what deduplication
+    would remove.
+    """
+
+    def __init__(self, max_distance: int = 3, shingle: int = 3, drop: bool = True):
+        self.max_distance = max_distance
+        self.shingle = shingle
+        self.drop = drop
+
+        bands = max_distance + 1
+        self._band_bits = FINGERPRINT_BITS // bands
+        self._band_mask = (1 << self._band_bits) - 1
+        self._bands = bands
+
+        # paragraph hash -> first story id, for exact repeats
+        self._exact: Dict[int, int] = {}
+        # per band: band value -> [(fingerprint, story id)]
+        self._buckets: List[Dict[int, List[Tuple[int, int]]]] = [{} for _ in range(bands)]
+
+        # (story id, paragraph index) of every duplicate, once scanned
+        self._dropped: Optional[Set[Tuple[int, int]]] = None
+
+        # Statistics
+        self.paragraphs = 0
+        self.exact = 0
+        self.near = 0
+        self.bytes_saved = 0
+        self.duplicates: List[Tuple[int, int, str]] = []  # (story id, paragraph index, text)
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        return [(fingerprint >> (band * self._band_bits)) & self._band_mask for band in range(self._bands)]
+
+    def _near_match(self, story_id: int, fingerprint: int, keys: List[int]) -> bool:
+        """Whether a paragraph from another story is within max_distance bits"""
+        for band, key in enumerate(keys):
+            for other, other_story in self._buckets[band].get(key, ()):
+                if other_story != story_id and hamming(fingerprint, other) <= self.max_distance:
+                    return True
+        return False
+
+    def _is_duplicate(self, story_id: int, text: str, paragraph_hash: int) -> bool:
+        first_story = self._exact.setdefault(paragraph_hash, story_id)
+        if first_story != story_id:
+            self.exact += 1
+            return True
+
+        fingerprint = simhash(text, self.shingle)
+        keys = self._band_keys(fingerprint)
+        if self._near_match(story_id, fingerprint, keys):
+            self.near += 1
+            return True
+
+        # Only paragraphs that are kept become reference copies
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append((fingerprint, story_id))
+        return False
+
+    def scan(self, stories: Sequence[Story]) -> None:
+        """Decide which copy of every repeated paragraph is kept
+
+        stories are in index order, so a story's id is its position. They are
+        visited oldest first, making the oldest copy the one kept.
+        """
+        self._dropped = set()
+        for story_id in sorted(range(len(stories)), key=lambda i: _age_key(stories[i])):
+            story = stories[story_id]
+            for i, text in enumerate(story.iter_content()):
+                if self._is_duplicate(story_id, text, story.hashes[i]):
+                    self._dropped.add((story_id, i))
+
+    def filter(self, story_id: int, story: Story) -> List[str]:
+        """The story's paragraphs, minus duplicates of older stories if dropping"""
+        content = []
+        unique = []
+        for i, text in enumerate(story.iter_content()):
+            content.append(text)
+            self.paragraphs += 1
+            if self._dropped is not None:
+                duplicate = (story_id, i) in self._dropped
+            else:
+                duplicate = self._is_duplicate(story_id, text, story.hashes[i])
+            if duplicate:
+                self.duplicates.append((story_id, i, text))
+            else:
+                unique.append(text)
+
+        if len(unique) < len(content):
+            # Exactly what the content array shrinks by in the minified search index
+            self.bytes_saved += _json_size(content) - _json_size(unique)
+        return unique if self.drop else content
+
+    def report(self) -> None:
+        """Print how many duplicate paragraphs were found and their size"""
+        verb = 'Dropped' if self.drop else 'Found'
+        print(f"🧬 {verb} {self.exact + self.near} duplicate paragraphs of {self.paragraphs:,} "
+              f"({self.exact} exact, {self.near} near); "
+              f"search-index.json {'saved' if self.drop else 'would save'} {self.bytes_saved / 1024:.1f} KB")
+
+
+def _json_size(content: List[str]) -> int:
+    """UTF-8 size of a content array as written to search-index.json"""
+    return len(json.dumps(content, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find near-duplicate paragraphs in the search index')
+    parser.add_argument('--index', default=os.path.join('..', 'docs', 'search-index.json'),
+                        help='Path to search-index.json')
+    parser.add_argument('--max-distance', type=int, default=3,
+                        help='Most SimHash bits in which near-duplicates may differ')
+    parser.add_argument('--show', type=int, default=10, help='Duplicates to print')
+    args = parser.parse_args()
+
+    with open(args.index, 'r', encoding='utf-8') as f:
+        stories = json.load(f)
+
+    # Dates and URLs, which decide the copy kept, live in the metadata file
+    metadata_path = os.path.join(os.path.dirname(args.index), 'stories-metadata.json')
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = {item['id']: item for item in json.load(f)}
+        for story in stories:
+            meta = metadata.get(story['id'], {})
+            story['url'] = meta.get('url', '')
+            story['date'] = meta.get('date', '')
+
+    records = [Story.from_dict(story) for story in stories]
+    deduper = ParagraphDeduper(max_distance=args.max_distance, drop=False)
+    deduper.scan(records)
+    for story_id, story in enumerate(records):
+        deduper.filter(story_id, story)
+
+    deduper.report()
+    for story_id, paragraph_idx, text in deduper.duplicates[:args.show]:
+        title = stories[story_id]['title']
+        print(f"   {title[:30]:30}  ¶{paragraph_idx}: {text[:80]}{'...' if len(text) > 80 else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Story URL discovery helpers: sitemap streaming and the archive API
+
+Sitemaps are read with ElementTree.iterparse, yielding each <url> or <sitemap>
+entry as soon as its closing tag is seen and then discarding it, so memory
+stays flat however many posts the publication has. A <sitemapindex> lists
+further sitemaps (Substack splits them by year), which the scraper fetches in
+turn.
+
+Substack's archive page only renders the newest posts; the JSON endpoint
+behind it pages through all of them with offset and limit parameters.
+"""
+
+import io
+from typing import Iterable, Iterator, List, Tuple
+from urllib.parse import urlencode
+from xml.etree import ElementTree
+
+DEFAULT_BASE_URL = 'https://protocolized.summerofprotocols.com'
+
+# Posts requested per archive API page
+ARCHIVE_PAGE_SIZE = 50
+
+# Child sitemaps fetched at once when reading a sitemap index
+SITEMAP_FETCHES = 4
+
+# Entry kinds yielded by iter_sitemap
+SITEMAP = 'sitemap'
+PAGE = 'url'
+
+SitemapEntry = Tuple[str, str, str]  # (SITEMAP or PAGE, loc, lastmod or '')
+
+
+def _local_name(tag: str) -> str:
+    """Tag name without its {namespace}"""
+    return tag.rpartition('}')[2]
+
+
+def iter_sitemap(content: bytes) -> Iterator[SitemapEntry]:
+    """Entries of a sitemap or sitemap index, parsed incrementally
+
+    Raises ElementTree.ParseError on malformed XML, after yielding the entries
+    that came before the error.
+    """
+    root = None
+    open_tags: List[str] = []  # Local names of the elements enclosing the current one
+    loc = lastmod = ''
+    for event, elem in ElementTree.iterparse(io.BytesIO(content), events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            open_tags.append(_local_name(elem.tag))
+            continue
+
+        tag = open_tags.pop()
+        # Only an entry's own <loc>/<lastmod> count, not an extension's (<image:loc>)
+        parent = open_tags[-1] if open_tags else ''
+        if tag == 'loc' and parent in (SITEMAP, PAGE):
+            loc = (elem.text or '').strip()
+        elif tag == 'lastmod' and parent in (SITEMAP, PAGE):
+            lastmod = (elem.text or '').strip()
+        elif tag in (SITEMAP, PAGE):
+            if loc:
+                yield tag, loc, lastmod
+            loc = lastmod = ''
+            # Drop finished entries so the tree never grows
+            root.clear()
+
+
+def archive_api_url(base_url: str, offset: int, limit: int = ARCHIVE_PAGE_SIZE) -> str:
+    return f"{base_url}/api/v1/archive?" + urlencode({'sort': 'new', 'offset': offset, 'limit': limit})
+
+
+def archive_post_urls(posts: Iterable[dict], base_url: str) -> List[str]:
+    """Post URLs from one page of the archive API"""
+    urls = []
+    for post in posts:
+        url = post.get('canonical_url') or ''
+        if '/p/' not in url and post.get('slug'):
+            url = f"{base_url}/p/{post['slug']}"
+        if '/p/' in url:
+            urls.append(url.split('?')[0].split('#')[0])
+    return urls
@@ -0,0 +1,143 @@
+#!/usr/bin/env node
+/**
+ * Export a pre-built FlexSearch index for the search page
+ *
+ * Builds the same FlexSearch.Document the browser would (options come from
+ * docs/js/search-config.js), adds every story from search-index.json and writes
+ * the exported index to flexsearch-index.json together with a checksum of the
+ * data it was built from, so search.js can detect a stale export.
+ *
+ * Sharded builds (search-index-manifest.json present) get one export per shard
+ * instead, written next to it as shard-NNN-<sha>.flexsearch.json, so the page
+ * can import each shard as it arrives rather than wait for a full-corpus file.
+ *
+ * Usage: node export_flexsearch.js [output_dir]   (needs: npm install)
+ */
+
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+const FlexSearch = require('flexsearch');
+const { SEARCH_INDEX_OPTIONS } = require('../docs/js/search-config.js');
+
+const outputDir = process.argv[2] || path.join(__dirname, '..', 'docs');
+const indexPath = path.join(outputDir, 'search-index.json');
+const manifestPath = path.join(outputDir, 'search-index-manifest.json');
+const exportPath = path.join(outputDir, 'flexsearch-index.json');
+
+// FlexSearch 0.7 hands over one key per tick: 'reg', then cfg/map/ctx for
+// each indexed field, then the document's 'tag' and 'store', which is last
+const FINAL_KEY = 'store';
+
+// An export that has not finished by then is treated as failed
+const EXPORT_TIMEOUT_MS = 60000;
+
+function expectedKeys(options) {
+    const fields = options.document.index.flatMap(field => [`${field}.cfg`, `${field}.map`, `${field}.ctx`]);
+    return ['reg', ...fields, FINAL_KEY];
+}
+
+function exportIndex(index) {
+    return new Promise((resolve, reject) => {
+        const keys = {};
+        const timer = setTimeout(() => {
+            reject(new Error(`export stalled after ${Object.keys(keys).length} keys`));
+        }, EXPORT_TIMEOUT_MS);
+        const finish = () => {
+            clearTimeout(timer);
+            resolve(keys);
+        };
+
+        // Done when the final key arrives, or when the promise that newer
+        // 0.7 releases return from export() resolves
+        const done = index.export((key, data) => {
+            keys[key] = data;
+            if (key === FINAL_KEY) {
+                finish();
+            }
+        });
+        if (done && typeof done.then === 'function') {
+            done.then(finish, reject);
+        }
+    });
+}
+
+/**
+ * Index stories and export them, checking that no key went missing
+ */
+async function buildExport(stories, source) {
+    const index = new FlexSearch.Document(SEARCH_INDEX_OPTIONS);
+    stories.forEach(doc => {
+        index.add({ ...doc, content: doc.content.join(' ') });
+    });
+
+    const keys = await exportIndex(index);
+    const missing = expectedKeys(SEARCH_INDEX_OPTIONS).filter(key => !(key in keys));
+    if (missing.length) {
+        throw new Error(`export incomplete, missing keys: ${missing.join(', ')}`);
+    }
+
+    return { version: 1, flexsearch: '0.7.31', source, keys };
+}
+
+function writeExport(filePath, payload) {
+    const tmpPath = `${filePath}.tmp`;
+    fs.writeFileSync(tmpPath, JSON.stringify(payload));
+    fs.renameSync(tmpPath, filePath);
+    return fs.statSync(filePath).size;
+}
+
+function sha256(buffer) {
+    return crypto.createHash('sha256').update(buffer).digest('hex');
+}
+
+/**
+ * One export per shard; exports of shards no longer listed are removed
+ */
+async function exportShards(manifest) {
+    const written = new Set();
+    let totalBytes = 0;
+
+    for (const shard of manifest.shards) {
+        const raw = fs.readFileSync(path.join(outputDir, shard.file));
+        const stories = JSON.parse(raw.toString('utf8'));
+        const payload = await buildExport(stories, { sha256: sha256(raw), stories: stories.length });
+
+        const shardExport = shard.file.replace(/\.json$/, '.flexsearch.json');
+        totalBytes += writeExport(path.join(outputDir, shardExport), payload);
+        written.add(path.basename(shardExport));
+    }
+
+    const shardDirs = new Set(manifest.shards.map(shard => path.join(outputDir, path.dirname(shard.file))));
+    shardDirs.forEach(dir => {
+        fs.readdirSync(dir)
+            .filter(name => name.endsWith('.flexsearch.json') && !written.has(name))
+            .forEach(name => fs.unlinkSync(path.join(dir, name)));
+    });
+
+    // The page never reads a full-corpus export next to a manifest
+    if (fs.existsSync(exportPath)) {
+        fs.unlinkSync(exportPath);
+    }
+
+    console.log(`✅ Created ${written.size} shard exports (${(totalBytes / 1024).toFixed(1)} KB)`);
+}
+
+async function main() {
+    if (fs.existsSync(manifestPath)) {
+        await exportShards(JSON.parse(fs.readFileSync(manifestPath, 'utf8')));
+        return;
+    }
+
+    const raw = fs.readFileSync(indexPath);
+    const stories = JSON.parse(raw.toString('utf8'));
+    const payload = await buildExport(stories, { sha256: sha256(raw), stories: stories.length });
+
+    const sizeKb = writeExport(exportPath, payload) / 1024;
+    console.log(`✅ Created ${exportPath} (${sizeKb.toFixed(1)} KB, ${Object.keys(payload.keys).length} keys)`);
+}
+
+main().catch(error => {
+    console.error(`❌ FlexSearch export failed: ${error.message}`);
+    process.exit(1);
+});
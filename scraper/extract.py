@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Single-pass metadata extraction for story pages
+
+The reference extraction (extract_reference.py) runs each field's CSS selectors
+over the whole tree. StoryExtractor compiles the same selector lists once and visits the
+DOM a single time, recording the first match for every selector as it goes, so
+the precedence rules stay identical while extraction cost is O(nodes).
+
+Only the selector forms used by the scrapers are supported: tag names,
+.class, [class*="substring"], compounds of those, comma groups and the
+descendant combinator.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from bs4 import BeautifulSoup, Tag
+
+from instrumentation import Metrics
+from parsing import DEFAULT_PARSER, parse_html
+from records import Story
+
+# Fallback content container: any div with a content-ish class
+CONTENT_CLASS_RE = re.compile(r'content|body|post', re.I)
+
+# Paragraphs containing any of these are Substack chrome, not story text
+DEFAULT_BOILERPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'boilerplate.txt')
+
+
+def load_phrases(path: str = DEFAULT_BOILERPLATE_PATH) -> List[str]:
+    """Read a boilerplate list: one phrase per line, # comments"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = (line.strip() for line in f)
+        return [line.lower() for line in lines if line and not line.startswith('#')]
+
+
+BOILERPLATE_PHRASES = load_phrases()
+
+_COMPOUND_RE = re.compile(r'^([a-z0-9]*)((?:\.[\w-]+|\[class\*="[^"]+"\])*)$', re.I)
+_PART_RE = re.compile(r'\.([\w-]+)|\[class\*="([^"]+)"\]')
+
+
+class Compound:
+    """One compound selector such as h1[class*="title"] or .post-tag"""
+
+    __slots__ = ('name', 'classes', 'substrings')
+
+    def __init__(self, text: str):
+        match = _COMPOUND_RE.match(text)
+        if not match:
+            raise ValueError(f"Unsupported selector: {text}")
+
+        self.name = match.group(1).lower() or None
+        self.classes = []
+        self.substrings = []
+        for cls, substring in _PART_RE.findall(match.group(2)):
+            if cls:
+                self.classes.append(cls)
+            else:
+                self.substrings.append(substring)
+
+    def matches(self, name: str, classes: List[str], class_attr: str) -> bool:
+        if self.name and self.name != name:
+            return False
+        if any(cls not in classes for cls in self.classes):
+            return False
+        return all(substring in class_attr for substring in self.substrings)
+
+
+class Selector:
+    """A descendant chain of compounds, e.g. "article h1" """
+
+    __slots__ = ('parts',)
+
+    def __init__(self, text: str):
+        self.parts = [Compound(part) for part in text.split()]
+
+    def matches(self, element: Tuple, ancestors: List[Tuple]) -> bool:
+        """element and ancestors are (name, classes, class_attr) tuples"""
+        if not self.parts[-1].matches(*element):
+            return False
+
+        # Match the remaining compounds against ancestors, nearest first
+        remaining = len(self.parts) - 2
+        for ancestor in reversed(ancestors):
+            if remaining < 0:
+                break
+            if self.parts[remaining].matches(*ancestor):
+                remaining -= 1
+
+        return remaining < 0
+
+
+def compile_group(selector: str) -> List[Selector]:
+    """Compile a comma-separated selector group"""
+    return [Selector(part.strip()) for part in selector.split(',')]
+
+
+class StoryExtractor:
+    """Extracts every story field from a parsed page in one DOM traversal"""
+
+    def __init__(self, title_selectors: Sequence[str], subtitle_selectors: Sequence[str],
+                 author_selector: str, tag_selector: str,
+                 author_excludes: Sequence[str] = (), max_authors: int = 3, max_tags: int = 5):
+        self.title_selectors = [Selector(s) for s in title_selectors]
+        self.subtitle_selectors = [Selector(s) for s in subtitle_selectors]
+        self.author_group = compile_group(author_selector)
+        self.tag_group = compile_group(tag_selector)
+        self.author_excludes = tuple(author_excludes)
+        self.max_authors = max_authors
+        self.max_tags = max_tags
+
+    def extract(self, soup: BeautifulSoup, is_valid_paragraph: Callable[[str], bool],
+                metrics: Optional[Metrics] = None) -> Dict:
+        """Return title, subtitle, author, date, tags and content for a page
+
+        With metrics, times the shared traversal and each field's extraction
+        from its matches (the work the reference selectors each do separately).
+        """
+        start = time.perf_counter()
+        titles: List[Optional[Tag]] = [None] * len(self.title_selectors)
+        subtitles: List[Optional[Tag]] = [None] * len(self.subtitle_selectors)
+        author_elems: List[Tag] = []
+        tag_elems: List[Tag] = []
+        time_elem: Optional[Tag] = None
+
+        # Content containers in the reference extract_content priority order:
+        # article, div.body, div.post-content, then any content-ish div
+        containers: List[Optional[Tag]] = [None, None, None, None]
+        paragraphs: List[List[Tag]] = [[], [], [], []]
+        open_containers: List[Tuple[int, int]] = []  # (container index, depth)
+
+        ancestors: List[Tuple] = []
+        stack = [(child, 0) for child in reversed(soup.contents) if isinstance(child, Tag)]
+
+        while stack:
+            elem, depth = stack.pop()
+
+            # Leaving subtrees: trim the ancestor chain and closed containers
+            del ancestors[depth:]
+            while open_containers and open_containers[-1][1] >= depth:
+                open_containers.pop()
+
+            name = elem.name
+            classes = elem.get('class') or []
+            class_attr = ' '.join(classes)
+            info = (name, classes, class_attr)
+
+            # Title/subtitle: the first match for each selector, in document order
+            for i, selector in enumerate(self.title_selectors):
+                if titles[i] is None and selector.matches(info, ancestors):
+                    titles[i] = elem
+            for i, selector in enumerate(self.subtitle_selectors):
+                if subtitles[i] is None and selector.matches(info, ancestors):
+                    subtitles[i] = elem
+
+            if any(s.matches(info, ancestors) for s in self.author_group):
+                author_elems.append(elem)
+            if any(s.matches(info, ancestors) for s in self.tag_group):
+                tag_elems.append(elem)
+
+            if name == 'time' and time_elem is None:
+                time_elem = elem
+
+            if name == 'p':
+                for i, _ in open_containers:
+                    paragraphs[i].append(elem)
+
+            for i, is_container in enumerate(self._container_checks(name, classes, class_attr)):
+                if is_container and containers[i] is None:
+                    containers[i] = elem
+                    open_containers.append((i, depth))
+
+            ancestors.append(info)
+            for child in reversed(elem.contents):
+                if isinstance(child, Tag):
+                    stack.append((child, depth + 1))
+
+        if metrics:
+            metrics.observe('extract_seconds', time.perf_counter() - start, field='traverse')
+
+        fields = {}
+        for field, finish, args in (('title', self._first_text, (titles,)),
+                                    ('subtitle', self._first_text, (subtitles,)),
+                                    ('author', self._authors, (author_elems,)),
+                                    ('date', self._date, (time_elem,)),
+                                    ('tags', self._tags, (tag_elems,)),
+                                    ('content', self._content, (containers, paragraphs, is_valid_paragraph))):
+            start = time.perf_counter()
+            fields[field] = finish(*args)
+            if metrics:
+                metrics.observe('extract_seconds', time.perf_counter() - start, field=field)
+
+        return fields
+
+    @staticmethod
+    def _container_checks(name: str, classes: List[str], class_attr: str) -> Tuple[bool, ...]:
+        is_div = name == 'div'
+        return (
+            name == 'article',
+            is_div and 'body' in classes,
+            is_div and 'post-content' in classes,
+            is_div and any(CONTENT_CLASS_RE.search(cls) for cls in classes),
+        )
+
+    @staticmethod
+    def _first_text(matches: List[Optional[Tag]]) -> str:
+        for elem in matches:
+            if elem is not None:
+                return elem.get_text(strip=True)
+        return ""
+
+    def _authors(self, elems: List[Tag]) -> str:
+        authors = []
+        for elem in elems:
+            text = elem.get_text(strip=True)
+            if not text or text in authors or len(text) >= 100:
+                continue
+            if any(word in text.lower() for word in self.author_excludes):
+                continue
+            authors.append(text)
+
+        return ", ".join(authors[:self.max_authors]) if authors else "Unknown"
+
+    @staticmethod
+    def _date(time_elem: Optional[Tag]) -> str:
+        if time_elem and time_elem.get('datetime'):
+            date_str = time_elem['datetime']
+            return date_str[:10] if len(date_str) >= 10 else date_str
+        return ""
+
+    def _tags(self, elems: List[Tag]) -> List[str]:
+        tags = []
+        for elem in elems:
+            text = elem.get_text(strip=True)
+            if text and text not in tags and len(text) < 50:
+                tags.append(text)
+
+        return tags[:self.max_tags]
+
+    @staticmethod
+    def _content(containers: List[Optional[Tag]], paragraphs: List[List[Tag]],
+                 is_valid_paragraph: Callable[[str], bool]) -> List[str]:
+        for container, container_paragraphs in zip(containers, paragraphs):
+            if container is None:
+                continue
+
+            content = []
+            for p in container_paragraphs:
+                text = p.get_text(separator=' ', strip=True)
+                if is_valid_paragraph(text):
+                    content.append(text)
+            return content
+
+        return []
+
+
+class ParagraphFilter:
+    """Decides whether a paragraph is story content rather than boilerplate"""
+
+    def __init__(self, phrases: Sequence[str] = BOILERPLATE_PHRASES, min_chars: int = 20, min_words: int = 5):
+        self.phrases = list(phrases)
+        self.min_chars = min_chars
+        self.min_words = min_words
+
+    def __call__(self, text: str) -> bool:
+        # Must be substantial
+        if len(text) < self.min_chars:
+            return False
+
+        # Filter out common boilerplate
+        text_lower = text.lower()
+        for phrase in self.phrases:
+            if phrase in text_lower:
+                return False
+
+        # Filter out very short "paragraphs"
+        return len(text.split()) >= self.min_words
+
+
+def trie_regex(phrases: Sequence[str]) -> str:
+    """Regex matching any of the phrases, factored by common prefix
+
+    A flat alternation makes the regex engine try every phrase at every
+    position; as a trie, a position that starts no phrase fails on its first
+    character, so matching cost stays flat as the list grows.
+    """
+    trie: Dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = {}  # End of a phrase
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        # Optional when a shorter phrase ends here; greedy, so the longest phrase is reported
+        return '(?:' + '|'.join(branches) + ')' + ('?' if '' in node else '')
+
+    return build(trie)
+
+
+class BoilerplateFilter(ParagraphFilter):
+    """ParagraphFilter that checks every phrase in one regex pass and counts hits
+
+    The phrases are compiled into a single prefix-factored, case-insensitive
+    regex (see trie_regex), so the cost per paragraph stays flat
+    as the list grows. Each rejection is counted under the rule that caught it
+    (the phrase, or the length/word minimums); counts from worker processes
+    come back through take_hits().
+    """
+
+    TOO_SHORT = '(under min chars)'
+    TOO_FEW_WORDS = '(under min words)'
+
+    def __init__(self, phrases: Sequence[str] = BOILERPLATE_PHRASES, min_chars: int = 20, min_words: int = 5):
+        super().__init__(phrases, min_chars, min_words)
+        self.hits: Counter = Counter()
+        self._lock = threading.Lock()
+        self._compile()
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_BOILERPLATE_PATH, **options) -> 'BoilerplateFilter':
+        return cls(load_phrases(path), **options)
+
+    def _compile(self) -> None:
+        self._pattern = re.compile(trie_regex(self.phrases), re.I) if self.phrases else None
+
+    def __call__(self, text: str) -> bool:
+        # Must be substantial
+        if len(text) < self.min_chars:
+            self._count(self.TOO_SHORT)
+            return False
+
+        # Filter out boilerplate, all phrases at once
+        if self._pattern:
+            match = self._pattern.search(text)
+            if match:
+                self._count(match.group(0).lower())
+                return False
+
+        # Filter out very short "paragraphs" (splitting no further than needed)
+        if self.min_words and len(text.split(None, self.min_words - 1)) < self.min_words:
+            self._count(self.TOO_FEW_WORDS)
+            return False
+
+        return True
+
+    def _count(self, rule: str) -> None:
+        with self._lock:
+            self.hits[rule] += 1
+
+    def merge_hits(self, hits: Counter) -> None:
+        """Add counts collected by a copy of this filter in another process"""
+        with self._lock:
+            self.hits.update(hits)
+
+    def take_hits(self) -> Counter:
+        """Return the counts so far and start again from zero"""
+        with self._lock:
+            hits, self.hits = self.hits, Counter()
+        return hits
+
+    def report(self) -> None:
+        """Print how many paragraphs each rule rejected"""
+        if not self.hits:
+            return
+
+        print(f"🧹 Filtered {sum(self.hits.values())} paragraphs:")
+        for rule, count in self.hits.most_common():
+            print(f"   {count:6}  {rule}")
+
+    def __getstate__(self) -> Dict:
+        # Locks cannot be pickled, and a copy counts only its own hits
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['hits'] = Counter()
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class StoryParser:
+    """Turns raw story page bytes into a Story
+
+    Holds only plain configuration, so it can be pickled and run in worker
+    processes that never touch the network.
+    """
+
+    def __init__(self, extractor: StoryExtractor, paragraph_filter: ParagraphFilter,
+                 parser: str = DEFAULT_PARSER, targeted: bool = True, metrics: Optional[Metrics] = None):
+        self.extractor = extractor
+        self.paragraph_filter = paragraph_filter
+        self.parser = parser
+        self.targeted = targeted
+        self.metrics = metrics  # Parse and extraction timings, paragraphs kept
+
+    def __call__(self, content: bytes, url: str) -> Optional[Story]:
+        """Parse a page; returns None when the title or content is missing"""
+        start = time.perf_counter()
+        soup = parse_html(content, self.parser, targeted=self.targeted)
+        if self.metrics:
+            self.metrics.observe('parse_seconds', time.perf_counter() - start)
+
+        # Extract metadata and content paragraphs in one pass over the tree
+        fields = self.extractor.extract(soup, self.paragraph_filter, self.metrics)
+        if self.metrics:
+            self.metrics.count('paragraphs_kept', len(fields['content']))
+
+        if not fields['title'] or not fields['content']:
+            return None
+
+        return Story(
+            title=fields['title'],
+            subtitle=fields['subtitle'],
+            author=fields['author'],
+            url=url,
+            date=fields['date'],
+            tags=fields['tags'],
+            content=fields['content']
+        )
+
+    def parse_with_hits(self, content: bytes, url: str) -> Tuple[Optional[Story], Counter, Optional[Dict]]:
+        """Parse a page in a worker process, also returning its filter hit counts and metrics"""
+        story = self(content, url)
+        take_hits = getattr(self.paragraph_filter, 'take_hits', None)
+        return story, take_hits() if take_hits else Counter(), self.metrics.take() if self.metrics else None
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Reference story extraction: one CSS selector pass per field
+
+This is how the scrapers extracted stories before StoryExtractor (extract.py):
+each field runs its own soup.select()/find() calls over the whole tree. It is
+slower but simple enough to read as the specification, so bench_parse.py and
+the tests check StoryExtractor's output against it. The scrapers themselves
+only use StoryExtractor.
+"""
+
+from typing import Callable, Dict, List, Sequence
+
+from bs4 import BeautifulSoup
+
+from extract import CONTENT_CLASS_RE
+
+
+class SelectorExtractor:
+    """Extracts story fields with per-field selectors, taking StoryExtractor's arguments"""
+
+    def __init__(self, title_selectors: Sequence[str], subtitle_selectors: Sequence[str],
+                 author_selector: str, tag_selector: str,
+                 author_excludes: Sequence[str] = (), max_authors: int = 3, max_tags: int = 5):
+        self.title_selectors = list(title_selectors)
+        self.subtitle_selectors = list(subtitle_selectors)
+        self.author_selector = author_selector
+        self.tag_selector = tag_selector
+        self.author_excludes = tuple(author_excludes)
+        self.max_authors = max_authors
+        self.max_tags = max_tags
+
+    @classmethod
+    def for_scraper(cls, scraper) -> 'SelectorExtractor':
+        """The reference for a scraper class's (or instance's) selectors"""
+        return cls(scraper.TITLE_SELECTORS, scraper.SUBTITLE_SELECTORS,
+                   scraper.AUTHOR_SELECTOR, scraper.TAG_SELECTOR,
+                   author_excludes=getattr(scraper, 'AUTHOR_EXCLUDES', ()))
+
+    def extract(self, soup: BeautifulSoup, is_valid_paragraph: Callable[[str], bool]) -> Dict:
+        """Return title, subtitle, author, date, tags and content for a page"""
+        return {
+            'title': self.extract_title(soup),
+            'subtitle': self.extract_subtitle(soup),
+            'author': self.extract_author(soup),
+            'date': self.extract_date(soup),
+            'tags': self.extract_tags(soup),
+            'content': self.extract_content(soup, is_valid_paragraph),
+        }
+
+    def extract_title(self, soup: BeautifulSoup) -> str:
+        """Extract story title"""
+        for selector in self.title_selectors:
+            elem = soup.select_one(selector)
+            if elem:
+                return elem.get_text(strip=True)
+
+        return ""
+
+    def extract_subtitle(self, soup: BeautifulSoup) -> str:
+        """Extract story subtitle"""
+        for selector in self.subtitle_selectors:
+            elem = soup.select_one(selector)
+            if elem:
+                return elem.get_text(strip=True)
+
+        return ""
+
+    def extract_author(self, soup: BeautifulSoup) -> str:
+        """Extract author name(s)"""
+        authors = []
+        for elem in soup.select(self.author_selector):
+            text = elem.get_text(strip=True)
+            if not text or text in authors or len(text) >= 100:
+                continue
+            if any(word in text.lower() for word in self.author_excludes):
+                continue
+            authors.append(text)
+
+        return ", ".join(authors[:self.max_authors]) if authors else "Unknown"
+
+    @staticmethod
+    def extract_date(soup: BeautifulSoup) -> str:
+        """Extract publication date"""
+        time_elem = soup.find('time')
+        if time_elem and time_elem.get('datetime'):
+            date_str = time_elem['datetime']
+            return date_str[:10] if len(date_str) >= 10 else date_str
+
+        return ""
+
+    def extract_tags(self, soup: BeautifulSoup) -> List[str]:
+        """Extract story tags"""
+        tags = []
+        for elem in soup.select(self.tag_selector):
+            text = elem.get_text(strip=True)
+            if text and text not in tags and len(text) < 50:
+                tags.append(text)
+
+        return tags[:self.max_tags]
+
+    @staticmethod
+    def extract_content(soup: BeautifulSoup, is_valid_paragraph: Callable[[str], bool]) -> List[str]:
+        """Extract all content paragraphs"""
+        article = soup.find('article') or soup.find('div', class_='body') or soup.find('div', class_='post-content')
+
+        if not article:
+            article = soup.find('div', class_=CONTENT_CLASS_RE)
+
+        if not article:
+            return []
+
+        content = []
+        for p in article.find_all('p'):
+            text = p.get_text(separator=' ', strip=True)
+            if is_valid_paragraph(text):
+                content.append(text)
+
+        return content
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Pluggable HTTP fetch backends for the scrapers
+
+The default backend wraps a blocking requests.Session. The async backend runs a
+pooled keep-alive httpx client (optionally HTTP/2) on a background event loop,
+so calls made from several threads are multiplexed over shared connections.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from instrumentation import TRACE_STAGES
+
+try:
+    import httpx
+except ImportError:  # Optional dependency, only needed for the async backend
+    httpx = None
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) Protocolized-Search-Bot/1.0',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+BACKENDS = ('requests', 'async')
+
+
+class FetchResponse:
+    """Minimal response object with the parts of requests.Response we use"""
+
+    def __init__(self, url: str, status_code: int, content: bytes, headers: Mapping[str, str],
+                 timings: Optional[Dict[str, float]] = None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.timings = timings  # Seconds per request stage, when traced
+
+    def raise_for_status(self) -> None:
+        """Raise requests.HTTPError for 4xx/5xx responses, like requests does"""
+        if 400 <= self.status_code < 600:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+class RequestsFetcher:
+    """Blocking backend using a single requests.Session (the default)"""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None):
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+
+    def get(self, url: str, timeout: float = 15, headers: Optional[Dict[str, str]] = None):
+        """Fetch a URL and return the requests.Response"""
+        return self.session.get(url, timeout=timeout, headers=headers)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncFetcher:
+    """asyncio backend with a shared httpx connection pool and per-host limits"""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None, max_connections: int = 20,
+                 per_host: int = 6, http2: bool = False, trace: bool = False):
+        if httpx is None:
+            raise RuntimeError("The async backend needs httpx: pip install 'httpx[http2]'")
+
+        self.per_host = per_host
+        self.trace = trace  # Time each request's connect/TLS/send/wait/transfer stages
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+        # Dedicated event loop thread so synchronous callers can share the pool
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='fetch-loop', daemon=True)
+        self._thread.start()
+
+        async def make_client():
+            return httpx.AsyncClient(
+                headers=headers or DEFAULT_HEADERS,
+                http2=http2,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_connections),
+            )
+
+        self._client = self._run(make_client())
+
+    def _run(self, coro):
+        """Run a coroutine on the fetch loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def aget(self, url: str, timeout: float = 15,
+                   headers: Optional[Dict[str, str]] = None) -> FetchResponse:
+        """Fetch a URL on the event loop, respecting the per-host connection limit"""
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+
+        timings: Optional[Dict[str, float]] = None
+        extensions = None
+        if self.trace:
+            timings = {}
+            extensions = {'trace': _stage_timer(timings)}
+
+        async with self._host_limits[host]:
+            response = await self._client.get(url, timeout=timeout, headers=headers, extensions=extensions)
+
+        return FetchResponse(str(response.url), response.status_code, response.content,
+                             CaseInsensitiveDict(response.headers), timings)
+
+    def get(self, url: str, timeout: float = 15,
+            headers: Optional[Dict[str, str]] = None) -> FetchResponse:
+        """Fetch a URL from any thread; requests from all threads share the pool"""
+        return self._run(self.aget(url, timeout=timeout, headers=headers))
+
+    def close(self) -> None:
+        self._run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def _stage_timer(timings: Dict[str, float]):
+    """httpx trace callback adding each step's duration to timings by stage
+
+    Steps arrive as "<scope>.<step>.started" and "<scope>.<step>.complete";
+    steps outside TRACE_STAGES (such as HTTP/2 connection setup) are ignored.
+    """
+    started: Dict[str, float] = {}
+
+    async def trace(event_name: str, info: Dict) -> None:
+        step, phase = event_name.rsplit('.', 2)[-2:]
+        if phase == 'started':
+            started[step] = time.perf_counter()
+        elif phase in ('complete', 'failed') and step in started and step in TRACE_STAGES:
+            stage = TRACE_STAGES[step]
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started.pop(step)
+
+    return trace
+
+
+def create_fetcher(backend: str = 'requests', **options):
+    """Build a fetch backend by name ('requests' or 'async')"""
+    if backend == 'requests':
+        if options.get('http2'):
+            raise ValueError("HTTP/2 needs the async backend (--backend async --http2)")
+        return RequestsFetcher(headers=options.get('headers'))
+    if backend == 'async':
+        return AsyncFetcher(**options)
+
+    raise ValueError(f"Unknown fetch backend: {backend} (choose from {', '.join(BACKENDS)})")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Build step that pre-builds the browser's FlexSearch index
+
+Runs export_flexsearch.js with Node.js after the index files are written. The
+export is optional: without Node or the flexsearch package the step is skipped,
+any old export is removed, and the search page indexes stories itself.
+"""
+
+import os
+import shutil
+import subprocess
+
+SCRAPER_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPORT_SCRIPT = os.path.join(SCRAPER_DIR, 'export_flexsearch.js')
+EXPORT_NAME = 'flexsearch-index.json'
+
+
+def export_flexsearch(output_dir: str) -> bool:
+    """Write flexsearch-index.json (or one export per shard); False if skipped"""
+    export_path = os.path.join(output_dir, EXPORT_NAME)
+
+    node = shutil.which('node')
+    if not node:
+        print("⚠️  Node.js not found, skipping pre-built FlexSearch index")
+        _remove_stale(export_path)
+        return False
+
+    result = subprocess.run(
+        [node, EXPORT_SCRIPT, os.path.abspath(output_dir)],
+        cwd=SCRAPER_DIR,
+        capture_output=True,
+        text=True,
+    )
+
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if 'Error' in line or '❌' in line]
+        detail = errors[0] if errors else f"exit code {result.returncode}"
+        print(f"⚠️  FlexSearch export skipped (run `npm install` in scraper/): {detail}")
+        _remove_stale(export_path)
+        return False
+
+    print(result.stdout.strip())
+    return True
+
+
+def _remove_stale(export_path: str) -> None:
+    """An export of an older index is useless to clients, so drop it"""
+    if os.path.exists(export_path):
+        os.remove(export_path)
+        print(f"   Removed stale {export_path}")
@@ -1,12 +1,68 @@
 #!/usr/bin/env python3
 """
 Generate word cloud data from story content
+
+Two counting engines give identical output. The numpy engine tokenizes into a
+TermMatrix (see term_matrix.py) and counts with np.bincount; without NumPy the
+Counter engine counts each story's regex matches and drops stop words once at
+the end.
+
+Each story's word counts are kept in wordcloud-counts.json next to the index
+(the index writer saves them at build time too), keyed by a hash of the
+story's text. A run only tokenizes stories whose text is new; the totals are
+updated by subtracting the counts of stories that went away and adding those
+of new ones, so an incremental scrape regenerates wordcloud-data.json in
+milliseconds.
+
+For large corpora, --workers tokenizes in a process pool. The index is read
+one entry at a time and handed out in batches of about a megabyte of text, so
+no process holds more of the corpus than a few batches. Each batch comes back
+as per-story vectors plus their partial Counter. The parent merges the
+partials as a balanced tree while the workers carry on, always adding a later
+run into an earlier one, which keeps every word at its first occurrence: ties
+rank as in a single-process count.
+
+Usage:
+    python3 generate_wordcloud.py
+    python3 generate_wordcloud.py --engine counter
+    python3 generate_wordcloud.py --full    # ignore the saved counts
+    python3 generate_wordcloud.py --full --workers 8
 """
 
+import argparse
+import hashlib
+import heapq
 import json
+import multiprocessing
+import os
 import re
-from collections import Counter
-from typing import List, Dict
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Set, Tuple, Union
+
+from records import SEPARATOR, Story
+
+try:
+    from term_matrix import TermMatrix
+except ImportError:  # NumPy is optional; the Counter engine needs nothing extra
+    TermMatrix = None
+
+ENGINES = ('auto', 'numpy', 'counter')
+
+WORDCLOUD_NAME = 'wordcloud-data.json'
+WORD_COUNTS_NAME = 'wordcloud-counts.json'
+
+# Story text per worker task; bounds what each worker holds at once
+BATCH_CHARS = 1 << 20
+
+# Read size when streaming the search index
+READ_CHARS = 1 << 20
+
+WORD_RE = re.compile(r'\b[a-z]{3,}\b')
+
+# Words in the cloud
+TOP_WORDS = 50
 
 # Comprehensive stop words to exclude - focus on keeping nouns and meaningful content words
 STOP_WORDS = {
@@ -103,37 +159,224 @@ STOP_WORDS = {
 }
 
 
-def analyze_word_frequency(stories: List[Dict]) -> List[Dict]:
-    """Analyze word frequency across all stories"""
+def story_text(story: Union[Story, Dict]) -> str:
+    """Text counted for a story: the title twice (weighted more heavily), then all content"""
+    if isinstance(story, Story):
+        content = story.text  # Already joined in the story's text buffer
+    else:
+        content = SEPARATOR.join(story.get('content', ()))  # No need to build a record
+    return story['title'] + ' ' + story['title'] + ' ' + content
+
 
+def count_words_counter(stories: List[Union[Story, Dict]]) -> Counter:
+    """Word counts with stop words removed, in first-occurrence order"""
     word_counts = Counter()
 
     for story in stories:
-        # Combine all content
-        text = ' '.join(story['content'])
-
-        # Also include title (weighted more heavily)
-        title_text = story['title'] + ' ' + story['title']  # Count twice
-        text = title_text + ' ' + text
-
         # Tokenize: split by word boundaries, lowercase
-        words = re.findall(r'\b[a-z]{3,}\b', text.lower())
-
-        # Filter out stop words
-        filtered_words = [w for w in words if w not in STOP_WORDS]
-
-        # Count
-        word_counts.update(filtered_words)
+        word_counts.update(WORD_RE.findall(story_text(story).lower()))
+
+    # Filter out stop words once, rather than per occurrence
+    for word in STOP_WORDS:
+        word_counts.pop(word, None)
+
+    return word_counts
+
+
+def _resolve_engine(engine: str) -> str:
+    if engine == 'auto':
+        return 'numpy' if TermMatrix else 'counter'
+    if engine == 'numpy' and TermMatrix is None:
+        raise RuntimeError("The numpy engine needs NumPy: pip install numpy")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine} (choose from {', '.join(ENGINES)})")
+    return engine
+
+
+def top_words(stories: Iterable[Union[Story, Dict]], engine: str = 'auto', n: int = TOP_WORDS,
+              workers: int = 0) -> List[Tuple[str, int]]:
+    """The n most frequent non-stop words, ties in order of first occurrence"""
+    engine = _resolve_engine(engine)
+    if workers > 1:
+        return count_words_parallel(stories, engine, workers).most_common(n)
+    if engine == 'numpy':
+        return TermMatrix.from_texts(story_text(story) for story in stories).most_common(n, STOP_WORDS)
+    return count_words_counter(stories).most_common(n)
+
+
+def count_vector(text: str) -> Dict[str, int]:
+    """One story's non-stop word counts, in order of first occurrence"""
+    counts = Counter(WORD_RE.findall(text.lower()))
+    return {word: count for word, count in counts.items() if word not in STOP_WORDS}
+
+
+def count_vectors(texts: List[str], engine: str = 'auto') -> List[Dict[str, int]]:
+    """count_vector for each text, tokenized together with the numpy engine"""
+    if _resolve_engine(engine) == 'counter':
+        return [count_vector(text) for text in texts]
+
+    matrix = TermMatrix.from_texts(texts)
+    terms = matrix.terms
+    vectors = []
+    for i in range(len(matrix)):
+        ids, counts = matrix.story_counts(i)
+        vectors.append({terms[term]: count for term, count in zip(ids.tolist(), counts.tolist())
+                        if terms[term] not in STOP_WORDS})
+    return vectors
+
+
+def iter_index(path: str, read_chars: int = READ_CHARS) -> Iterator[Dict]:
+    """Entries of a JSON array file such as search-index.json, one at a time"""
+    decoder = json.JSONDecoder()
+    separators = re.compile(r'[\s,]*')
+
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(read_chars).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{path} is not a JSON array")
+        pos = 1
+
+        while True:
+            pos = separators.match(buffer, pos).end()
+            if buffer.startswith(']', pos):
+                return
+            try:
+                entry, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Entry cut off at the end of the buffer: read on and try again
+                more = f.read(read_chars)
+                if not more:
+                    raise
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield entry
+
+
+def _text_batches(items: Iterable[Tuple[str, str]],
+                  batch_chars: int = BATCH_CHARS) -> Iterator[Tuple[List[str], List[str]]]:
+    """(keys, texts) batches of about batch_chars of text from (key, text) pairs"""
+    keys, texts, size = [], [], 0
+    for key, text in items:
+        keys.append(key)
+        texts.append(text)
+        size += len(text)
+        if size >= batch_chars:
+            yield keys, texts
+            keys, texts, size = [], [], 0
+    if texts:
+        yield keys, texts
+
+
+def _count_partial(texts: List[str], engine: str) -> Counter:
+    """Non-stop word counts of a batch of texts, in first-occurrence order"""
+    if engine == 'numpy':
+        matrix = TermMatrix.from_texts(texts)
+        counts = Counter(dict(zip(matrix.terms, matrix.counts().tolist())))
+    else:
+        counts = Counter()
+        for text in texts:
+            counts.update(WORD_RE.findall(text.lower()))
+
+    for word in STOP_WORDS:
+        counts.pop(word, None)
+    return counts
+
+
+def _count_batch(texts: List[str], engine: str) -> Tuple[List[Dict[str, int]], Counter]:
+    """Each text's count vector, and their sum in first-occurrence order"""
+    vectors = count_vectors(texts, engine)
+    total = Counter()
+    for vector in vectors:
+        total.update(vector)
+    return vectors, total
+
+
+def merge_counts(partials: Iterable[Counter]) -> Counter:
+    """Sum the partial counts of consecutive batches as a balanced tree, as they arrive
+
+    Like a binary counter, the stack holds at most one merged run of each
+    size, so only a logarithmic number of partials wait at any time. The left
+    side is always the earlier run and new words go after its own, as if the
+    whole corpus had been counted in one pass.
+    """
+    stack: List[Tuple[int, Counter]] = []
+    for partial in partials:
+        size = 1
+        while stack and stack[-1][0] == size:
+            left_size, left = stack.pop()
+            left.update(partial)
+            partial, size = left, left_size + size
+        stack.append((size, partial))
+
+    merged = stack.pop()[1] if stack else Counter()
+    while stack:
+        left = stack.pop()[1]
+        left.update(merged)
+        merged = left
+    return merged
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    # Spawn, as the scrapers' parse pool does: safe even with threads running
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def _map_batches(function: Callable, batches: Iterable[Tuple[List[str], List[str]]], engine: str,
+                 pool: Optional[ProcessPoolExecutor] = None, workers: int = 0) -> Iterator[Tuple[List[str], object]]:
+    """(keys, function(texts, engine)) per batch, in order
+
+    With a pool, at most two batches per worker are queued or running, so
+    reading the input never gets far ahead of the workers.
+    """
+    if pool is None:
+        for keys, texts in batches:
+            yield keys, function(texts, engine)
+        return
+
+    in_flight = deque()
+    for keys, texts in batches:
+        in_flight.append((keys, pool.submit(function, texts, engine)))
+        if len(in_flight) >= 2 * workers:
+            keys, future = in_flight.popleft()
+            yield keys, future.result()
+    while in_flight:
+        keys, future = in_flight.popleft()
+        yield keys, future.result()
+
+
+def count_words_parallel(stories: Iterable[Union[Story, Dict]], engine: str = 'auto', workers: int = 0) -> Counter:
+    """Same counts as count_words_counter, tokenized in worker processes"""
+    engine = _resolve_engine(engine)
+    workers = workers or os.cpu_count()
+    texts = ((None, story_text(story)) for story in stories)
+
+    with _process_pool(workers) as pool:
+        batches = _map_batches(_count_partial, _text_batches(texts), engine, pool, workers)
+        return merge_counts(partial for _, partial in batches)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+# Saved counts are only valid for the tokenizer and stop words that made them
+RULES = text_hash(WORD_RE.pattern + '\n' + '\n'.join(sorted(STOP_WORDS)))
+
+
+def analyze_word_frequency(stories: Iterable[Union[Story, Dict]], engine: str = 'auto',
+                           workers: int = 0) -> List[Dict]:
+    """Analyze word frequency across all stories"""
+    return scale_words(top_words(stories, engine, workers=workers))
 
-    # Get top words
-    top_words = word_counts.most_common(50)
 
+def scale_words(ranked: List[Tuple[str, int]]) -> List[Dict]:
+    """Word cloud entries with sizes scaled between the least and most frequent word"""
     # Calculate relative sizes (1-5 scale)
-    max_count = top_words[0][1] if top_words else 1
-    min_count = top_words[-1][1] if len(top_words) > 1 else 1
+    max_count = ranked[0][1] if ranked else 1
+    min_count = ranked[-1][1] if len(ranked) > 1 else 1
 
     word_cloud_data = []
-    for word, count in top_words:
+    for word, count in ranked:
         # Scale size from 1 to 5
         if max_count == min_count:
             size = 3
@@ -149,26 +392,206 @@ def analyze_word_frequency(stories: List[Dict]) -> List[Dict]:
     return word_cloud_data
 
 
+class WordCounts:
+    """Per-story word count vectors and their running totals
+
+    Feed the current stories in index order through add() (or update()), then
+    commit(). Stories are identified by a hash of the text counted for them, so
+    one whose title and content are unchanged keeps its vector without being
+    tokenized again, wherever it moved in the index. commit() subtracts the
+    vectors of stories that went away from the totals and adds those of new
+    ones.
+    """
+
+    def __init__(self):
+        self.vectors: Dict[str, Dict[str, int]] = {}  # story hash -> word counts
+        self.order: List[str] = []  # Story hashes in index order
+        self.totals: Counter = Counter()
+
+        self._pending: List[str] = []
+        self._new: Dict[str, Dict[str, int]] = {}
+        self._new_total: Counter = Counter()  # Sum of one copy of each story in _summed
+        self._summed: Set[str] = set()
+
+        # Statistics for the last update
+        self.counted = 0
+        self.reused = 0
+
+    @classmethod
+    def load(cls, path: str) -> 'WordCounts':
+        """Saved counts, or empty ones if the file is missing or was made with other rules"""
+        counts = cls()
+        if not os.path.exists(path):
+            return counts
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != 1 or data.get('rules') != RULES:
+            return counts
+
+        terms = data['terms']
+        for story in data['stories']:
+            counts.vectors[story['hash']] = {terms[i]: n for i, n in zip(story['terms'], story['counts'])}
+            counts.order.append(story['hash'])
+        counts.totals = Counter({term: n for term, n in zip(terms, data['totals'])})
+        return counts
+
+    def add(self, story: Union[Story, Dict]) -> None:
+        """Queue the next story, counting its words unless its text was seen before"""
+        text = story_text(story)
+        digest = text_hash(text)
+        if self._known(digest):
+            self.reused += 1
+        else:
+            self._new[digest] = count_vector(text)
+            self.counted += 1
+        self._pending.append(digest)
+
+    def update(self, stories: Iterable[Union[Story, Dict]], engine: str = 'auto', workers: int = 0) -> None:
+        """add() every story, tokenizing the new ones in batches, then commit()
+
+        With workers > 1 the batches are tokenized in that many processes;
+        stories may be a stream (see iter_index), read as the workers need it.
+        """
+        engine = _resolve_engine(engine)
+        digests: List[str] = []
+        unseen: Set[str] = set()
+
+        def new_texts() -> Iterator[Tuple[str, str]]:
+            for story in stories:
+                text = story_text(story)
+                digest = text_hash(text)
+                digests.append(digest)
+                if not self._known(digest) and digest not in unseen:
+                    unseen.add(digest)
+                    yield digest, text
+
+        def partials(pool: Optional[ProcessPoolExecutor]) -> Iterator[Counter]:
+            for batch, (vectors, partial) in _map_batches(_count_batch, _text_batches(new_texts()),
+                                                          engine, pool, workers):
+                self._new.update(zip(batch, vectors))
+                yield partial
+
+        if workers > 1:
+            with _process_pool(workers) as pool:
+                self._new_total.update(merge_counts(partials(pool)))
+        else:
+            self._new_total.update(merge_counts(partials(None)))
+
+        self._summed.update(unseen)
+        self.counted += len(unseen)
+        self.reused += len(digests) - len(unseen)
+        self._pending.extend(digests)
+        self.commit()
+
+    def _known(self, digest: str) -> bool:
+        return digest in self.vectors or digest in self._new
+
+    def commit(self) -> None:
+        """Make the queued stories current, updating the totals by difference"""
+        self.vectors.update(self._new)
+        previous, current = Counter(self.order), Counter(self._pending)
+
+        for digest, times in (previous - current).items():
+            for word, count in self.vectors[digest].items():
+                self.totals[word] -= count * times
+        for digest, times in (current - previous).items():
+            if digest in self._summed:
+                times -= 1  # One copy is already in _new_total
+            for word, count in self.vectors[digest].items():
+                self.totals[word] += count * times
+        self.totals.update(self._new_total)
+
+        self.totals = Counter({word: count for word, count in self.totals.items() if count > 0})
+        self.vectors = {digest: self.vectors[digest] for digest in current}
+        self.order, self._pending, self._new = self._pending, [], {}
+        self._new_total, self._summed = Counter(), set()
+
+    def most_common(self, n: int = TOP_WORDS) -> List[Tuple[str, int]]:
+        """Same ranking as counting the whole corpus: ties in order of first occurrence"""
+        if not self.totals:
+            return []
+
+        # Only words that can reach the top n need their first occurrence found
+        threshold = heapq.nlargest(n, self.totals.values())[-1]
+        candidates = {word for word, count in self.totals.items() if count >= threshold}
+
+        first_seen: Dict[str, int] = {}
+        for digest in self.order:
+            for word in self.vectors[digest]:
+                if word in candidates and word not in first_seen:
+                    first_seen[word] = len(first_seen)
+            if len(first_seen) == len(candidates):
+                break
+
+        ranked = sorted(candidates, key=lambda word: (-self.totals[word], first_seen[word]))
+        return [(word, self.totals[word]) for word in ranked[:n]]
+
+    def save(self, path: str) -> None:
+        """Write the vectors and totals, with terms numbered in order of appearance"""
+        term_ids: Dict[str, int] = {}
+        stories = []
+        for digest in self.order:
+            vector = self.vectors[digest]
+            stories.append({
+                'hash': digest,
+                'terms': [term_ids.setdefault(word, len(term_ids)) for word in vector],
+                'counts': list(vector.values())
+            })
+
+        data = {
+            'version': 1,
+            'rules': RULES,
+            'terms': list(term_ids),
+            'totals': [self.totals[word] for word in term_ids],
+            'stories': stories
+        }
+        # dumps() rather than dump(): only the one-shot encoder runs in C
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, separators=(',', ':'), ensure_ascii=False))
+        os.replace(f"{path}.tmp", path)
+
+
+def write_word_cloud(word_counts: WordCounts, output_dir: str) -> List[Dict]:
+    """Save the counts and regenerate wordcloud-data.json from them"""
+    word_counts.save(os.path.join(output_dir, WORD_COUNTS_NAME))
+
+    word_cloud_data = scale_words(word_counts.most_common())
+    output_path = os.path.join(output_dir, WORDCLOUD_NAME)
+    with open(f"{output_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(word_cloud_data, f, indent=2)
+    os.replace(f"{output_path}.tmp", output_path)
+    return word_cloud_data
+
+
 def main():
     """Generate word cloud data"""
+    parser = argparse.ArgumentParser(description='Generate word cloud data from the search index')
+    parser.add_argument('--engine', choices=ENGINES, default='auto',
+                        help='Counting engine (auto: numpy when installed, else counter)')
+    parser.add_argument('--output-dir', default=os.path.join('..', 'docs'),
+                        help='Directory with search-index.json; the word cloud files go here too')
+    parser.add_argument('--full', action='store_true',
+                        help=f'Recount every story instead of reusing {WORD_COUNTS_NAME}')
+    parser.add_argument('--workers', type=int, nargs='?', const=os.cpu_count(), default=0,
+                        help='Tokenize in this many processes (default with no value: one per core)')
+    args = parser.parse_args()
 
     print("📊 Generating word cloud data...")
-
-    # Load search index
-    with open('../docs/search-index.json', 'r', encoding='utf-8') as f:
-        stories = json.load(f)
-
-    print(f"   Analyzing {len(stories)} stories...")
-
-    # Analyze word frequency
-    word_cloud_data = analyze_word_frequency(stories)
-
-    # Save to file
-    output_path = '../docs/wordcloud-data.json'
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(word_cloud_data, f, indent=2)
-
-    print(f"✅ Created {output_path}")
+    if args.workers > 1:
+        print(f"⚙️  Tokenizing in {args.workers} worker processes")
+
+    # Stream the search index; count only stories whose text is not in the saved counts
+    start = time.perf_counter()
+    stories = iter_index(os.path.join(args.output_dir, 'search-index.json'))
+    counts_path = os.path.join(args.output_dir, WORD_COUNTS_NAME)
+    word_counts = WordCounts() if args.full else WordCounts.load(counts_path)
+    word_counts.update(stories, args.engine, args.workers)
+    word_cloud_data = write_word_cloud(word_counts, args.output_dir)
+    print(f"   Counted {word_counts.counted} stories, reused {word_counts.reused} "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"✅ Created {os.path.join(args.output_dir, WORDCLOUD_NAME)}")
     print(f"\n📋 Top 20 words:")
     for item in word_cloud_data[:20]:
         print(f"   {item['word']:20} - {item['count']:4} occurrences (size: {item['size']})")
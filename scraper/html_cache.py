@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of fetched HTML with a zero-network replay mode
+
+Response bodies are stored gzip-compressed and content-addressed by SHA-256, so
+identical pages fetched on different runs share one object. An append-only
+index.jsonl maps each (URL, fetch time) to the object it produced; lookups
+return the most recent fetch of a URL.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from requests.structures import CaseInsensitiveDict
+
+from fetchers import FetchResponse
+
+DEFAULT_CACHE_DIR = '../.html-cache'
+
+# Response headers worth keeping alongside the body
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class HtmlCache:
+    """Content-addressed, compressed store of raw response bodies"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, 'index.jsonl')
+        self._lock = threading.Lock()
+        self._latest: Dict[str, Dict] = {}
+
+        os.makedirs(os.path.join(cache_dir, 'objects'), exist_ok=True)
+
+        # Later lines win, so the index ends up pointing at the newest fetch
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._latest[entry['url']] = entry
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, 'objects', digest[:2], f"{digest}.html.gz")
+
+    def store(self, url: str, response) -> None:
+        """Save a response body and record it as the latest fetch of url"""
+        digest = hashlib.sha256(response.content).hexdigest()
+        path = self._object_path(digest)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(response.content)
+            os.replace(tmp_path, path)
+
+        entry = {
+            'url': url,
+            'fetched_at': time.time(),
+            'sha256': digest,
+            'status': response.status_code,
+            'headers': {k: response.headers[k] for k in KEPT_HEADERS if k in response.headers},
+        }
+
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+            self._latest[url] = entry
+
+    def lookup(self, url: str) -> Optional[FetchResponse]:
+        """Return the most recently cached response for url, if any"""
+        entry = self._latest.get(url)
+        if not entry:
+            return None
+
+        with gzip.open(self._object_path(entry['sha256']), 'rb') as f:
+            content = f.read()
+
+        return FetchResponse(url, entry['status'], content, CaseInsensitiveDict(entry['headers']))
+
+
+class CachingFetcher:
+    """Fetcher wrapper that writes responses to an HtmlCache, or replays from it"""
+
+    def __init__(self, fetcher, cache: HtmlCache, replay: bool = False):
+        self.fetcher = fetcher  # May be None in replay mode
+        self.cache = cache
+        self.replay = replay
+        self.misses = 0
+
+    def get(self, url: str, timeout: float = 15, headers: Optional[Dict[str, str]] = None):
+        """Fetch url through the cache; in replay mode never touch the network"""
+        if self.replay:
+            cached = self.cache.lookup(url)
+            if cached is None:
+                self.misses += 1
+                return FetchResponse(url, 404, b'', {})
+            return cached
+
+        response = self.fetcher.get(url, timeout=timeout, headers=headers)
+        if response.status_code == 200:
+            self.cache.store(url, response)
+
+        return response
+
+    def close(self) -> None:
+        if self.fetcher:
+            self.fetcher.close()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Streaming writer for the search index and metadata JSON files
+
+Stories are written out one at a time as they are scraped, while word and
+paragraph statistics are tallied in the same pass. Both files are written to
+temporary paths and renamed into place only once every story is in, so the
+site never serves a half-written index. The bytes produced are identical to
+json.dump() of the full lists.
+
+Optionally the search index is also split into size-bounded shards listed in a
+small manifest, so the browser can start searching before the whole corpus has
+downloaded. Shard file names include their checksum; the manifest is replaced
+last and shards it no longer lists are removed afterwards.
+
+A paragraph-level inverted index (see postings.py) is built in the same pass and
+written alongside, so the search page can find matching paragraphs directly,
+together with a binary copy of the index for memory-mapped server-side search
+(see binindex.py). With a ParagraphDeduper (see dedupe.py), paragraphs repeated
+from older stories are left out of all of them.
+
+The word cloud is kept up to date as well: each story's word counts are looked
+up in the previous build's wordcloud-counts.json by a hash of its text, so
+only new or changed stories are tokenized (see generate_wordcloud.py).
+"""
+
+import hashlib
+import json
+import os
+import textwrap
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from binindex import BINARY_INDEX_NAME, BinaryIndexBuilder
+from dedupe import ParagraphDeduper
+from generate_wordcloud import WORD_COUNTS_NAME, WORDCLOUD_NAME, WordCounts, write_word_cloud
+from paths import DEFAULT_OUTPUT_DIR
+from postings import PARAGRAPH_INDEX_NAME, PostingsBuilder
+from records import Story
+
+SHARD_DIR = 'search-index'
+MANIFEST_NAME = 'search-index-manifest.json'
+
+
+def _manifest_files(output_dir: str) -> Set[str]:
+    """Shard files referenced by the current manifest, if there is one"""
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return set()
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return {os.path.basename(shard['file']) for shard in json.load(f)['shards']}
+
+
+def remove_shards(output_dir: str) -> None:
+    """Delete a previous sharded build so clients fall back to the single index"""
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    shard_dir = os.path.join(output_dir, SHARD_DIR)
+    if os.path.isdir(shard_dir):
+        for name in os.listdir(shard_dir):
+            if name.startswith('shard-'):
+                os.remove(os.path.join(shard_dir, name))
+
+
+class ShardWriter:
+    """Splits search index entries into size-bounded shards plus a manifest"""
+
+    def __init__(self, output_dir: str, max_bytes: int):
+        self.output_dir = output_dir
+        self.shard_dir = os.path.join(output_dir, SHARD_DIR)
+        self.manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        self.max_bytes = max_bytes
+
+        self.shards: List[Dict] = []
+        self._pending: List[Tuple[int, str]] = []
+        self._pending_bytes = 0
+        self._written: Set[str] = set()
+
+        os.makedirs(self.shard_dir, exist_ok=True)
+
+    def add(self, story_id: int, encoded: str) -> None:
+        """Queue one minified index entry, starting a new shard when full"""
+        size = len(encoded.encode('utf-8')) + 1  # Plus the separating comma
+        if self._pending and self._pending_bytes + size > self.max_bytes:
+            self._flush()
+
+        self._pending.append((story_id, encoded))
+        self._pending_bytes += size
+
+    def _flush(self) -> None:
+        data = ('[' + ','.join(entry for _, entry in self._pending) + ']').encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"shard-{len(self.shards):03d}-{digest[:12]}.json"
+
+        path = os.path.join(self.shard_dir, name)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+        self._written.add(name)
+
+        self.shards.append({
+            'id': len(self.shards),
+            'file': f"{SHARD_DIR}/{name}",
+            'firstId': self._pending[0][0],
+            'lastId': self._pending[-1][0],
+            'count': len(self._pending),
+            'bytes': len(data),
+            'sha256': digest
+        })
+
+        self._pending = []
+        self._pending_bytes = 0
+
+    def finish(self) -> None:
+        """Write the last, partly filled shard"""
+        if self._pending:
+            self._flush()
+
+    def commit(self, total_stories: int) -> None:
+        """Write the last shard, swap in the manifest, then drop stale shards"""
+        self.finish()
+
+        manifest = {
+            'version': 1,
+            'stories': total_stories,
+            'shards': self.shards
+        }
+
+        with open(f"{self.manifest_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{self.manifest_path}.tmp", self.manifest_path)
+
+        # A shard's FlexSearch export stays valid as long as the shard does
+        for name in os.listdir(self.shard_dir):
+            shard_name = name.replace('.flexsearch.json', '.json')
+            if name.startswith('shard-') and shard_name not in self._written:
+                os.remove(os.path.join(self.shard_dir, name))
+
+    def abort(self) -> None:
+        """Remove shards from this run that the live manifest does not use"""
+        live = _manifest_files(self.output_dir)
+        for name in self._written - live:
+            os.remove(os.path.join(self.shard_dir, name))
+
+
+class IndexWriter:
+    """Streams stories into search-index.json and stories-metadata.json"""
+
+    def __init__(self, output_dir: str = DEFAULT_OUTPUT_DIR, shard_bytes: Optional[int] = None,
+                 deduper: Optional[ParagraphDeduper] = None):
+        self.output_dir = output_dir
+        self.index_path = os.path.join(output_dir, 'search-index.json')
+        self.metadata_path = os.path.join(output_dir, 'stories-metadata.json')
+        self.paragraph_index_path = os.path.join(output_dir, PARAGRAPH_INDEX_NAME)
+        self.binary_index_path = os.path.join(output_dir, BINARY_INDEX_NAME)
+
+        # Running statistics
+        self.stories = 0
+        self.total_words = 0
+        self.total_paragraphs = 0
+
+        self._index_tmp = f"{self.index_path}.tmp"
+        self._metadata_tmp = f"{self.metadata_path}.tmp"
+        self._index_file = open(self._index_tmp, 'w', encoding='utf-8')
+        self._index_hash = hashlib.sha256()  # Of the bytes written to search-index.json
+        self._metadata_file = open(self._metadata_tmp, 'w', encoding='utf-8')
+
+        # Term -> (story, paragraph, positions) postings for the search page
+        self.postings = PostingsBuilder()
+
+        # Columnar copy of everything for mmap'ed search servers
+        self.binary_index = BinaryIndexBuilder(self.postings)
+
+        # Size-bounded shards for lazy loading in the browser
+        self.shard_writer = ShardWriter(output_dir, shard_bytes) if shard_bytes else None
+
+        # Corpus-wide near-duplicate paragraph filter
+        self.deduper = deduper
+
+        # Per-story word counts from the last build, updated by difference
+        self.word_counts = WordCounts.load(os.path.join(output_dir, WORD_COUNTS_NAME))
+        self.wordcloud_path = os.path.join(output_dir, WORDCLOUD_NAME)
+
+    def __enter__(self) -> 'IndexWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None and self.stories:
+            self.commit()
+        else:
+            self.abort()
+
+    def add(self, story: Union[Story, Dict]) -> int:
+        """Append one story to both files and return its id"""
+        story = Story.coerce(story)
+        story_id = self.stories
+        content = self.deduper.filter(story_id, story) if self.deduper else list(story.iter_content())
+
+        # Search index entry (full content for searching)
+        entry = {
+            'id': story_id,
+            'title': story.title,
+            'subtitle': story.subtitle,
+            'author': story.author,
+            'content': content,
+            'tags': story.tags
+        }
+
+        # Metadata entry (for display). Word counts were taken when the story was
+        # built; only a story that lost duplicate paragraphs needs recounting
+        if len(content) == len(story):
+            word_count = story.word_count
+        else:
+            word_count = sum(len(paragraph.split()) for paragraph in content)
+        metadata = {
+            'id': story_id,
+            'title': story.title,
+            'subtitle': story.subtitle,
+            'url': story.url,
+            'author': story.author,
+            'date': story.date,
+            'wordCount': word_count,
+            'tags': story.tags
+        }
+
+        # Search index is minified for size, metadata is pretty for debugging
+        encoded = json.dumps(entry, separators=(',', ':'), ensure_ascii=False)
+        self._write_index(('[' if story_id == 0 else ',') + encoded)
+
+        if self.shard_writer:
+            self.shard_writer.add(story_id, encoded)
+
+        self._metadata_file.write('[\n' if story_id == 0 else ',\n')
+        self._metadata_file.write(textwrap.indent(json.dumps(metadata, indent=2, ensure_ascii=False), '  '))
+
+        self.word_counts.add(entry)
+
+        content_tokens = self.postings.add(story_id, content)
+        self.binary_index.add(story_id, story, content, content_tokens)
+
+        self.stories += 1
+        self.total_words += word_count
+        self.total_paragraphs += len(content)
+
+        return story_id
+
+    def _write_index(self, text: str) -> None:
+        self._index_file.write(text)
+        self._index_hash.update(text.encode('utf-8'))
+
+    def source(self) -> Dict:
+        """Checksums of the index files, recorded in files derived from them"""
+        source = {'sha256': self._index_hash.hexdigest()}
+        if self.shard_writer:
+            self.shard_writer.finish()
+            source['shards'] = [shard['sha256'] for shard in self.shard_writer.shards]
+        return source
+
+    def commit(self) -> None:
+        """Close both arrays and atomically move the files into place"""
+        self._write_index(']' if self.stories else '[]')
+        self._metadata_file.write('\n]' if self.stories else '[]')
+        self._index_file.close()
+        self._metadata_file.close()
+
+        paragraph_index_tmp = f"{self.paragraph_index_path}.tmp"
+        self.postings.write(paragraph_index_tmp, self.stories, self.source())
+        binary_index_tmp = f"{self.binary_index_path}.tmp"
+        self.binary_index.write(binary_index_tmp)
+
+        os.replace(self._index_tmp, self.index_path)
+        os.replace(self._metadata_tmp, self.metadata_path)
+        os.replace(paragraph_index_tmp, self.paragraph_index_path)
+        os.replace(binary_index_tmp, self.binary_index_path)
+
+        if self.shard_writer:
+            self.shard_writer.commit(self.stories)
+        else:
+            remove_shards(self.output_dir)
+
+        self.word_counts.commit()
+        write_word_cloud(self.word_counts, self.output_dir)
+
+    def abort(self) -> None:
+        """Discard the partial output, leaving the previous files untouched"""
+        for f, path in ((self._index_file, self._index_tmp), (self._metadata_file, self._metadata_tmp)):
+            f.close()
+            if os.path.exists(path):
+                os.remove(path)
+
+        if self.shard_writer:
+            self.shard_writer.abort()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Counters and timers for a scrape run
+
+Metrics collects named counters and timing observations, each with optional
+labels, from every stage of the pipeline: requests by kind and status, bytes
+downloaded, fetch time split into connect/TLS/send/wait/transfer, HTML parse
+and per-field extraction time, retries, and paragraphs kept or dropped. At the
+end of a run it prints the slowest stages and can write a JSON report (with
+one record per request) and a Prometheus text exposition of the same numbers.
+
+InstrumentedFetcher wraps a fetch backend to record its requests. The async
+backend traces each request through httpx, so connection setup, TLS, sending,
+waiting for headers and reading the body are timed separately; httpcore
+resolves DNS inside its TCP connect, so name lookup is part of "connect". The
+requests backend only reports time to headers ("wait", which includes any
+connection setup) and body transfer.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Prefix of every exported Prometheus metric
+PROMETHEUS_PREFIX = 'protocolized_scrape'
+
+# httpx/httpcore trace steps, by the fetch stage they belong to
+TRACE_STAGES = {
+    'connect_tcp': 'connect',
+    'start_tls': 'tls',
+    'send_request_headers': 'send',
+    'send_request_body': 'send',
+    'receive_response_headers': 'wait',
+    'receive_response_body': 'transfer',
+}
+
+# (metric name, sorted (label, value) pairs)
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def _key(name: str, labels: Dict[str, object]) -> Key:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def page_kind(url: str) -> str:
+    """What part of the site a URL is, for labelling requests"""
+    if '/p/' in url:
+        return 'story'
+    if 'sitemap' in url:
+        return 'sitemap'
+    if '/archive' in url:
+        return 'archive'
+    if '/t/' in url:
+        return 'tag'
+    return 'other'
+
+
+class Metrics:
+    """Thread-safe counters and timers for one scrape run
+
+    Copies pickled into worker processes start empty; take() hands their
+    numbers back and merge() adds them to the parent's.
+    """
+
+    def __init__(self):
+        self.counters: Counter = Counter()
+        self.timers: Dict[Key, List[float]] = {}
+        self.requests: List[Dict] = []  # One record per HTTP request
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        """Add to a counter"""
+        with self._lock:
+            self.counters[_key(name, labels)] += value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Record one timing"""
+        key = _key(name, labels)
+        with self._lock:
+            self.timers.setdefault(key, []).append(seconds)
+
+    @contextmanager
+    def timed(self, name: str, **labels) -> Iterator[None]:
+        """Time the enclosed block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_request(self, record: Dict) -> None:
+        with self._lock:
+            self.requests.append(record)
+
+    def take(self) -> Dict:
+        """Return everything recorded so far and start again from zero"""
+        with self._lock:
+            taken = {'counters': self.counters, 'timers': self.timers, 'requests': self.requests}
+            self.counters, self.timers, self.requests = Counter(), {}, []
+        return taken
+
+    def merge(self, taken: Dict) -> None:
+        """Add what a copy of this object in another process recorded"""
+        with self._lock:
+            self.counters.update(taken['counters'])
+            for key, values in taken['timers'].items():
+                self.timers.setdefault(key, []).extend(values)
+            self.requests.extend(taken['requests'])
+
+    def to_dict(self) -> Dict:
+        """The run report: counters, timer summaries and per-request records"""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            timers = sorted((key, list(values)) for key, values in self.timers.items())
+            requests = list(self.requests)
+
+        return {
+            'started': datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            'duration_seconds': round(time.time() - self.started, 3),
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                         for (name, labels), value in counters],
+            'timers': [{'name': name, 'labels': dict(labels), 'count': len(values),
+                        'total_seconds': round(sum(values), 6),
+                        'p50_ms': round(percentile(values, 50) * 1000, 3),
+                        'p99_ms': round(percentile(values, 99) * 1000, 3),
+                        'max_ms': round(max(values) * 1000, 3)}
+                       for (name, labels), values in timers],
+            'requests': requests,
+        }
+
+    def to_prometheus(self) -> str:
+        """Counters and timer summaries in the Prometheus text exposition format"""
+        lines = []
+        typed = set()
+
+        def declare(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        report = self.to_dict()
+        for counter in report['counters']:
+            name = f"{PROMETHEUS_PREFIX}_{counter['name']}_total"
+            declare(name, 'counter')
+            lines.append(f"{name}{_labels(counter['labels'])} {counter['value']:g}")
+
+        for timer in report['timers']:
+            name = f"{PROMETHEUS_PREFIX}_{timer['name']}"
+            declare(name, 'summary')
+            for quantile, field in (('0.5', 'p50_ms'), ('0.99', 'p99_ms')):
+                labels = _labels(dict(timer['labels'], quantile=quantile))
+                lines.append(f"{name}{labels} {timer[field] / 1000:g}")
+            lines.append(f"{name}_sum{_labels(timer['labels'])} {timer['total_seconds']:g}")
+            lines.append(f"{name}_count{_labels(timer['labels'])} {timer['count']}")
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, json_path: Optional[str] = None, prometheus_path: Optional[str] = None) -> None:
+        """Write the JSON report and/or the Prometheus text file"""
+        if json_path:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=2)
+            print(f"📈 Wrote run metrics to {json_path}")
+
+        if prometheus_path:
+            with open(prometheus_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            print(f"📈 Wrote Prometheus metrics to {prometheus_path}")
+
+    def report(self, top: int = 8) -> None:
+        """Print where the run spent its time, largest totals first"""
+        timers = sorted(self.to_dict()['timers'], key=lambda timer: -timer['total_seconds'])
+        if not timers:
+            return
+
+        print("📈 Time by stage:")
+        for timer in timers[:top]:
+            labels = ','.join(f"{label}={value}" for label, value in timer['labels'].items())
+            name = f"{timer['name']}{{{labels}}}" if labels else timer['name']
+            print(f"   {timer['total_seconds']:8.2f} s  {name}  "
+                  f"n={timer['count']} p50={timer['p50_ms']:.1f} ms p99={timer['p99_ms']:.1f} ms")
+
+    def __getstate__(self) -> Dict:
+        # Locks cannot be pickled, and a copy records only its own work
+        return {'started': self.started}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__init__()
+        self.started = state['started']
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for value in labels.values())
+    return '{' + ','.join(f'{label}="{value}"' for label, value in zip(labels, escaped)) + '}'
+
+
+def request_stages(response, total: float) -> Dict[str, float]:
+    """Seconds spent in each stage of one request, as far as the backend can tell"""
+    timings = getattr(response, 'timings', None)
+    if timings:
+        return timings
+
+    # requests: elapsed runs until the headers are parsed
+    elapsed = getattr(response, 'elapsed', None)
+    if elapsed is None:
+        return {}
+    wait = elapsed.total_seconds()
+    return {'wait': wait, 'transfer': max(0.0, total - wait)}
+
+
+class InstrumentedFetcher:
+    """Fetcher wrapper recording each request's timings, status and size"""
+
+    def __init__(self, fetcher, metrics: Metrics):
+        self.fetcher = fetcher
+        self.metrics = metrics
+
+    def get(self, url: str, timeout: float = 15, headers: Optional[Dict[str, str]] = None):
+        kind = page_kind(url)
+        start = time.perf_counter()
+        try:
+            response = self.fetcher.get(url, timeout=timeout, headers=headers)
+        except Exception as e:
+            seconds = time.perf_counter() - start
+            self.metrics.count('fetch_errors', kind=kind, error=type(e).__name__)
+            self.metrics.record_request({'url': url, 'kind': kind, 'error': str(e),
+                                         'seconds': round(seconds, 6)})
+            raise
+
+        seconds = time.perf_counter() - start
+        size = len(response.content)
+        stages = request_stages(response, seconds)
+
+        self.metrics.count('requests', kind=kind, status=response.status_code)
+        self.metrics.count('bytes_downloaded', size, kind=kind)
+        self.metrics.observe('fetch_seconds', seconds, kind=kind)
+        for stage, stage_seconds in stages.items():
+            self.metrics.observe('fetch_stage_seconds', stage_seconds, stage=stage)
+
+        self.metrics.record_request({'url': url, 'kind': kind, 'status': response.status_code,
+                                     'bytes': size, 'seconds': round(seconds, 6),
+                                     'stages': {stage: round(value, 6) for stage, value in stages.items()}})
+        return response
+
+    def close(self) -> None:
+        self.fetcher.close()
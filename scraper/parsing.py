@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+HTML parser backends and targeted parsing for story pages
+
+Story pages are large but the extractors only read a handful of nodes. The
+StoryStrainer tells BeautifulSoup to build just those subtrees (the article,
+headings, <time>, author/tag/subtitle elements and content containers), which
+skips most of the page chrome, scripts and comments.
+"""
+
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# html.parser is the reference. lxml is faster but repairs bad nesting its own
+# way, so malformed pages can extract differently; it is opt-in (--parser lxml)
+PARSERS = ('html.parser', 'lxml')
+DEFAULT_PARSER = 'html.parser'
+
+# Tags the extractors read regardless of their attributes
+STORY_TAGS = {'article', 'h1', 'time'}
+
+# Substrings of the class attribute the extractor selectors match on
+STORY_CLASS_MARKERS = ('author', 'tag', 'subtitle')
+
+# Same pattern as the extractors' fallback content container search
+CONTENT_CLASS_RE = re.compile(r'content|body|post', re.I)
+
+
+class StoryStrainer(SoupStrainer):
+    """SoupStrainer that only materializes nodes used by story extraction"""
+
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        if name in STORY_TAGS:
+            return True
+
+        classes = attrs.get('class', '') if attrs else ''
+        if not isinstance(classes, str):
+            classes = ' '.join(classes)
+
+        if not classes:
+            return False
+
+        if any(marker in classes for marker in STORY_CLASS_MARKERS):
+            return True
+
+        return name == 'div' and bool(CONTENT_CLASS_RE.search(classes))
+
+
+def parse_html(content: bytes, parser: str = DEFAULT_PARSER, targeted: bool = False) -> BeautifulSoup:
+    """Parse a page with the chosen backend, optionally keeping only story nodes"""
+    if targeted:
+        return BeautifulSoup(content, parser, parse_only=StoryStrainer())
+
+    return BeautifulSoup(content, parser)
@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+"""
+Where the generated site files live
+
+Kept apart from index_writer.py so that search.py and server.py, which only
+read the files, do not import the whole build pipeline (word cloud, NumPy,
+dedupe) just to find them.
+"""
+
+# Relative to scraper/, where the scripts are run from
+DEFAULT_OUTPUT_DIR = '../docs'
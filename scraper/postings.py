@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Paragraph-level inverted index for the search page
+
+Maps every term to the paragraphs it occurs in as (story id, paragraph index,
+positions) postings, so the browser can go straight to the matching paragraphs
+of a hit instead of rescanning each one, and can match phrases by position.
+
+Each term's postings are a run of unsigned LEB128 varints, base64 encoded:
+
+    story delta, paragraph, position count, position deltas...
+
+The story id is relative to the previous posting of the term. The paragraph
+index is relative to the previous posting too when it is in the same story,
+otherwise it is absolute. Positions count tokens from the start of the
+paragraph, each relative to the one before.
+
+Tokens are runs of word characters of the lowercased text; search.js uses the
+equivalent Unicode pattern, so both sides agree on terms and positions.
+"""
+
+import base64
+import json
+import re
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+PARAGRAPH_INDEX_NAME = 'paragraph-index.json'
+
+# Story fields the search engines index
+FIELDS = ('title', 'subtitle', 'author', 'content')
+
+TOKEN_RE = re.compile(r'\w+')
+
+Posting = Tuple[int, int, List[int]]  # (story id, paragraph index, positions)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms"""
+    return TOKEN_RE.findall(text.lower())
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varints(data: bytes) -> Iterator[int]:
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = shift = 0
+
+
+def decode_postings(encoded: Union[str, bytes]) -> List[Posting]:
+    """Decode one term's postings (raw or base64) into (story, paragraph, positions)"""
+    if isinstance(encoded, str):
+        encoded = base64.b64decode(encoded)
+
+    numbers = _read_varints(encoded)
+    postings = []
+    story = paragraph = 0
+
+    for story_delta in numbers:
+        story += story_delta
+        para = next(numbers)
+        paragraph = paragraph + para if story_delta == 0 and postings else para
+
+        positions = []
+        position = 0
+        for _ in range(next(numbers)):
+            position += next(numbers)
+            positions.append(position)
+
+        postings.append((story, paragraph, positions))
+
+    return postings
+
+
+class PostingsBuilder:
+    """Accumulates encoded postings as stories are added in id order"""
+
+    def __init__(self):
+        # term -> [encoded postings, last story id, last paragraph index]
+        self._terms: Dict[str, list] = {}
+        self.postings = 0
+
+    def add(self, story_id: int, paragraphs: Sequence[str]) -> int:
+        """Index every paragraph of one story; returns the number of tokens"""
+        tokens = 0
+        for paragraph_idx, text in enumerate(paragraphs):
+            positions: Dict[str, List[int]] = {}
+            for position, term in enumerate(tokenize(text)):
+                positions.setdefault(term, []).append(position)
+                tokens += 1
+
+            for term, term_positions in positions.items():
+                entry = self._terms.get(term)
+                if entry is None:
+                    entry = self._terms[term] = [bytearray(), 0, 0]
+                out, last_story, last_paragraph = entry
+                same_story = bool(out) and story_id == last_story
+
+                _write_varint(out, story_id - last_story)
+                _write_varint(out, paragraph_idx - last_paragraph if same_story else paragraph_idx)
+
+                _write_varint(out, len(term_positions))
+                previous = 0
+                for position in term_positions:
+                    _write_varint(out, position - previous)
+                    previous = position
+
+                entry[1] = story_id
+                entry[2] = paragraph_idx
+                self.postings += 1
+
+        return tokens
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def encoded(self) -> List[Tuple[str, bytes]]:
+        """(term, raw varint postings) pairs in term order"""
+        return [(term, bytes(self._terms[term][0])) for term in sorted(self._terms)]
+
+    def to_json(self, stories: int, source: Optional[Dict] = None) -> Dict:
+        """Sorted terms with their postings, as written to paragraph-index.json
+
+        source holds checksums of the search index files the postings were built
+        with, which search.js compares before trusting them.
+        """
+        encoded = self.encoded()
+        data = {
+            'version': 1,
+            'stories': stories,
+            'terms': [term for term, _ in encoded],
+            'postings': [base64.b64encode(data).decode('ascii') for _, data in encoded]
+        }
+        if source is not None:
+            data['source'] = source
+        return data
+
+    def write(self, path: str, stories: int, source: Optional[Dict] = None) -> None:
+        """Write the index as minified JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(stories, source), f, separators=(',', ':'), ensure_ascii=False)
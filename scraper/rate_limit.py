@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Rate limiting helpers shared by the scrapers
+
+TokenBucket enforces a fixed request rate across worker threads.
+AdaptiveRateLimiter moves that rate with the origin's responses: it climbs
+while responses come back quickly, and backs off at once when the server says
+it is overloaded (429/503, honouring Retry-After) or requests start failing.
+RateLimitedFetcher applies a limiter to every request a fetcher makes.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Mapping, Optional
+
+# Responses that mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting requests per second across workers
+
+    clock and sleep default to time.monotonic and time.sleep; tests pass a
+    fake pair to step time deterministically.
+    """
+
+    def __init__(self, rate: float = 1.0, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = rate  # Tokens added per second
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = 1.0  # Allow the first request straight away
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self) -> None:
+        """Block until a token is available, then consume it"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                wait = self._pause_remaining(now)
+                if wait <= 0:
+                    self._refill(now)
+
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+
+                    wait = (1 - self._tokens) / self.rate
+
+            self._sleep(wait)
+
+    def _pause_remaining(self, now: float) -> float:
+        """Seconds every request must still wait regardless of tokens"""
+        return 0.0
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP-date)
+
+    now is the current Unix time for HTTP-dates, time.time() by default.
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - (time.time() if now is None else now))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 2.0, cap: float = 60.0) -> float:
+    """Exponential backoff with jitter: between half and all of base * 2^attempt"""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """TokenBucket whose rate follows the origin (additive increase, multiplicative decrease)
+
+    The rate starts at max_rate. Each response faster than slow_seconds raises
+    it by `increase` requests/second, back up to max_rate. A 429 or 503
+    multiplies it by `decrease` and pauses every worker until the Retry-After
+    time, or for an exponential backoff if the header is missing; other 5xx
+    responses and failed requests cut the rate the same way without pausing.
+    The rate never drops below min_rate.
+    """
+
+    def __init__(self, max_rate: float = 1.0, min_rate: float = 0.1, start_rate: Optional[float] = None,
+                 increase: float = 0.25, decrease: float = 0.5, slow_seconds: float = 2.0,
+                 max_pause: float = 300.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if min_rate <= 0 or min_rate > max_rate:
+            raise ValueError("need 0 < min_rate <= max_rate")
+
+        start = start_rate if start_rate is not None else max_rate
+        super().__init__(rate=start, clock=clock, sleep=sleep)
+
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_seconds = slow_seconds
+        self.max_pause = max_pause
+
+        self._paused_until = 0.0
+        self._throttle_streak = 0  # Consecutive 429/503s, for backoff without Retry-After
+
+        # Per-run statistics
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.paused_seconds = 0.0
+        self.lowest_rate = self.highest_rate = start
+
+    def _pause_remaining(self, now: float) -> float:
+        return self._paused_until - now
+
+    def _set_rate(self, rate: float) -> None:
+        """Change the rate; the caller holds the lock"""
+        self._refill(self._clock())
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+        self.capacity = max(1.0, self.rate)
+        self._tokens = min(self._tokens, self.capacity)
+        self.lowest_rate = min(self.lowest_rate, self.rate)
+        self.highest_rate = max(self.highest_rate, self.rate)
+
+    def record(self, status_code: int, headers: Mapping[str, str], elapsed: float) -> None:
+        """Adjust the rate for one completed request"""
+        with self._lock:
+            self.requests += 1
+
+            if status_code in THROTTLE_STATUSES:
+                self.throttled += 1
+                self._throttle_streak += 1
+                self._set_rate(self.rate * self.decrease)
+
+                pause = parse_retry_after(headers.get('Retry-After'))
+                if pause is None:
+                    pause = backoff_delay(self._throttle_streak - 1)
+                pause = min(pause, self.max_pause)
+
+                # Extend, never shorten, a pause another worker already started
+                now = self._clock()
+                resume = now + pause
+                if resume > self._paused_until:
+                    self.paused_seconds += resume - max(now, self._paused_until)
+                    self._paused_until = resume
+                return
+
+            self._throttle_streak = 0
+            if status_code >= 500:
+                self.errors += 1
+                self._set_rate(self.rate * self.decrease)
+            elif elapsed < self.slow_seconds:
+                self._set_rate(self.rate + self.increase)
+
+    def record_error(self) -> None:
+        """A request failed without a response (timeout, connection reset)"""
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+            self._set_rate(self.rate * self.decrease)
+
+    def report(self) -> None:
+        """Print this run's request statistics"""
+        if not self.requests:
+            return
+
+        print(f"🚦 {self.requests} requests ({self.throttled} throttled, {self.errors} failed); "
+              f"rate {self.lowest_rate:.2f}-{self.highest_rate:.2f}/s, ended at {self.rate:.2f}/s; "
+              f"paused {self.paused_seconds:.1f} s")
+
+
+class RateLimitedFetcher:
+    """Fetcher wrapper that takes a limiter token for every request and reports how it went"""
+
+    def __init__(self, fetcher, limiter: AdaptiveRateLimiter):
+        self.fetcher = fetcher
+        self.limiter = limiter
+
+    def get(self, url: str, timeout: float = 15, headers: Optional[Dict[str, str]] = None):
+        self.limiter.acquire()
+
+        start = time.monotonic()
+        try:
+            response = self.fetcher.get(url, timeout=timeout, headers=headers)
+        except Exception:
+            self.limiter.record_error()
+            raise
+
+        self.limiter.record(response.status_code, response.headers, time.monotonic() - start)
+        return response
+
+    def close(self) -> None:
+        self.fetcher.close()
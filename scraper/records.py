@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Compact story records for the scraper pipeline
+
+A Story keeps its paragraphs in one newline-joined UTF-8 buffer with an array
+of start offsets, instead of a list of separate strings, and computes each
+paragraph's word count and hash once when it is built. (A bytes buffer stays at
+about one byte per character; a str would widen the whole story to two bytes
+per character for a single curly quote.) Later stages (crawl
+state, index writers, word cloud) read those instead of splitting the text
+again.
+
+Stories still behave like the old dicts where it matters: story['title']
+works, to_dict() gives the JSON shape stored in crawl-state.sqlite and
+search-index.json, and Story.coerce() accepts either form.
+"""
+
+import hashlib
+from array import array
+from typing import Dict, Iterator, List, Sequence, Union
+
+# Joins paragraphs in the buffer. Offsets make slicing exact whatever the
+# paragraphs contain; this only keeps word boundaries when the whole buffer is
+# tokenized at once, as ' '.join(content) used to
+SEPARATOR = '\n'
+
+
+def paragraph_hash(text: Union[str, bytes]) -> int:
+    """Stable 64-bit hash of a paragraph's text"""
+    if isinstance(text, str):
+        text = text.encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(text, digest_size=8).digest(), 'little')
+
+
+class Paragraph:
+    """One paragraph with its precomputed word count and hash"""
+
+    __slots__ = ('index', 'text', 'word_count', 'hash')
+
+    def __init__(self, index: int, text: str, word_count: int, hash: int):
+        self.index = index
+        self.text = text
+        self.word_count = word_count
+        self.hash = hash
+
+    def __repr__(self) -> str:
+        return f"Paragraph({self.index}, {self.text[:40]!r}, words={self.word_count})"
+
+
+class Story:
+    """A scraped story with its paragraphs packed into one text buffer"""
+
+    __slots__ = ('title', 'subtitle', 'author', 'url', 'date', 'tags',
+                 'buffer', 'offsets', 'word_counts', 'hashes')
+
+    # Keys of the dict form, in the order they are written out
+    KEYS = ('title', 'subtitle', 'author', 'url', 'date', 'tags', 'content')
+
+    def __init__(self, title: str, subtitle: str = '', author: str = 'Unknown', url: str = '',
+                 date: str = '', tags: Sequence[str] = (), content: Sequence[str] = ()):
+        self.title = title
+        self.subtitle = subtitle
+        self.author = author
+        self.url = url
+        self.date = date
+        self.tags = list(tags)
+
+        # Paragraph i is buffer[offsets[i]:offsets[i + 1] - 1], UTF-8 encoded
+        encoded = [paragraph.encode('utf-8') for paragraph in content]
+        self.buffer = SEPARATOR.encode('utf-8').join(encoded)
+        self.offsets = array('I', [0])
+        for paragraph in encoded:
+            self.offsets.append(self.offsets[-1] + len(paragraph) + 1)
+
+        self.word_counts = array('I', (len(paragraph.split()) for paragraph in content))
+        self.hashes = array('Q', (paragraph_hash(paragraph) for paragraph in encoded))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Story':
+        return cls(
+            title=data['title'],
+            subtitle=data.get('subtitle', ''),
+            author=data.get('author', 'Unknown'),
+            url=data.get('url', ''),
+            date=data.get('date', ''),
+            tags=data.get('tags', ()),
+            content=data.get('content', ()),
+        )
+
+    @classmethod
+    def coerce(cls, story: Union['Story', Dict]) -> 'Story':
+        """Accept a Story or a story dict (e.g. loaded from JSON)"""
+        return story if isinstance(story, cls) else cls.from_dict(story)
+
+    def to_dict(self) -> Dict:
+        return {key: self[key] for key in self.KEYS}
+
+    def __len__(self) -> int:
+        """Number of paragraphs"""
+        return len(self.word_counts)
+
+    def paragraph_text(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        return self.buffer[self.offsets[i]:self.offsets[i + 1] - 1].decode('utf-8')
+
+    @property
+    def text(self) -> str:
+        """All paragraphs as one newline-separated string"""
+        return self.buffer.decode('utf-8')
+
+    def iter_content(self) -> Iterator[str]:
+        """Paragraph strings, decoded one at a time straight from the buffer
+
+        Single-pass consumers (index writer, deduper) should use this rather
+        than content, which builds a new list on every access.
+        """
+        buffer, offsets = self.buffer, self.offsets
+        for i in range(len(self)):
+            yield buffer[offsets[i]:offsets[i + 1] - 1].decode('utf-8')
+
+    @property
+    def content(self) -> List[str]:
+        """Paragraph strings (decoded from the buffer on each access)"""
+        return list(self.iter_content())
+
+    def paragraphs(self) -> Iterator[Paragraph]:
+        for i, text in enumerate(self.iter_content()):
+            yield Paragraph(i, text, self.word_counts[i], self.hashes[i])
+
+    @property
+    def word_count(self) -> int:
+        return sum(self.word_counts)
+
+    def __getitem__(self, key: str):
+        """Dict-style field access, for code written against story dicts"""
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.KEYS else default
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Story):
+            other = other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None  # Mutable, like the dicts it replaces
+
+    def __repr__(self) -> str:
+        return f"Story({self.title!r}, {len(self)} paragraphs)"
@@ -5,42 +5,114 @@ Fetches stories from https://protocolized.summerofprotocols.com/t/stories
 and builds a searchable JSON index.
 """
 
-import requests
-from bs4 import BeautifulSoup
-import json
+import os
 import time
-import re
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional, Union
 import sys
 
+from crawl_state import DEFAULT_STATE_PATH, CrawlState
+from dedupe import ParagraphDeduper
+from discovery import DEFAULT_BASE_URL
+from extract import DEFAULT_BOILERPLATE_PATH, BoilerplateFilter, StoryExtractor, StoryParser
+from fetchers import BACKENDS, create_fetcher
+from flexsearch_export import export_flexsearch
+from html_cache import DEFAULT_CACHE_DIR, CachingFetcher, HtmlCache
+from instrumentation import InstrumentedFetcher, Metrics
+from index_writer import DEFAULT_OUTPUT_DIR, IndexWriter
+from parsing import DEFAULT_PARSER, PARSERS, parse_html
+from rate_limit import AdaptiveRateLimiter, RateLimitedFetcher, backoff_delay
+from records import Story
+
 
 class ProtocolizedScraper:
     """Scraper for Protocolized Substack stories"""
 
-    def __init__(self, limit: Optional[int] = None):
-        self.base_url = "https://protocolized.summerofprotocols.com"
+    # Selectors tried in order; the first one that matches wins
+    TITLE_SELECTORS = [
+        'h1.post-title',
+        'h1[class*="post-title"]',
+        'h1.headline',
+        'article h1'
+    ]
+    SUBTITLE_SELECTORS = [
+        'h3.subtitle',
+        '.subtitle',
+        'h2.subtitle'
+    ]
+
+    # Every element matching these contributes an author / tag
+    AUTHOR_SELECTOR = '.author-name, .pencraft-author-name, [class*="author"]'
+    TAG_SELECTOR = '.post-tag, [class*="tag"]'
+
+    def __init__(self, limit: Optional[int] = None, backend: str = 'requests', http2: bool = False,
+                 incremental: bool = False, state_path: str = DEFAULT_STATE_PATH,
+                 cache: bool = False, replay: bool = False, cache_dir: str = DEFAULT_CACHE_DIR,
+                 parser: str = DEFAULT_PARSER, targeted: bool = True,
+                 output_dir: str = DEFAULT_OUTPUT_DIR, shard_kb: Optional[int] = None,
+                 boilerplate_path: str = DEFAULT_BOILERPLATE_PATH, dedupe: Optional[str] = None,
+                 rate: float = 1.0, base_url: str = DEFAULT_BASE_URL,
+                 metrics_json: Optional[str] = None, metrics_prom: Optional[str] = None):
+        self.base_url = base_url.rstrip('/')  # Site root; point at a local copy to test offline
         self.stories_tag_url = f"{self.base_url}/t/stories"
         self.limit = limit  # For testing, limit number of stories
+        self.output_dir = output_dir  # Where the index files are written
+        self.shard_kb = shard_kb  # Also split the index into shards of about this size
+        self.dedupe = dedupe  # 'drop' or 'report' paragraphs repeated from older stories
+
+        # Per-stage counters and timers, written out as JSON and/or Prometheus text
+        self.metrics = Metrics()
+        self.metrics_json = metrics_json
+        self.metrics_prom = metrics_prom
+
+        # Rate limiting - be respectful: at most `rate` requests per second, less
+        # while the site is slow or throttling
+        self.rate_limiter = AdaptiveRateLimiter(max_rate=rate, min_rate=min(rate, 0.1))
+
+        # HTTP backend: blocking requests.Session by default, or pooled asyncio client
+        self.replay = replay
+        self.fetcher = None if replay else RateLimitedFetcher(
+            InstrumentedFetcher(create_fetcher(backend, http2=http2, trace=True), self.metrics),
+            self.rate_limiter)
+
+        # Raw HTML cache: record every fetch, or replay them with zero network
+        if cache or replay:
+            self.fetcher = CachingFetcher(self.fetcher, HtmlCache(cache_dir), replay=replay)
+
+        # Incremental mode: remember validators and stories between runs.
+        # Replays always re-parse, since that is what they are for.
+        self.crawl_state = CrawlState(state_path) if incremental and not replay else None
+
+        # HTML parser backend; story pages only build the nodes we extract from
+        self.parser = parser
+        self.targeted = targeted
+
+        # Single-pass extractor (extract_reference.py has the per-selector equivalent)
+        self.extractor = StoryExtractor(self.TITLE_SELECTORS, self.SUBTITLE_SELECTORS,
+                                        self.AUTHOR_SELECTOR, self.TAG_SELECTOR)
+
+        # Boilerplate phrases from a config file, checked in one pass, with hit counts
+        self.paragraph_filter = BoilerplateFilter.from_file(boilerplate_path)
+
+        # Page bytes -> Story, shared with scrape_all.py
+        self.story_parser = StoryParser(self.extractor, self.paragraph_filter, parser, targeted,
+                                        metrics=self.metrics)
 
-        # Setup session with headers
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) Protocolized-Search-Bot/1.0',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-        })
+    def scrape_all(self) -> int:
+        """Main entry point: scrape all stories and build index; returns how many were indexed"""
+        if self.crawl_state:
+            self.crawl_state.start_run()
 
-    def scrape_all(self) -> List[Dict]:
-        """Main entry point: scrape all stories and build index"""
         print(f"🔍 Fetching story list from {self.stories_tag_url}...")
 
         # Get list of story URLs
-        story_urls = self.get_story_urls()
+        with self.metrics.timed('stage_seconds', stage='discovery'):
+            story_urls = self.get_story_urls()
 
         if not story_urls:
             print("❌ No stories found!")
-            return []
+            self.report_metrics()
+            return 0
 
         print(f"✅ Found {len(story_urls)} stories")
 
@@ -48,36 +120,59 @@ class ProtocolizedScraper:
             story_urls = story_urls[:self.limit]
             print(f"⚠️  Limiting to {self.limit} stories for testing")
 
-        # Scrape each story
-        stories = []
+        # Scrape each story, streaming it into the index files as it arrives
+        with self.metrics.timed('stage_seconds', stage='crawl'):
+            indexed = self.build_index(self._scrape_stories(story_urls))
+
+        self.report_metrics()
+        return indexed
+
+    def close(self) -> None:
+        """Release the fetch backend's connections (and event loop thread) and the crawl state"""
+        if self.fetcher:
+            self.fetcher.close()
+        if self.crawl_state:
+            self.crawl_state.close()
+
+    def report_metrics(self) -> None:
+        """Print where the run spent its time and write the metrics files"""
+        for rule, count in self.paragraph_filter.hits.items():
+            self.metrics.count('paragraphs_dropped', count, rule=rule)
+
+        self.metrics.report()
+        self.metrics.write(self.metrics_json, self.metrics_prom)
+
+    def _scrape_stories(self, story_urls: List[str]) -> Iterable[Story]:
+        """Scrape stories one at a time, yielding each one that succeeds"""
+        scraped = 0
         for i, url in enumerate(story_urls, 1):
             print(f"📖 Scraping {i}/{len(story_urls)}: {url}")
 
             story_data = self.scrape_story(url)
             if story_data:
-                stories.append(story_data)
-                print(f"   ✓ Successfully scraped: {story_data['title']}")
+                scraped += 1
+                print(f"   ✓ Successfully scraped: {story_data.title}")
+                yield story_data
             else:
                 print(f"   ✗ Failed to scrape")
 
-            # Rate limiting - be respectful
-            if i < len(story_urls):
-                time.sleep(1)
-
-        print(f"\n✅ Successfully scraped {len(stories)} stories")
+        print(f"\n✅ Successfully scraped {scraped} stories")
 
-        # Build index files
-        self.build_index(stories)
+        if self.crawl_state:
+            print(f"♻️  Not modified: {self.crawl_state.not_modified}, "
+                  f"unchanged: {self.crawl_state.unchanged}, "
+                  f"updated: {self.crawl_state.updated}")
 
-        return stories
+        self.rate_limiter.report()
+        self.paragraph_filter.report()
 
     def get_story_urls(self) -> List[str]:
         """Fetch all story URLs from the stories tag page"""
         try:
-            response = self.session.get(self.stories_tag_url, timeout=15)
+            response = self.fetcher.get(self.stories_tag_url, timeout=15)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = parse_html(response.content, self.parser)
 
             # Approach 1: Try to extract from preloaded JSON in script tags
             # Substack often includes data in window._preloads
@@ -124,236 +219,109 @@ class ProtocolizedScraper:
             print(f"❌ Error fetching story URLs: {e}")
             return []
 
-    def scrape_story(self, url: str, retries: int = 3) -> Optional[Dict]:
+    def scrape_story(self, url: str, retries: int = 3) -> Optional[Story]:
         """Scrape individual story content with retry logic"""
         for attempt in range(retries):
             try:
-                response = self.session.get(url, timeout=15)
-                response.raise_for_status()
-
-                soup = BeautifulSoup(response.content, 'html.parser')
+                # Conditional GET when this page was seen on a previous run
+                headers = self.crawl_state.conditional_headers(url) if self.crawl_state else None
+                response = self.fetcher.get(url, timeout=15, headers=headers)
 
-                # Extract metadata
-                title = self._extract_title(soup)
-                subtitle = self._extract_subtitle(soup)
-                author = self._extract_author(soup)
-                date = self._extract_date(soup)
-                tags = self._extract_tags(soup)
+                # Unchanged since the last run: reuse the stored story without parsing
+                if self.crawl_state:
+                    previous = self.crawl_state.unchanged_story(url, response)
+                    if previous:
+                        return previous
 
-                # Extract content paragraphs
-                content = self._extract_content(soup)
+                response.raise_for_status()
 
-                if not title or not content:
+                # Extract metadata and content paragraphs in one pass over the tree
+                story = self.story_parser(response.content, url)
+                if story is None:
                     print(f"   ⚠️  Missing title or content")
                     return None
 
-                return {
-                    'title': title,
-                    'subtitle': subtitle,
-                    'author': author,
-                    'url': url,
-                    'date': date,
-                    'tags': tags,
-                    'content': content
-                }
+                if self.crawl_state:
+                    self.crawl_state.save(url, response, story)
+
+                return story
 
             except Exception as e:
                 print(f"   ⚠️  Attempt {attempt + 1}/{retries} failed: {e}")
                 if attempt < retries - 1:
-                    time.sleep(2)  # Wait before retry
+                    self.metrics.count('retries')
+                    time.sleep(backoff_delay(attempt))  # Wait before retry
                 else:
+                    self.metrics.count('failed_pages')
                     print(f"   ❌ Failed after {retries} attempts")
                     return None
 
         return None
 
-    def _extract_title(self, soup: BeautifulSoup) -> str:
-        """Extract story title"""
-        # Try multiple selectors
-        selectors = [
-            'h1.post-title',
-            'h1[class*="post-title"]',
-            'h1.headline',
-            'article h1'
-        ]
-
-        for selector in selectors:
-            elem = soup.select_one(selector)
-            if elem:
-                return elem.get_text(strip=True)
-
-        return ""
-
-    def _extract_subtitle(self, soup: BeautifulSoup) -> str:
-        """Extract story subtitle"""
-        selectors = [
-            'h3.subtitle',
-            '.subtitle',
-            'h2.subtitle'
-        ]
-
-        for selector in selectors:
-            elem = soup.select_one(selector)
-            if elem:
-                return elem.get_text(strip=True)
-
-        return ""
-
-    def _extract_author(self, soup: BeautifulSoup) -> str:
-        """Extract author name(s)"""
-        # Try multiple selectors
-        author_elems = soup.select('.author-name, .pencraft-author-name, [class*="author"]')
-
-        authors = []
-        for elem in author_elems:
-            text = elem.get_text(strip=True)
-            if text and text not in authors and len(text) < 100:
-                authors.append(text)
-
-        if authors:
-            return ", ".join(authors[:3])  # Max 3 authors
-
-        return "Unknown"
-
-    def _extract_date(self, soup: BeautifulSoup) -> str:
-        """Extract publication date"""
-        # Try <time> tag with datetime attribute
-        time_elem = soup.find('time')
-        if time_elem and time_elem.get('datetime'):
-            date_str = time_elem['datetime']
-            # Extract just the date part (YYYY-MM-DD)
-            return date_str[:10] if len(date_str) >= 10 else date_str
-
-        return ""
-
-    def _extract_tags(self, soup: BeautifulSoup) -> List[str]:
-        """Extract story tags"""
-        tag_elems = soup.select('.post-tag, [class*="tag"]')
-
-        tags = []
-        for elem in tag_elems:
-            text = elem.get_text(strip=True)
-            if text and text not in tags and len(text) < 50:
-                tags.append(text)
-
-        return tags[:5]  # Max 5 tags
-
-    def _extract_content(self, soup: BeautifulSoup) -> List[str]:
-        """Extract all content paragraphs"""
-        # Find the main article content
-        article = soup.find('article') or soup.find('div', class_='body') or soup.find('div', class_='post-content')
-
-        if not article:
-            # Fallback: try to find content div
-            article = soup.find('div', class_=re.compile(r'content|body|post', re.I))
-
-        if not article:
-            return []
-
-        # Extract all paragraphs
-        paragraphs = article.find_all('p')
+    def _is_valid_paragraph(self, text: str) -> bool:
+        """Check if paragraph is valid content (not boilerplate)"""
+        return self.paragraph_filter(text)
 
-        content = []
-        for p in paragraphs:
-            # Get text, preserving some structure
-            text = p.get_text(separator=' ', strip=True)
+    def build_index(self, stories: Iterable[Union[Story, Dict]]) -> int:
+        """Build search index and metadata JSON files; returns the number of stories written
 
-            # Filter out non-content paragraphs
-            if self._is_valid_paragraph(text):
-                content.append(text)
+        Stories are written out as they arrive, so this accepts a generator
+        (with --dedupe they are collected first).
+        """
+        print("\n📝 Building index files...")
 
-        return content
+        shard_bytes = self.shard_kb * 1024 if self.shard_kb else None
+        deduper = ParagraphDeduper(drop=self.dedupe == 'drop') if self.dedupe else None
+        if deduper:
+            # The copy kept depends on every story's date, so collect them all first
+            stories = [Story.coerce(story) for story in stories]
+            deduper.scan(stories)
 
-    def _is_valid_paragraph(self, text: str) -> bool:
-        """Check if paragraph is valid content (not boilerplate)"""
-        # Must be substantial
-        if len(text) < 20:
-            return False
-
-        # Filter out common boilerplate
-        boilerplate_phrases = [
-            'subscribe now',
-            'share this post',
-            'leave a comment',
-            'get 20% off',
-            'upgrade to paid',
-            'become a subscriber',
-            'already a subscriber',
-            'sign in',
-            'this post is for',
-            'give a gift subscription'
-        ]
-
-        text_lower = text.lower()
-        for phrase in boilerplate_phrases:
-            if phrase in text_lower:
-                return False
-
-        # Filter out very short "paragraphs"
-        word_count = len(text.split())
-        if word_count < 5:
-            return False
-
-        return True
-
-    def build_index(self, stories: List[Dict]) -> None:
-        """Build search index and metadata JSON files"""
-        print("\n📝 Building index files...")
+        with IndexWriter(self.output_dir, shard_bytes=shard_bytes, deduper=deduper) as writer:
+            for story in stories:
+                with self.metrics.timed('index_write_seconds'):
+                    writer.add(story)
 
-        search_index = []
-        metadata = []
-
-        for i, story in enumerate(stories):
-            # Search index entry (full content for searching)
-            search_index.append({
-                'id': i,
-                'title': story['title'],
-                'subtitle': story['subtitle'],
-                'author': story['author'],
-                'content': story['content'],
-                'tags': story['tags']
-            })
-
-            # Metadata entry (for display)
-            word_count = sum(len(p.split()) for p in story['content'])
-            metadata.append({
-                'id': i,
-                'title': story['title'],
-                'subtitle': story['subtitle'],
-                'url': story['url'],
-                'author': story['author'],
-                'date': story['date'],
-                'wordCount': word_count,
-                'tags': story['tags']
-            })
-
-        # Write search index (minified for size)
-        index_path = '../docs/search-index.json'
-        with open(index_path, 'w', encoding='utf-8') as f:
-            json.dump(search_index, f, separators=(',', ':'), ensure_ascii=False)
-
-        # Write metadata (pretty for debugging)
-        metadata_path = '../docs/stories-metadata.json'
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        if not writer.stories:
+            print("⚠️  No stories to index, keeping the existing files")
+            return 0
 
         # Calculate sizes
-        import os
-        index_size = os.path.getsize(index_path) / 1024  # KB
-        meta_size = os.path.getsize(metadata_path) / 1024  # KB
+        index_size = os.path.getsize(writer.index_path) / 1024  # KB
+        meta_size = os.path.getsize(writer.metadata_path) / 1024  # KB
 
-        print(f"✅ Created {index_path} ({index_size:.1f} KB)")
-        print(f"✅ Created {metadata_path} ({meta_size:.1f} KB)")
+        print(f"✅ Created {writer.index_path} ({index_size:.1f} KB)")
+        print(f"✅ Created {writer.metadata_path} ({meta_size:.1f} KB)")
 
-        # Print summary
-        total_words = sum(m['wordCount'] for m in metadata)
-        total_paragraphs = sum(len(s['content']) for s in stories)
+        postings_size = os.path.getsize(writer.paragraph_index_path) / 1024  # KB
+        print(f"✅ Created {writer.paragraph_index_path} ({postings_size:.1f} KB, "
+              f"{len(writer.postings):,} terms)")
+
+        binary_size = os.path.getsize(writer.binary_index_path) / 1024  # KB
+        print(f"✅ Created {writer.binary_index_path} ({binary_size:.1f} KB)")
+
+        print(f"✅ Created {writer.wordcloud_path} ({writer.word_counts.counted} stories counted, "
+              f"{writer.word_counts.reused} reused)")
+
+        if writer.shard_writer:
+            print(f"✅ Created {writer.shard_writer.manifest_path} "
+                  f"({len(writer.shard_writer.shards)} shards of up to {self.shard_kb} KB)")
 
+        # Pre-build the browser's FlexSearch index so it need not re-index on load
+        with self.metrics.timed('stage_seconds', stage='flexsearch_export'):
+            export_flexsearch(self.output_dir)
+
+        # Print summary
         print(f"\n📊 Index Statistics:")
-        print(f"   Stories: {len(stories)}")
-        print(f"   Total words: {total_words:,}")
-        print(f"   Total paragraphs: {total_paragraphs}")
-        print(f"   Avg words per story: {total_words // len(stories):,}")
+        print(f"   Stories: {writer.stories}")
+        print(f"   Total words: {writer.total_words:,}")
+        print(f"   Total paragraphs: {writer.total_paragraphs}")
+        print(f"   Avg words per story: {writer.total_words // writer.stories:,}")
+
+        if deduper:
+            deduper.report()
+
+        return writer.stories
 
 
 def main():
@@ -363,20 +331,49 @@ def main():
     parser = argparse.ArgumentParser(description='Scrape Protocolized stories')
     parser.add_argument('--limit', type=int, help='Limit number of stories (for testing)')
     parser.add_argument('--dry-run', action='store_true', help='Test without writing files')
+    parser.add_argument('--rate', type=float, default=1.0, help='Maximum requests per second')
+    parser.add_argument('--backend', choices=BACKENDS, default='requests', help='HTTP fetch backend')
+    parser.add_argument('--http2', action='store_true', help='Use HTTP/2 with the async backend')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Reuse stories that have not changed since the last run')
+    parser.add_argument('--state', default=DEFAULT_STATE_PATH, help='Crawl state database path')
+    parser.add_argument('--cache', action='store_true', help='Save fetched HTML to the response cache')
+    parser.add_argument('--replay', action='store_true',
+                        help='Rebuild the index from the response cache without network access')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Response cache directory')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='Directory for the index files')
+    parser.add_argument('--shard-kb', type=int, help='Also write the index as shards of about this many KB')
+    parser.add_argument('--parser', choices=PARSERS, default=DEFAULT_PARSER, help='HTML parser backend')
+    parser.add_argument('--full-parse', action='store_true',
+                        help='Build the whole document tree instead of only story nodes')
+    parser.add_argument('--boilerplate', default=DEFAULT_BOILERPLATE_PATH,
+                        help='File of boilerplate phrases, one per line')
+    parser.add_argument('--dedupe', choices=('drop', 'report'),
+                        help='Drop (or only count) paragraphs that near-duplicate an older story')
+    parser.add_argument('--metrics-json', help='Write a JSON report of run timings and counters here')
+    parser.add_argument('--metrics-prom', help='Write the run metrics in Prometheus text format here')
 
     args = parser.parse_args()
+    if args.http2 and args.backend != 'async':
+        parser.error("--http2 needs --backend async")
 
     print("🚀 Protocolized Story Scraper")
     print("=" * 50)
 
-    scraper = ProtocolizedScraper(limit=args.limit)
+    scraper = ProtocolizedScraper(limit=args.limit, backend=args.backend, http2=args.http2,
+                                  incremental=args.incremental, state_path=args.state,
+                                  cache=args.cache, replay=args.replay, cache_dir=args.cache_dir,
+                                  parser=args.parser, targeted=not args.full_parse,
+                                  output_dir=args.output_dir, shard_kb=args.shard_kb,
+                                  boilerplate_path=args.boilerplate, dedupe=args.dedupe, rate=args.rate,
+                                  metrics_json=args.metrics_json, metrics_prom=args.metrics_prom)
 
     try:
-        stories = scraper.scrape_all()
+        indexed = scraper.scrape_all()
 
-        if stories:
-            print(f"\n✅ Success! Scraped {len(stories)} stories")
-            print(f"📁 Index files created in ../docs/")
+        if indexed:
+            print(f"\n✅ Success! Indexed {indexed} stories")
+            print(f"📁 Index files created in {args.output_dir}/")
         else:
             print("\n❌ No stories were scraped")
             sys.exit(1)
@@ -389,6 +386,8 @@ def main():
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        scraper.close()
 
 
 if __name__ == '__main__':
@@ -4,105 +4,335 @@ Enhanced Protocolized Story Scraper
 Fetches ALL stories from archive with pagination support
 """
 
-import requests
-from bs4 import BeautifulSoup
 import json
 import time
-import re
-from typing import List, Dict, Optional, Set
+import multiprocessing
+import os
+import queue
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Set, Tuple, Union
 import sys
 
+from crawl_state import DEFAULT_STATE_PATH, CrawlState
+from dedupe import ParagraphDeduper
+from discovery import (DEFAULT_BASE_URL, SITEMAP, SITEMAP_FETCHES, SitemapEntry, archive_api_url,
+                       archive_post_urls, iter_sitemap)
+from extract import DEFAULT_BOILERPLATE_PATH, BoilerplateFilter, StoryExtractor, StoryParser
+from fetchers import BACKENDS, create_fetcher
+from flexsearch_export import export_flexsearch
+from html_cache import DEFAULT_CACHE_DIR, CachingFetcher, HtmlCache
+from instrumentation import InstrumentedFetcher, Metrics
+from index_writer import DEFAULT_OUTPUT_DIR, IndexWriter
+from parsing import DEFAULT_PARSER, PARSERS, parse_html
+from rate_limit import AdaptiveRateLimiter, RateLimitedFetcher, backoff_delay
+from records import Story
+
 
 class ProtocolizedScraperEnhanced:
     """Enhanced scraper that fetches all stories from archive"""
 
-    def __init__(self, limit: Optional[int] = None):
-        self.base_url = "https://protocolized.summerofprotocols.com"
+    # Selectors tried in order; the first one that matches wins
+    TITLE_SELECTORS = [
+        'h1.post-title',
+        'h1[class*="post-title"]',
+        'h1.headline',
+        'article h1',
+        'h1[class*="title"]'
+    ]
+    SUBTITLE_SELECTORS = [
+        'h3.subtitle',
+        '.subtitle',
+        'h2.subtitle',
+        '[class*="subtitle"]'
+    ]
+
+    # Every element matching these contributes an author / tag
+    AUTHOR_SELECTOR = '.author-name, .pencraft-author-name, [class*="author"]'
+    TAG_SELECTOR = '.post-tag, [class*="tag"]'
+    AUTHOR_EXCLUDES = ('subscribe',)
+
+    def __init__(self, limit: Optional[int] = None, workers: int = 1, rate: float = 1.0,
+                 backend: str = 'requests', http2: bool = False,
+                 incremental: bool = False, state_path: str = DEFAULT_STATE_PATH,
+                 cache: bool = False, replay: bool = False, cache_dir: str = DEFAULT_CACHE_DIR,
+                 parser: str = DEFAULT_PARSER, targeted: bool = True, parse_workers: int = 0,
+                 output_dir: str = DEFAULT_OUTPUT_DIR, shard_kb: Optional[int] = None,
+                 boilerplate_path: str = DEFAULT_BOILERPLATE_PATH, dedupe: Optional[str] = None,
+                 min_rate: float = 0.1, base_url: str = DEFAULT_BASE_URL,
+                 metrics_json: Optional[str] = None, metrics_prom: Optional[str] = None):
+        self.base_url = base_url.rstrip('/')  # Site root; point at a local copy to test offline
         self.archive_url = f"{self.base_url}/archive"
         self.limit = limit
+        self.output_dir = output_dir  # Where the index files are written
+        self.shard_kb = shard_kb  # Also split the index into shards of about this size
+        self.dedupe = dedupe  # 'drop' or 'report' paragraphs repeated from older stories
+        self.workers = max(1, workers)  # Concurrent story fetches
+
+        # Per-stage counters and timers, written out as JSON and/or Prometheus text
+        self.metrics = Metrics()
+        self.metrics_json = metrics_json
+        self.metrics_prom = metrics_prom
+
+        # Requests per second for everything fetched, shared by all workers; adapts
+        # to the origin between min_rate and rate, and pauses on 429/503
+        self.rate_limiter = AdaptiveRateLimiter(max_rate=rate, min_rate=min(rate, min_rate))
+
+        # HTTP backend: blocking requests.Session by default, or pooled asyncio client
+        self.backend = backend
+        self.replay = replay
+        self.fetcher = None if replay else RateLimitedFetcher(
+            InstrumentedFetcher(create_fetcher(backend, http2=http2, trace=True), self.metrics),
+            self.rate_limiter)
+
+        # Raw HTML cache: record every fetch, or replay them with zero network
+        if cache or replay:
+            self.fetcher = CachingFetcher(self.fetcher, HtmlCache(cache_dir), replay=replay)
+
+        # Incremental mode: remember validators and stories between runs.
+        # Replays always re-parse, since that is what they are for.
+        self.crawl_state = CrawlState(state_path) if incremental and not replay else None
+
+        # HTML parser backend; story pages only build the nodes we extract from
+        self.parser = parser
+        self.targeted = targeted
+
+        # Single-pass extractor (extract_reference.py has the per-selector equivalent)
+        self.extractor = StoryExtractor(self.TITLE_SELECTORS, self.SUBTITLE_SELECTORS,
+                                        self.AUTHOR_SELECTOR, self.TAG_SELECTOR,
+                                        author_excludes=self.AUTHOR_EXCLUDES)
+
+        # Boilerplate phrases from a config file, checked in one pass, with hit counts
+        self.paragraph_filter = BoilerplateFilter.from_file(boilerplate_path)
+
+        # Picklable page parser, so parsing can run in worker processes.
+        # parse_workers=0 parses inline in the fetch threads.
+        self.story_parser = StoryParser(self.extractor, self.paragraph_filter, parser, targeted,
+                                        metrics=self.metrics)
+        self.parse_workers = parse_workers
+
+    def scrape_all(self) -> int:
+        """Main entry point: scrape all stories from archive; returns how many were indexed"""
+        if self.crawl_state:
+            self.crawl_state.start_run()
 
-        # Setup session
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) Protocolized-Search-Bot/1.0',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-        })
-
-    def scrape_all(self) -> List[Dict]:
-        """Main entry point: scrape all stories from archive"""
         print(f"🔍 Fetching stories from archive: {self.archive_url}...")
 
         # Get all story URLs from archive (with pagination)
-        story_urls = self.get_all_story_urls()
+        with self.metrics.timed('stage_seconds', stage='discovery'):
+            story_urls = self.get_all_story_urls()
 
         if not story_urls:
             print("❌ No stories found!")
-            return []
+            self.report_metrics()
+            return 0
 
         print(f"✅ Found {len(story_urls)} unique stories")
 
+        # Sort so the index order is stable between runs
+        story_urls = sorted(story_urls)
+
         if self.limit:
-            story_urls = list(story_urls)[:self.limit]
+            story_urls = story_urls[:self.limit]
             print(f"⚠️  Limiting to {self.limit} stories for testing")
 
-        # Scrape each story
-        stories = []
-        for i, url in enumerate(story_urls, 1):
-            print(f"📖 Scraping {i}/{len(story_urls)}: {url}")
-
-            story_data = self.scrape_story(url)
-            if story_data:
-                stories.append(story_data)
-                print(f"   ✓ Successfully scraped: {story_data['title']}")
+        # Fetching, parsing and index writing overlap, so they are timed as one stage
+        with self.metrics.timed('stage_seconds', stage='crawl'):
+            # Results always come back in URL order
+            if self.parse_workers:
+                results = self._scrape_with_parse_pool(story_urls)
             else:
-                print(f"   ✗ Failed to scrape")
+                results = self._scrape_in_threads(story_urls)
+
+            # Stream each story into the index files as soon as it is scraped
+            indexed = self.build_index(self._report_progress(story_urls, results))
 
-            # Rate limiting
-            if i < len(story_urls):
-                time.sleep(1)
+        self.report_metrics()
+        return indexed
 
-        print(f"\n✅ Successfully scraped {len(stories)} stories")
+    def close(self) -> None:
+        """Release the fetch backend's connections (and event loop thread) and the crawl state"""
+        if self.fetcher:
+            self.fetcher.close()
+        if self.crawl_state:
+            self.crawl_state.close()
 
-        # Build index files
-        self.build_index(stories)
+    def report_metrics(self) -> None:
+        """Print where the run spent its time and write the metrics files"""
+        for rule, count in self.paragraph_filter.hits.items():
+            self.metrics.count('paragraphs_dropped', count, rule=rule)
 
-        return stories
+        self.metrics.report()
+        self.metrics.write(self.metrics_json, self.metrics_prom)
 
     def get_all_story_urls(self) -> Set[str]:
-        """Get all story URLs from archive with pagination"""
+        """Get all story URLs from the archive, the /t/stories tag page and the sitemap"""
         all_urls = set()
 
-        # Try multiple approaches to get all stories
+        # Sources are independent, so fetch them all at once. The sitemap comes
+        # last and returns {url: lastmod}
+        sources = [
+            ('archive', self._get_urls_from_archive),
+            ('tag page', self._get_urls_from_tag),
+            ('sitemap', self._get_urls_from_sitemap),
+        ]
 
-        # Approach 1: Archive page
-        print("   Trying archive page...")
-        urls_from_archive = self._get_urls_from_archive()
-        all_urls.update(urls_from_archive)
-        print(f"   Found {len(urls_from_archive)} from archive")
+        print("   Trying archive, tag page and sitemap concurrently...")
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            futures = [executor.submit(fetch) for _, fetch in sources]
+            results = [future.result() for future in futures]
 
-        # Approach 2: Stories tag page
-        print("   Trying /t/stories tag page...")
-        urls_from_tag = self._get_urls_from_tag()
-        all_urls.update(urls_from_tag)
-        print(f"   Found {len(urls_from_tag)} from tag page")
+        for (label, _), urls in zip(sources, results):
+            all_urls.update(urls)
+            print(f"   Found {len(urls)} from {label}")
 
-        # Approach 3: Try sitemap
-        print("   Trying sitemap...")
-        urls_from_sitemap = self._get_urls_from_sitemap()
-        all_urls.update(urls_from_sitemap)
-        print(f"   Found {len(urls_from_sitemap)} from sitemap")
+        if self.crawl_state:
+            # Pages whose lastmod has not moved since the last run are not fetched again
+            self.crawl_state.lastmods = {url: lastmod for url, lastmod in results[-1].items() if lastmod}
 
         return all_urls
 
+    def _report_progress(self, story_urls: List[str], results: Iterable[Optional[Story]]) -> Iterable[Story]:
+        """Print progress for each result in URL order, yielding scraped stories"""
+        scraped = 0
+        for i, (url, story_data) in enumerate(zip(story_urls, results), 1):
+            print(f"📖 Scraped {i}/{len(story_urls)}: {url}")
+
+            if story_data:
+                scraped += 1
+                print(f"   ✓ Successfully scraped: {story_data.title}")
+                yield story_data
+            else:
+                print(f"   ✗ Failed to scrape")
+
+        print(f"\n✅ Successfully scraped {scraped} stories")
+
+        if self.crawl_state:
+            print(f"♻️  Same sitemap lastmod: {self.crawl_state.skipped}, "
+                  f"not modified: {self.crawl_state.not_modified}, "
+                  f"unchanged: {self.crawl_state.unchanged}, "
+                  f"updated: {self.crawl_state.updated}")
+
+        self.rate_limiter.report()
+        self.paragraph_filter.report()
+
+    def _scrape_in_threads(self, story_urls: List[str]) -> Iterable[Optional[Story]]:
+        """Fetch and parse stories in the fetch thread pool"""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from executor.map(self.scrape_story, story_urls)
+
+    def _scrape_with_parse_pool(self, story_urls: List[str]) -> Iterator[Optional[Story]]:
+        """Fetch in threads and parse in a process pool, yielding results in URL order
+
+        Fetched pages and finished parses arrive on one queue. Each parse is
+        collected as soon as it completes: its story goes into the crawl state
+        and the response is dropped, so only pages still being parsed are held.
+        """
+        print(f"⚙️  Parsing in {self.parse_workers} worker processes")
+
+        # Fetch threads send (index, url, stored story, response); parses that
+        # finish send (index, None, None, None)
+        events = queue.Queue()
+        parsing: Dict[int, Tuple[str, object, Future]] = {}
+        finished: Dict[int, Optional[Story]] = {}  # Done, waiting for an earlier URL
+        next_result = 0
+
+        def fetch(i: int, url: str) -> None:
+            fetched = (None, None)
+            try:
+                fetched = self._fetch_story_page(url)
+            finally:
+                events.put((i, url) + fetched)
+
+        def parsed(i: int) -> None:
+            events.put((i, None, None, None))
+
+        context = multiprocessing.get_context('spawn')  # Fork is unsafe with fetch threads running
+        with ThreadPoolExecutor(max_workers=self.workers) as fetch_pool, \
+                ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=context) as parse_pool:
+            for i, url in enumerate(story_urls):
+                fetch_pool.submit(fetch, i, url)
+
+            while next_result < len(story_urls):
+                i, url, stored, response = events.get()
+                if url is None:
+                    url, response, future = parsing.pop(i)
+                    finished[i] = self._finish_story(url, response, lambda: self._collect_parse(future))
+                elif response is None:
+                    finished[i] = stored
+                else:
+                    # Only raw bytes go out; compact stories and filter hit counts come back
+                    future = parse_pool.submit(self.story_parser.parse_with_hits, response.content, url)
+                    parsing[i] = (url, response, future)
+                    future.add_done_callback(lambda _, i=i: parsed(i))
+
+                while next_result in finished:
+                    yield finished.pop(next_result)
+                    next_result += 1
+
+    def _collect_parse(self, future) -> Optional[Story]:
+        """Result of a worker process parse, merging its filter hits and metrics into ours"""
+        story, hits, metrics = future.result()
+        self.paragraph_filter.merge_hits(hits)
+        if metrics:
+            self.metrics.merge(metrics)
+        return story
+
+    def _finish_story(self, url: str, response, parse: Callable[[], Optional[Story]]) -> Optional[Story]:
+        """Run (or collect) the parse of a fetched page and record it in the crawl state"""
+        try:
+            story = parse()
+        except Exception as e:
+            print(f"   ❌ Failed to parse {url}: {e}")
+            return None
+
+        if story and self.crawl_state:
+            self.crawl_state.save(url, response, story)
+
+        return story
+
     def _get_urls_from_archive(self) -> Set[str]:
+        """Get story URLs from every page of the archive API, or else the archive page"""
+        urls = set()
+        offset = 0
+
+        while True:
+            try:
+                posts = self._fetch_archive_api_page(offset)
+            except Exception as e:
+                if offset == 0:
+                    print(f"      ⚠️  Archive API unavailable ({e}), reading the archive page")
+                    return self._get_urls_from_archive_page()
+                print(f"      ⚠️  Error fetching archive API at offset {offset}: {e}")
+                break
+
+            # Stop at the end, or if the server ignores the offset and repeats itself
+            new_urls = set(archive_post_urls(posts, self.base_url)) - urls
+            if not posts or not new_urls:
+                break
+
+            urls.update(new_urls)
+            offset += len(posts)
+
+        return urls
+
+    def _fetch_archive_api_page(self, offset: int) -> List[Dict]:
+        """One page of posts from the archive API, newest first"""
+        response = self.fetcher.get(archive_api_url(self.base_url, offset), timeout=15)
+        response.raise_for_status()
+
+        posts = json.loads(response.content)
+        if not isinstance(posts, list):
+            raise ValueError("archive API did not return a list of posts")
+        return posts
+
+    def _get_urls_from_archive_page(self) -> Set[str]:
         """Get story URLs from archive page"""
         urls = set()
 
         try:
-            response = self.session.get(self.archive_url, timeout=15)
+            response = self.fetcher.get(self.archive_url, timeout=15)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = parse_html(response.content, self.parser)
 
             # Find all post links
             # Substack archive uses various link structures
@@ -132,9 +362,9 @@ class ProtocolizedScraperEnhanced:
 
         try:
             tag_url = f"{self.base_url}/t/stories"
-            response = self.session.get(tag_url, timeout=15)
+            response = self.fetcher.get(tag_url, timeout=15)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = parse_html(response.content, self.parser)
 
             # Find all post links
             selectors = [
@@ -155,28 +385,43 @@ class ProtocolizedScraperEnhanced:
 
         return urls
 
-    def _get_urls_from_sitemap(self) -> Set[str]:
-        """Try to get URLs from sitemap.xml"""
-        urls = set()
+    def _get_urls_from_sitemap(self) -> Dict[str, str]:
+        """Get story URLs and their lastmod dates from sitemap.xml, following sitemap indexes"""
+        urls = {}
+        pending = [f"{self.base_url}/sitemap.xml"]
+        seen = set(pending)
+
+        # Each round fetches the sitemaps listed by the previous one
+        with ThreadPoolExecutor(max_workers=SITEMAP_FETCHES) as executor:
+            while pending:
+                listed = []
+                for entries in executor.map(self._fetch_sitemap, pending):
+                    for kind, loc, lastmod in entries:
+                        if kind == SITEMAP:
+                            if loc not in seen:
+                                seen.add(loc)
+                                listed.append(loc)
+                        elif '/p/' in loc:
+                            urls[loc] = lastmod
+                pending = listed
+
+        return urls
+
+    def _fetch_sitemap(self, url: str) -> List[SitemapEntry]:
+        """Entries of one sitemap, or as many as could be read"""
+        entries = []
 
         try:
-            sitemap_url = f"{self.base_url}/sitemap.xml"
-            response = self.session.get(sitemap_url, timeout=15)
+            response = self.fetcher.get(url, timeout=15)
 
             if response.status_code == 200:
-                # Parse XML sitemap
-                soup = BeautifulSoup(response.content, 'xml')
-                loc_tags = soup.find_all('loc')
-
-                for loc in loc_tags:
-                    url = loc.text.strip()
-                    if '/p/' in url:
-                        urls.add(url)
+                for entry in iter_sitemap(response.content):
+                    entries.append(entry)
 
         except Exception as e:
-            print(f"      ⚠️  Sitemap not available: {e}")
+            print(f"      ⚠️  Error reading sitemap {url}: {e}")
 
-        return urls
+        return entries
 
     def _make_absolute_url(self, href: str) -> str:
         """Convert relative URL to absolute"""
@@ -188,216 +433,115 @@ class ProtocolizedScraperEnhanced:
             full_url = self.base_url + href
             return full_url.split('?')[0].split('#')[0]
 
-    def scrape_story(self, url: str, retries: int = 3) -> Optional[Dict]:
+    def scrape_story(self, url: str, retries: int = 3) -> Optional[Story]:
         """Scrape individual story content with retry logic"""
+        stored, response = self._fetch_story_page(url, retries)
+        if response is None:
+            return stored
+
+        return self._finish_story(url, response, lambda: self.story_parser(response.content, url))
+
+    def _fetch_story_page(self, url: str, retries: int = 3) -> Tuple[Optional[Story], Optional[object]]:
+        """Fetch a story page with retry logic
+
+        Returns (stored story, None) when the crawl state shows the page is
+        unchanged, (None, response) when it needs parsing, and (None, None)
+        when every attempt failed.
+        """
+        # Sitemap lastmod unchanged since the last run: no request at all
+        stored = self.crawl_state.fresh_story(url) if self.crawl_state else None
+        if stored:
+            return stored, None
+
         for attempt in range(retries):
             try:
-                response = self.session.get(url, timeout=15)
-                response.raise_for_status()
+                # Conditional GET when this page was seen on a previous run
+                headers = self.crawl_state.conditional_headers(url) if self.crawl_state else None
+                response = self.fetcher.get(url, timeout=15, headers=headers)
+
+                # Unchanged since the last run: reuse the stored story without parsing
+                if self.crawl_state:
+                    previous = self.crawl_state.unchanged_story(url, response)
+                    if previous:
+                        return previous, None
 
-                soup = BeautifulSoup(response.content, 'html.parser')
-
-                # Extract metadata
-                title = self._extract_title(soup)
-                subtitle = self._extract_subtitle(soup)
-                author = self._extract_author(soup)
-                date = self._extract_date(soup)
-                tags = self._extract_tags(soup)
-                content = self._extract_content(soup)
-
-                if not title or not content:
-                    return None
-
-                return {
-                    'title': title,
-                    'subtitle': subtitle,
-                    'author': author,
-                    'url': url,
-                    'date': date,
-                    'tags': tags,
-                    'content': content
-                }
+                response.raise_for_status()
+                return None, response
 
             except Exception as e:
                 if attempt < retries - 1:
-                    time.sleep(2)
+                    self.metrics.count('retries')
+                    time.sleep(backoff_delay(attempt))
                 else:
+                    self.metrics.count('failed_pages')
                     print(f"   ❌ Failed after {retries} attempts: {e}")
-                    return None
-
-        return None
-
-    def _extract_title(self, soup: BeautifulSoup) -> str:
-        """Extract story title"""
-        selectors = [
-            'h1.post-title',
-            'h1[class*="post-title"]',
-            'h1.headline',
-            'article h1',
-            'h1[class*="title"]'
-        ]
-
-        for selector in selectors:
-            elem = soup.select_one(selector)
-            if elem:
-                return elem.get_text(strip=True)
-
-        return ""
-
-    def _extract_subtitle(self, soup: BeautifulSoup) -> str:
-        """Extract story subtitle"""
-        selectors = [
-            'h3.subtitle',
-            '.subtitle',
-            'h2.subtitle',
-            '[class*="subtitle"]'
-        ]
-
-        for selector in selectors:
-            elem = soup.select_one(selector)
-            if elem:
-                return elem.get_text(strip=True)
 
-        return ""
+        return None, None
 
-    def _extract_author(self, soup: BeautifulSoup) -> str:
-        """Extract author name(s)"""
-        author_elems = soup.select('.author-name, .pencraft-author-name, [class*="author"]')
-
-        authors = []
-        for elem in author_elems:
-            text = elem.get_text(strip=True)
-            if text and text not in authors and len(text) < 100 and 'subscribe' not in text.lower():
-                authors.append(text)
-
-        return ", ".join(authors[:3]) if authors else "Unknown"
-
-    def _extract_date(self, soup: BeautifulSoup) -> str:
-        """Extract publication date"""
-        time_elem = soup.find('time')
-        if time_elem and time_elem.get('datetime'):
-            date_str = time_elem['datetime']
-            return date_str[:10] if len(date_str) >= 10 else date_str
-
-        return ""
-
-    def _extract_tags(self, soup: BeautifulSoup) -> List[str]:
-        """Extract story tags"""
-        tag_elems = soup.select('.post-tag, [class*="tag"]')
-
-        tags = []
-        for elem in tag_elems:
-            text = elem.get_text(strip=True)
-            if text and text not in tags and len(text) < 50:
-                tags.append(text)
-
-        return tags[:5]
-
-    def _extract_content(self, soup: BeautifulSoup) -> List[str]:
-        """Extract all content paragraphs"""
-        article = soup.find('article') or soup.find('div', class_='body') or soup.find('div', class_='post-content')
+    def _is_valid_paragraph(self, text: str) -> bool:
+        """Check if paragraph is valid content"""
+        return self.paragraph_filter(text)
 
-        if not article:
-            article = soup.find('div', class_=re.compile(r'content|body|post', re.I))
+    def build_index(self, stories: Iterable[Union[Story, Dict]]) -> int:
+        """Build search index and metadata JSON files; returns the number of stories written
 
-        if not article:
-            return []
+        Stories are written out as they arrive, so this accepts a generator
+        (with --dedupe they are collected first).
+        """
+        print("\n📝 Building index files...")
 
-        paragraphs = article.find_all('p')
-        content = []
+        shard_bytes = self.shard_kb * 1024 if self.shard_kb else None
+        deduper = ParagraphDeduper(drop=self.dedupe == 'drop') if self.dedupe else None
+        if deduper:
+            # The copy kept depends on every story's date, so collect them all first
+            stories = [Story.coerce(story) for story in stories]
+            deduper.scan(stories)
 
-        for p in paragraphs:
-            text = p.get_text(separator=' ', strip=True)
-            if self._is_valid_paragraph(text):
-                content.append(text)
+        with IndexWriter(self.output_dir, shard_bytes=shard_bytes, deduper=deduper) as writer:
+            for story in stories:
+                with self.metrics.timed('index_write_seconds'):
+                    writer.add(story)
 
-        return content
+        if not writer.stories:
+            print("⚠️  No stories to index, keeping the existing files")
+            return 0
 
-    def _is_valid_paragraph(self, text: str) -> bool:
-        """Check if paragraph is valid content"""
-        if len(text) < 20:
-            return False
-
-        boilerplate_phrases = [
-            'subscribe now',
-            'share this post',
-            'leave a comment',
-            'get 20% off',
-            'upgrade to paid',
-            'become a subscriber',
-            'already a subscriber',
-            'sign in',
-            'this post is for',
-            'give a gift subscription'
-        ]
+        # Calculate sizes
+        index_size = os.path.getsize(writer.index_path) / 1024  # KB
+        meta_size = os.path.getsize(writer.metadata_path) / 1024  # KB
 
-        text_lower = text.lower()
-        for phrase in boilerplate_phrases:
-            if phrase in text_lower:
-                return False
+        print(f"✅ Created {writer.index_path} ({index_size:.1f} KB)")
+        print(f"✅ Created {writer.metadata_path} ({meta_size:.1f} KB)")
 
-        word_count = len(text.split())
-        if word_count < 5:
-            return False
+        postings_size = os.path.getsize(writer.paragraph_index_path) / 1024  # KB
+        print(f"✅ Created {writer.paragraph_index_path} ({postings_size:.1f} KB, "
+              f"{len(writer.postings):,} terms)")
 
-        return True
+        binary_size = os.path.getsize(writer.binary_index_path) / 1024  # KB
+        print(f"✅ Created {writer.binary_index_path} ({binary_size:.1f} KB)")
 
-    def build_index(self, stories: List[Dict]) -> None:
-        """Build search index and metadata JSON files"""
-        print("\n📝 Building index files...")
+        print(f"✅ Created {writer.wordcloud_path} ({writer.word_counts.counted} stories counted, "
+              f"{writer.word_counts.reused} reused)")
 
-        search_index = []
-        metadata = []
-
-        for i, story in enumerate(stories):
-            search_index.append({
-                'id': i,
-                'title': story['title'],
-                'subtitle': story['subtitle'],
-                'author': story['author'],
-                'content': story['content'],
-                'tags': story['tags']
-            })
-
-            word_count = sum(len(p.split()) for p in story['content'])
-            metadata.append({
-                'id': i,
-                'title': story['title'],
-                'subtitle': story['subtitle'],
-                'url': story['url'],
-                'author': story['author'],
-                'date': story['date'],
-                'wordCount': word_count,
-                'tags': story['tags']
-            })
-
-        # Write files
-        index_path = '../docs/search-index.json'
-        with open(index_path, 'w', encoding='utf-8') as f:
-            json.dump(search_index, f, separators=(',', ':'), ensure_ascii=False)
-
-        metadata_path = '../docs/stories-metadata.json'
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        if writer.shard_writer:
+            print(f"✅ Created {writer.shard_writer.manifest_path} "
+                  f"({len(writer.shard_writer.shards)} shards of up to {self.shard_kb} KB)")
 
-        # Calculate sizes
-        import os
-        index_size = os.path.getsize(index_path) / 1024
-        meta_size = os.path.getsize(metadata_path) / 1024
+        # Pre-build the browser's FlexSearch index so it need not re-index on load
+        with self.metrics.timed('stage_seconds', stage='flexsearch_export'):
+            export_flexsearch(self.output_dir)
 
-        print(f"✅ Created {index_path} ({index_size:.1f} KB)")
-        print(f"✅ Created {metadata_path} ({meta_size:.1f} KB)")
+        # Print summary
+        print(f"\n📊 Index Statistics:")
+        print(f"   Stories: {writer.stories}")
+        print(f"   Total words: {writer.total_words:,}")
+        print(f"   Total paragraphs: {writer.total_paragraphs}")
+        print(f"   Avg words per story: {writer.total_words // writer.stories:,}")
 
-        # Summary
-        total_words = sum(m['wordCount'] for m in metadata)
-        total_paragraphs = sum(len(s['content']) for s in stories)
+        if deduper:
+            deduper.report()
 
-        print(f"\n📊 Index Statistics:")
-        print(f"   Stories: {len(stories)}")
-        print(f"   Total words: {total_words:,}")
-        print(f"   Total paragraphs: {total_paragraphs}")
-        if len(stories) > 0:
-            print(f"   Avg words per story: {total_words // len(stories):,}")
+        return writer.stories
 
 
 def main():
@@ -406,20 +550,56 @@ def main():
 
     parser = argparse.ArgumentParser(description='Scrape all Protocolized stories')
     parser.add_argument('--limit', type=int, help='Limit number of stories (for testing)')
+    parser.add_argument('--workers', type=int, default=1, help='Number of concurrent story fetches')
+    parser.add_argument('--rate', type=float, default=1.0, help='Maximum requests per second')
+    parser.add_argument('--min-rate', type=float, default=0.1,
+                        help='Lowest rate the limiter backs off to when the site is throttling')
+    parser.add_argument('--backend', choices=BACKENDS, default='requests', help='HTTP fetch backend')
+    parser.add_argument('--http2', action='store_true', help='Use HTTP/2 with the async backend')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Reuse stories that have not changed since the last run')
+    parser.add_argument('--state', default=DEFAULT_STATE_PATH, help='Crawl state database path')
+    parser.add_argument('--cache', action='store_true', help='Save fetched HTML to the response cache')
+    parser.add_argument('--replay', action='store_true',
+                        help='Rebuild the index from the response cache without network access')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Response cache directory')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='Directory for the index files')
+    parser.add_argument('--shard-kb', type=int, help='Also write the index as shards of about this many KB')
+    parser.add_argument('--parser', choices=PARSERS, default=DEFAULT_PARSER, help='HTML parser backend')
+    parser.add_argument('--full-parse', action='store_true',
+                        help='Build the whole document tree instead of only story nodes')
+    parser.add_argument('--parse-workers', type=int, nargs='?', const=os.cpu_count(), default=0,
+                        help='Parse pages in this many processes (default with no value: one per core)')
+    parser.add_argument('--boilerplate', default=DEFAULT_BOILERPLATE_PATH,
+                        help='File of boilerplate phrases, one per line')
+    parser.add_argument('--dedupe', choices=('drop', 'report'),
+                        help='Drop (or only count) paragraphs that near-duplicate an older story')
+    parser.add_argument('--metrics-json', help='Write a JSON report of run timings and counters here')
+    parser.add_argument('--metrics-prom', help='Write the run metrics in Prometheus text format here')
 
     args = parser.parse_args()
+    if args.http2 and args.backend != 'async':
+        parser.error("--http2 needs --backend async")
 
     print("🚀 Enhanced Protocolized Story Scraper")
     print("=" * 50)
 
-    scraper = ProtocolizedScraperEnhanced(limit=args.limit)
+    scraper = ProtocolizedScraperEnhanced(limit=args.limit, workers=args.workers, rate=args.rate,
+                                          backend=args.backend, http2=args.http2,
+                                          incremental=args.incremental, state_path=args.state,
+                                          cache=args.cache, replay=args.replay, cache_dir=args.cache_dir,
+                                          parser=args.parser, targeted=not args.full_parse,
+                                          parse_workers=args.parse_workers, output_dir=args.output_dir,
+                                          shard_kb=args.shard_kb, boilerplate_path=args.boilerplate,
+                                          dedupe=args.dedupe, min_rate=args.min_rate,
+                                          metrics_json=args.metrics_json, metrics_prom=args.metrics_prom)
 
     try:
-        stories = scraper.scrape_all()
+        indexed = scraper.scrape_all()
 
-        if stories:
-            print(f"\n✅ Success! Scraped {len(stories)} stories")
-            print(f"📁 Index files created in ../docs/")
+        if indexed:
+            print(f"\n✅ Success! Indexed {indexed} stories")
+            print(f"📁 Index files created in {args.output_dir}/")
         else:
             print("\n❌ No stories were scraped")
             sys.exit(1)
@@ -432,6 +612,8 @@ def main():
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        scraper.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Query the story corpus from Python
+
+Loads search-index.json into an in-memory inverted index over the title,
+subtitle, author and content fields, with content postings kept per paragraph,
+and answers queries ranked by BM25F. Query words match any indexed word they
+are a prefix of, like FlexSearch's tokenize: 'forward', and quoted text matches
+as an exact phrase. Every word or phrase must match somewhere in the story.
+
+Usage:
+    python3 search.py "protocol" '"summer of protocols"'
+    python3 search.py --repeat 100 coordination    # latency only
+    python3 search.py --index ../docs/search-index.bin protocol
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from binindex import MmapIndex
+from instrumentation import percentile
+from paths import DEFAULT_OUTPUT_DIR
+from postings import FIELDS, Posting, tokenize
+
+DEFAULT_INDEX_PATH = os.path.join(DEFAULT_OUTPUT_DIR, 'search-index.json')
+
+# BM25F field weights and length normalization
+FIELD_WEIGHTS = {'title': 3.0, 'subtitle': 2.0, 'author': 2.0, 'content': 1.0}
+FIELD_B = {'title': 0.75, 'subtitle': 0.75, 'author': 0.5, 'content': 0.75}
+K1 = 1.2
+
+# Quoted phrases, or single words outside quotes
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+# story id -> field -> paragraph index -> occurrences
+Hits = Dict[int, Dict[str, Dict[int, int]]]
+
+
+class InvertedIndex:
+    """Field-level postings for every story in search-index.json
+
+    Postings are (story id, paragraph index, positions); for fields other than
+    content the paragraph index is always 0.
+    """
+
+    def __init__(self, stories: Sequence[Dict]):
+        self._stories = list(stories)
+        self._postings: Dict[str, Dict[str, List[Posting]]] = {field: {} for field in FIELDS}
+        self._lengths: Dict[str, List[int]] = {field: [] for field in FIELDS}
+
+        for story_id, story in enumerate(self._stories):
+            for field in FIELDS:
+                value = story.get(field) or ''
+                paragraphs = value if isinstance(value, list) else [value]
+
+                length = 0
+                for paragraph_idx, text in enumerate(paragraphs):
+                    positions: Dict[str, List[int]] = {}
+                    for position, term in enumerate(tokenize(text)):
+                        positions.setdefault(term, []).append(position)
+                        length += 1
+
+                    postings = self._postings[field]
+                    for term, term_positions in positions.items():
+                        postings.setdefault(term, []).append((story_id, paragraph_idx, term_positions))
+
+                self._lengths[field].append(length)
+
+        self._terms = {field: sorted(postings) for field, postings in self._postings.items()}
+        self._avg_lengths = {
+            field: sum(lengths) / len(lengths) if lengths else 0.0
+            for field, lengths in self._lengths.items()
+        }
+
+    @classmethod
+    def load(cls, index_path: str = DEFAULT_INDEX_PATH, metadata_path: Optional[str] = None) -> 'InvertedIndex':
+        """Load search-index.json, merging url/date from the metadata file beside it"""
+        with open(index_path, 'r', encoding='utf-8') as f:
+            stories = json.load(f)
+
+        if metadata_path is None:
+            metadata_path = os.path.join(os.path.dirname(index_path), 'stories-metadata.json')
+        if os.path.exists(metadata_path):
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                metadata = {item['id']: item for item in json.load(f)}
+            for story in stories:
+                meta = metadata.get(story['id'], {})
+                story['url'] = meta.get('url', '')
+                story['date'] = meta.get('date', '')
+
+        return cls(stories)
+
+    @property
+    def num_stories(self) -> int:
+        return len(self._stories)
+
+    def close(self) -> None:
+        """Nothing to release; here so callers can close either index type"""
+
+    def terms(self, field: str) -> List[str]:
+        """Every term in a field, sorted"""
+        return self._terms[field]
+
+    def postings(self, field: str, term: str) -> List[Posting]:
+        """Postings for one exact term, in story and paragraph order"""
+        return self._postings[field].get(term, [])
+
+    def field_length(self, field: str, story_id: int) -> int:
+        """Number of tokens in one story's field"""
+        return self._lengths[field][story_id]
+
+    def avg_field_length(self, field: str) -> float:
+        return self._avg_lengths[field]
+
+    def story(self, story_id: int) -> Dict:
+        return self._stories[story_id]
+
+    def paragraph(self, story_id: int, paragraph_idx: int) -> str:
+        return self._stories[story_id]['content'][paragraph_idx]
+
+
+def open_index(path: str) -> Union[InvertedIndex, MmapIndex]:
+    """Memory-map a search-index.bin, or load a search-index.json"""
+    if path.endswith('.bin'):
+        return MmapIndex(path)
+    return InvertedIndex.load(path)
+
+
+def parse_query(query: str) -> List[Tuple[List[str], bool]]:
+    """Split a query into (terms, is_phrase) clauses"""
+    clauses = []
+    for phrase, word in QUERY_RE.findall(query):
+        if phrase:
+            terms = tokenize(phrase)
+            if terms:
+                clauses.append((terms, True))
+        else:
+            clauses.extend(([term], False) for term in tokenize(word))
+    return clauses
+
+
+class SearchEngine:
+    """BM25F ranking over an InvertedIndex or MmapIndex"""
+
+    def __init__(self, index: Union[InvertedIndex, MmapIndex], fields: Sequence[str] = FIELDS,
+                 weights: Dict[str, float] = FIELD_WEIGHTS, b: Dict[str, float] = FIELD_B, k1: float = K1):
+        self.index = index
+        self.fields = tuple(fields)
+        self.weights = weights
+        self.b = b
+        self.k1 = k1
+
+    def expand(self, field: str, prefix: str) -> List[str]:
+        """Indexed terms in a field that start with prefix"""
+        terms = self.index.terms(field)
+        start = bisect_left(terms, prefix)
+        end = bisect_left(terms, prefix + '\U0010ffff', start)
+        return terms[start:end]
+
+    def _term_hits(self, term: str) -> Hits:
+        """Occurrences of every word starting with term"""
+        hits: Hits = {}
+        for field in self.fields:
+            for expanded in self.expand(field, term):
+                for story_id, paragraph_idx, positions in self.index.postings(field, expanded):
+                    paragraphs = hits.setdefault(story_id, {}).setdefault(field, {})
+                    paragraphs[paragraph_idx] = paragraphs.get(paragraph_idx, 0) + len(positions)
+        return hits
+
+    def _phrase_hits(self, terms: List[str]) -> Hits:
+        """Occurrences of the exact phrase, matched by position"""
+        hits: Hits = {}
+        for field in self.fields:
+            # (story, paragraph) -> positions where the phrase could start
+            candidates = {
+                (story_id, paragraph_idx): set(positions)
+                for story_id, paragraph_idx, positions in self.index.postings(field, terms[0])
+            }
+
+            for offset, term in enumerate(terms[1:], 1):
+                matched = {}
+                for story_id, paragraph_idx, positions in self.index.postings(field, term):
+                    starts = candidates.get((story_id, paragraph_idx))
+                    if starts:
+                        kept = starts.intersection(pos - offset for pos in positions)
+                        if kept:
+                            matched[(story_id, paragraph_idx)] = kept
+                candidates = matched
+                if not candidates:
+                    break
+
+            for (story_id, paragraph_idx), starts in candidates.items():
+                hits.setdefault(story_id, {}).setdefault(field, {})[paragraph_idx] = len(starts)
+        return hits
+
+    def _score(self, hits: Hits, story_id: int) -> float:
+        """BM25F contribution of one clause to one story"""
+        index = self.index
+        df = len(hits)
+        idf = math.log(1 + (index.num_stories - df + 0.5) / (df + 0.5))
+
+        # Length-normalized, weighted term frequency summed over fields
+        tf = 0.0
+        for field, paragraphs in hits[story_id].items():
+            avg_length = index.avg_field_length(field) or 1.0
+            norm = 1 - self.b[field] + self.b[field] * index.field_length(field, story_id) / avg_length
+            tf += self.weights[field] * sum(paragraphs.values()) / norm
+
+        return idf * tf / (self.k1 + tf)
+
+    def search(self, query: str, limit: int = 10, max_paragraphs: int = 3) -> List[Dict]:
+        """Stories matching every clause of the query, best first"""
+        clauses = parse_query(query)
+        if not clauses:
+            return []
+
+        clause_hits = [self._phrase_hits(terms) if is_phrase else self._term_hits(terms[0])
+                       for terms, is_phrase in clauses]
+
+        story_ids = set(clause_hits[0])
+        for hits in clause_hits[1:]:
+            story_ids &= hits.keys()
+
+        scored = sorted(
+            ((sum(self._score(hits, story_id) for hits in clause_hits), story_id) for story_id in story_ids),
+            key=lambda item: (-item[0], item[1])
+        )
+
+        return [self._result(story_id, score, clause_hits, max_paragraphs)
+                for score, story_id in scored[:limit]]
+
+    def _result(self, story_id: int, score: float, clause_hits: List[Hits], max_paragraphs: int) -> Dict:
+        """Story fields plus the paragraphs matching the most clauses"""
+        # paragraph index -> (clauses matched, occurrences)
+        paragraph_scores: Dict[int, Tuple[int, int]] = {}
+        for hits in clause_hits:
+            for paragraph_idx, count in hits[story_id].get('content', {}).items():
+                clauses, occurrences = paragraph_scores.get(paragraph_idx, (0, 0))
+                paragraph_scores[paragraph_idx] = (clauses + 1, occurrences + count)
+
+        best = sorted(paragraph_scores, key=lambda idx: (-paragraph_scores[idx][0], -paragraph_scores[idx][1], idx))
+        story = self.index.story(story_id)
+
+        # Matched only in title/subtitle/author: show the opening paragraph
+        if not best and story['content']:
+            best = [0]
+
+        return {
+            'id': story_id,
+            'score': round(score, 4),
+            'title': story['title'],
+            'subtitle': story['subtitle'],
+            'author': story['author'],
+            'url': story.get('url', ''),
+            'date': story.get('date', ''),
+            'paragraphs': [
+                {'index': idx, 'text': self.index.paragraph(story_id, idx)}
+                for idx in sorted(best[:max_paragraphs])
+            ]
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search the story index from the command line')
+    parser.add_argument('queries', nargs='+', help='Queries; quote "exact phrases"')
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH,
+                        help='Path to search-index.json, or search-index.bin to memory-map it')
+    parser.add_argument('--limit', type=int, default=10, help='Stories per query')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Run each query this many times and report latency only')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine = SearchEngine(open_index(args.index))
+    print(f"📚 Indexed {engine.index.num_stories} stories in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    latencies = []
+    for query in args.queries:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = engine.search(query, limit=args.limit)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        if args.repeat > 1:
+            continue
+
+        print(f"\n🔍 {query}: {len(results)} stories ({latencies[-1]:.1f} ms)")
+        for result in results:
+            print(f"   {result['score']:6.2f}  {result['title']} — {result['author']}")
+            for paragraph in result['paragraphs']:
+                text = paragraph['text']
+                print(f"           ¶{paragraph['index']}: {text[:100]}{'...' if len(text) > 100 else ''}")
+
+    print(f"\n⏱️  {len(latencies)} searches: p50 {percentile(latencies, 50):.2f} ms, "
+          f"p99 {percentile(latencies, 99):.2f} ms, max {max(latencies):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Local search server: the static site plus a JSON search API
+
+Serves docs/ like GitHub Pages does and answers /search?q=...&limit=... from
+the Python query engine, so clients can search without downloading the index.
+
+- A fixed pool of worker threads handles requests; the accept loop waits when
+  all of them are busy, leaving excess connections in the listen backlog.
+- Encoded responses are kept in an LRU cache keyed by the normalized query.
+- The index is reloaded in the background when search-index.json changes on
+  disk; the old index keeps serving until the new one is ready.
+- search-index.bin is memory-mapped when present, so startup and reloads are
+  instant and --processes workers forked from one server share one copy of it.
+
+Usage:
+    python3 server.py --port 8000
+    python3 server.py --processes 4 --workers 4
+    curl 'http://127.0.0.1:8000/search?q=protocol&limit=5'
+"""
+
+import argparse
+import json
+import os
+import signal
+import struct
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from typing import Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from binindex import BINARY_INDEX_NAME, MmapIndex
+from paths import DEFAULT_OUTPUT_DIR
+from search import InvertedIndex, SearchEngine
+
+MAX_LIMIT = 100
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: lowercase with single spaces"""
+    return ' '.join(query.lower().split())
+
+
+class SearchService:
+    """A search engine over search-index.json that follows changes to the file"""
+
+    def __init__(self, docs_dir: str = DEFAULT_OUTPUT_DIR, cache_size: int = 1024, check_interval: float = 2.0,
+                 use_binary: bool = True):
+        self.index_path = os.path.join(docs_dir, 'search-index.json')
+        self.metadata_path = os.path.join(docs_dir, 'stories-metadata.json')
+        self.binary_path = os.path.join(docs_dir, BINARY_INDEX_NAME)
+        self.use_binary = use_binary
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._reloading = False
+        # Searches running on each engine; a replaced index is closed once its count drops to 0
+        self._readers: Counter = Counter()
+        self._last_check = time.monotonic()
+
+        self._signature = self._file_signature()
+        self.engine = SearchEngine(self._load_index())
+        self.cache = LRUCache(cache_size)
+
+    def _load_index(self) -> Union[InvertedIndex, MmapIndex]:
+        """Map the binary index if it is up to date, else parse the JSON"""
+        if self.use_binary and os.path.exists(self.binary_path):
+            # Both are written by the same build; an older .bin is left over from a previous one
+            if os.path.getmtime(self.binary_path) >= os.path.getmtime(self.index_path):
+                return MmapIndex(self.binary_path)
+            print(f"⚠️  {self.binary_path} is older than {self.index_path}, parsing the JSON instead")
+        return InvertedIndex.load(self.index_path, self.metadata_path)
+
+    def _file_signature(self) -> Tuple:
+        """(mtime, size) of the input files; any change triggers a reload"""
+        signature = []
+        for path in (self.index_path, self.metadata_path, self.binary_path):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _maybe_reload(self) -> None:
+        """Start a background reload if the index changed since it was loaded"""
+        now = time.monotonic()
+        with self._lock:
+            if self._reloading or now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+
+            signature = self._file_signature()
+            if signature == self._signature:
+                return
+            self._reloading = True
+
+        threading.Thread(target=self._reload, args=(signature,), daemon=True).start()
+
+    def _reload(self, signature: Tuple) -> None:
+        try:
+            start = time.perf_counter()
+            engine = SearchEngine(self._load_index())
+        except (OSError, ValueError, KeyError, struct.error, IndexError) as e:
+            # Most likely caught mid-write; the next check tries again
+            print(f"⚠️  Index reload failed, keeping the previous index: {e}")
+            with self._lock:
+                self._reloading = False
+            return
+
+        # Swap the engine and its cache together so no stale results are served
+        with self._lock:
+            previous, self.engine = self.engine, engine
+            self.cache = LRUCache(self.cache_size)
+            self._signature = signature
+            self._reloading = False
+            idle = not self._readers[previous]
+
+        # Otherwise the last search still running on it closes it
+        if idle:
+            previous.index.close()
+
+        print(f"🔄 Reloaded {engine.index.num_stories} stories in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def search(self, query: str, limit: int) -> Tuple[bytes, bool]:
+        """Encoded JSON response for a query, and whether it came from the cache"""
+        self._maybe_reload()
+
+        key = (normalize_query(query), limit)
+        with self._lock:
+            engine, cache = self.engine, self.cache
+            body = cache.get(key)
+            if body is not None:
+                return body, True
+            self._readers[engine] += 1
+
+        try:
+            results = engine.search(query, limit=limit)
+        finally:
+            self._release(engine)
+
+        body = json.dumps({'query': query, 'results': results}, ensure_ascii=False).encode('utf-8')
+        cache.put(key, body)
+        return body, False
+
+    def _release(self, engine: SearchEngine) -> None:
+        """Finish a search on an engine, closing its index if it was replaced meanwhile"""
+        with self._lock:
+            self._readers[engine] -= 1
+            retired = not self._readers[engine] and engine is not self.engine
+            if not self._readers[engine]:
+                del self._readers[engine]
+
+        if retired:
+            engine.index.close()
+
+
+class SearchRequestHandler(SimpleHTTPRequestHandler):
+    """Static files from the docs directory, plus the /search API"""
+
+    service: Optional[SearchService] = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/search':
+            self._search(parse_qs(url.query))
+        else:
+            super().do_GET()
+
+    def _search(self, params) -> None:
+        query = params.get('q', [''])[0].strip()
+        try:
+            limit = min(MAX_LIMIT, max(1, int(params.get('limit', ['10'])[0])))
+        except ValueError:
+            self.send_error(400, 'limit must be an integer')
+            return
+
+        start = time.perf_counter()
+        body, cached = self.service.search(query, limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('X-Cache', 'HIT' if cached else 'MISS')
+        self.send_header('X-Search-Time-Ms', f"{elapsed_ms:.2f}")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that handles requests on a bounded pool of worker threads"""
+
+    # Connections wait here while every worker is busy
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers: int = 8):
+        super().__init__(server_address, handler_class)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='search')
+        self._slots = threading.BoundedSemaphore(workers)
+
+    def process_request(self, request, client_address):
+        # Block the accept loop until a worker is free
+        self._slots.acquire()
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+def serve_forked(server: HTTPServer, processes: int) -> None:
+    """Pre-fork: each child process accepts on the same listening socket"""
+    children = []
+    for _ in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    # Take the children down with the parent, on Ctrl-C or SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the site and a JSON search API')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--docs', default=DEFAULT_OUTPUT_DIR, help='Site directory containing search-index.json')
+    parser.add_argument('--workers', type=int, default=8, help='Request worker threads (per process)')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Pre-forked server processes; each has its own result cache')
+    parser.add_argument('--json-index', action='store_true',
+                        help='Parse search-index.json even if search-index.bin exists')
+    parser.add_argument('--cache-size', type=int, default=1024, help='Cached query responses')
+    parser.add_argument('--reload-interval', type=float, default=2.0,
+                        help='Seconds between checks for a changed index')
+    args = parser.parse_args()
+
+    if args.processes > 1 and not hasattr(os, 'fork'):
+        parser.error('--processes needs os.fork (not available on this platform)')
+
+    start = time.perf_counter()
+    service = SearchService(args.docs, cache_size=args.cache_size, check_interval=args.reload_interval,
+                            use_binary=not args.json_index)
+    kind = 'Mapped' if isinstance(service.engine.index, MmapIndex) else 'Indexed'
+    print(f"📚 {kind} {service.engine.index.num_stories} stories in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    handler = partial(SearchRequestHandler, directory=args.docs)
+    SearchRequestHandler.service = service
+
+    server = PooledHTTPServer((args.host, args.port), handler, workers=args.workers)
+    print(f"🌐 Serving {args.docs} on http://{args.host}:{args.port}/ "
+          f"({args.processes} x {args.workers} workers)")
+    print(f"   Search API: http://{args.host}:{args.port}/search?q=protocol")
+
+    try:
+        if args.processes > 1:
+            serve_forked(server, args.processes)
+        else:
+            server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Stories as integer term ids, for corpus-wide word statistics
+
+Tokenizes with the same rule as the word cloud's regex, \\b[a-z]{3,}\\b over
+lowercased text, but on NumPy arrays of UTF-8 bytes, a batch of stories at a
+time: letter runs are found from one mask, each word of up to 12 letters is
+packed 5 bits per letter into an exact uint64 key, and np.unique groups the
+keys. Only longer words and the distinct non-ASCII characters (which decide
+whether a neighbouring letter run is a word) are looked at in Python.
+
+The result is a TermMatrix: a vocabulary in order of first occurrence and the
+corpus's term ids back to back, with offsets giving each story's slice. Term
+counts are one np.bincount; per-story vectors and document frequencies come
+from the same arrays.
+
+Requires NumPy (pip install numpy).
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Words longer than this do not fit in a packed key and get a numbered one
+PACKED_LETTERS = 12
+LONG_WORD_KEY = 1 << 60
+
+# Text tokenized per np.unique call; bounds working memory
+BATCH_CHARS = 1 << 20
+
+# Bytes that are word characters (\w) on their own; bytes >= 0x80 are decided per character
+_ASCII_WORD = np.zeros(256, bool)
+_ASCII_WORD[list(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')] = True
+
+# a-z -> 1..26, everything else 0
+_LETTER_VALUE = np.zeros(256, np.uint8)
+_LETTER_VALUE[ord('a'):ord('z') + 1] = np.arange(1, 27)
+
+# Non-ASCII code point -> whether \w matches it
+_word_chars: Dict[int, bool] = {}
+
+
+def _word_mask(data: np.ndarray) -> np.ndarray:
+    """Which bytes belong to word characters, as re's \\w sees them"""
+    word = _ASCII_WORD[data]
+
+    high = np.flatnonzero(data >= 0x80)
+    if not len(high):
+        return word
+
+    # Decode the code point at each lead byte (padding keeps the lookahead in range)
+    is_lead = data[high] >= 0xC0
+    lead = high[is_lead]
+    padded = np.concatenate((data, np.zeros(3, np.uint8))).astype(np.uint32)
+    b0 = padded[lead]
+    b1, b2, b3 = (padded[lead + i] & 0x3F for i in (1, 2, 3))
+    code_points = np.where(b0 < 0xE0, ((b0 & 0x1F) << 6) | b1,
+                           np.where(b0 < 0xF0, ((b0 & 0x0F) << 12) | (b1 << 6) | b2,
+                                    ((b0 & 0x07) << 18) | (b1 << 12) | (b2 << 6) | b3))
+
+    distinct, which = np.unique(code_points, return_inverse=True)
+    flags = np.array([_word_chars.setdefault(c, chr(c).isalnum()) for c in distinct.tolist()], bool)
+    lead_word = flags[which]
+
+    # Continuation bytes take the answer of the character they belong to
+    word[lead] = lead_word
+    continuation = high[~is_lead]
+    word[continuation] = lead_word[np.searchsorted(lead, continuation, 'right') - 1]
+    return word
+
+
+def tokenize_bytes(data: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(start offsets, lengths, letter values) of the words in lowercased UTF-8 bytes"""
+    values = _LETTER_VALUE[data]
+    edges = np.diff(values.astype(bool).view(np.int8), prepend=np.int8(0), append=np.int8(0))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    long_enough = ends - starts >= 3
+    starts, ends = starts[long_enough], ends[long_enough]
+
+    # \b on both sides: no other word character (digit, _, é...) may touch the run
+    word = np.concatenate(([False], _word_mask(data), [False]))
+    bounded = ~word[starts] & ~word[ends + 1]
+    return starts[bounded], (ends - starts)[bounded], values
+
+
+def _pack(data: np.ndarray, values: np.ndarray, starts: np.ndarray, lengths: np.ndarray,
+          long_words: Dict[str, int]) -> np.ndarray:
+    """Exact uint64 key per word: 5 bits per letter, or a number for long words"""
+    padded = np.concatenate((values, np.zeros(PACKED_LETTERS, np.uint8)))
+    keys = np.zeros(len(starts), np.uint64)
+    for i in range(PACKED_LETTERS):
+        keys |= padded[starts + i].astype(np.uint64) << np.uint64(5 * (PACKED_LETTERS - 1 - i))
+
+    # Drop the letters that followed shorter words
+    keys >>= np.uint64(5) * (PACKED_LETTERS - np.minimum(lengths, PACKED_LETTERS)).astype(np.uint64)
+
+    for i in np.flatnonzero(lengths > PACKED_LETTERS).tolist():
+        word = data[starts[i]:starts[i] + lengths[i]].tobytes().decode('ascii')
+        keys[i] = long_words.setdefault(word, LONG_WORD_KEY + len(long_words))
+    return keys
+
+
+def _unpack(keys: List[int], long_words: List[str]) -> List[str]:
+    """Words back from their keys, all at once"""
+    packed = np.array(keys, np.uint64)
+    is_long = packed >= np.uint64(LONG_WORD_KEY)
+    packed[is_long] = 0
+
+    shifts = np.uint64(5) * np.arange(PACKED_LETTERS - 1, -1, -1).astype(np.uint64)
+    letters = ((packed[:, None] >> shifts) & np.uint64(31)).astype(np.uint8)
+
+    # Shorter words have empty leading slots: move the letters to the front, then
+    # read each row as a NUL-padded byte string
+    letters = np.take_along_axis(letters, np.argsort(letters == 0, axis=1, kind='stable'), axis=1)
+    letters[letters > 0] += 96
+    words = letters.view(f'S{PACKED_LETTERS}').ravel().astype(f'U{PACKED_LETTERS}').tolist()
+
+    for i in np.flatnonzero(is_long).tolist():
+        words[i] = long_words[keys[i] - LONG_WORD_KEY]
+    return words
+
+
+class TermMatrix:
+    """Term ids of every word in a corpus, story by story
+
+    terms[i] is the word with id i; ids follow first occurrence in the corpus,
+    so sorting by count with ties kept in id order matches Counter.most_common.
+    Story j's words are term_ids[offsets[j]:offsets[j + 1]].
+    """
+
+    def __init__(self, terms: List[str], term_ids: np.ndarray, offsets: np.ndarray):
+        self.terms = terms
+        self.term_ids = term_ids
+        self.offsets = offsets
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], batch_chars: int = BATCH_CHARS) -> 'TermMatrix':
+        """Tokenize one text per story"""
+        keys: Dict[int, int] = {}  # packed key -> term id
+        long_words: Dict[str, int] = {}
+        parts: List[np.ndarray] = []
+        story_lengths: List[np.ndarray] = []
+
+        def add_batch(encoded: List[bytes]) -> None:
+            # '\n' between stories is not a word character, so no word spans two
+            data = np.frombuffer(b'\n'.join(encoded), np.uint8)
+            starts, lengths, values = tokenize_bytes(data)
+            batch_keys = _pack(data, values, starts, lengths, long_words)
+
+            distinct, first, which = np.unique(batch_keys, return_index=True, return_inverse=True)
+            distinct = distinct.tolist()
+            for i in np.argsort(first, kind='stable').tolist():
+                keys.setdefault(distinct[i], len(keys))
+            ids = np.array([keys[key] for key in distinct], np.int32)
+            parts.append(ids[which.reshape(-1)])
+
+            story_starts = np.cumsum([0] + [len(text) + 1 for text in encoded[:-1]])
+            story = np.searchsorted(story_starts, starts, 'right') - 1
+            story_lengths.append(np.bincount(story, minlength=len(encoded)))
+
+        batch: List[bytes] = []
+        size = 0
+        for text in texts:
+            batch.append(text.lower().encode('utf-8'))
+            size += len(batch[-1])
+            if size >= batch_chars:
+                add_batch(batch)
+                batch, size = [], 0
+        if batch:
+            add_batch(batch)
+
+        terms = _unpack(list(keys), list(long_words)) if keys else []
+        term_ids = np.concatenate(parts) if parts else np.zeros(0, np.int32)
+        lengths = np.concatenate(story_lengths) if story_lengths else np.zeros(0, np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        return cls(terms, term_ids, offsets)
+
+    def __len__(self) -> int:
+        """Number of stories"""
+        return len(self.offsets) - 1
+
+    def counts(self) -> np.ndarray:
+        """Occurrences of each term across the corpus"""
+        return np.bincount(self.term_ids, minlength=len(self.terms))
+
+    def story_counts(self, story: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(term ids, counts) of one story's words, in order of first occurrence in the story"""
+        ids, first, counts = np.unique(self.term_ids[self.offsets[story]:self.offsets[story + 1]],
+                                       return_index=True, return_counts=True)
+        order = np.argsort(first)
+        return ids[order], counts[order]
+
+    def document_frequency(self) -> np.ndarray:
+        """Number of stories each term occurs in"""
+        story = np.repeat(np.arange(len(self)), np.diff(self.offsets))
+        pairs = np.unique(story.astype(np.int64) * len(self.terms) + self.term_ids)
+        return np.bincount(pairs % len(self.terms), minlength=len(self.terms))
+
+    def most_common(self, n: int, exclude: Optional[Set[str]] = None,
+                    counts: Optional[np.ndarray] = None) -> List[Tuple[str, int]]:
+        """The n most frequent terms not in exclude, like Counter.most_common"""
+        counts = (self.counts() if counts is None else counts).copy()
+        if exclude:
+            counts[[i for i, term in enumerate(self.terms) if term in exclude]] = 0
+
+        # Stable, so equal counts stay in first-occurrence order
+        order = np.argsort(-counts, kind='stable')[:n]
+        return [(self.terms[i], int(counts[i])) for i in order.tolist() if counts[i] > 0]
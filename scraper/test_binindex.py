@@ -0,0 +1,52 @@
+"""Tests for the memory-mapped binary index in binindex.py"""
+
+import struct
+
+import pytest
+
+from binindex import BinaryIndexBuilder, MmapIndex
+from postings import FIELDS, PostingsBuilder
+from search import InvertedIndex
+from test_postings import STORIES
+
+
+def build_binary_index(path) -> None:
+    content = PostingsBuilder()
+    builder = BinaryIndexBuilder(content)
+    for story_id, story in enumerate(STORIES):
+        builder.add(story_id, story, story.content, content.add(story_id, story.content))
+    builder.write(str(path))
+
+
+def test_mmap_index_matches_inverted_index(tmp_path):
+    path = tmp_path / 'search-index.bin'
+    build_binary_index(path)
+
+    expected = InvertedIndex([story.to_dict() for story in STORIES])
+    index = MmapIndex(str(path))
+    try:
+        assert index.num_stories == expected.num_stories
+        for field in FIELDS:
+            assert list(index.terms(field)) == expected.terms(field)
+            assert index.avg_field_length(field) == pytest.approx(expected.avg_field_length(field))
+            for term in expected.terms(field):
+                assert index.postings(field, term) == expected.postings(field, term)
+            for story_id in range(len(STORIES)):
+                assert index.field_length(field, story_id) == expected.field_length(field, story_id)
+        assert index.postings('content', 'missing') == []
+
+        for story_id, story in enumerate(STORIES):
+            assert index.story(story_id) == dict(story.to_dict(), id=story_id)
+    finally:
+        index.close()
+
+
+def test_truncated_binary_index_is_rejected(tmp_path):
+    path = tmp_path / 'search-index.bin'
+    build_binary_index(path)
+    data = path.read_bytes()
+
+    for size in (0, 10, 40, len(data) // 2, len(data) - 1):
+        path.write_bytes(data[:size])
+        with pytest.raises((ValueError, struct.error)):
+            MmapIndex(str(path))
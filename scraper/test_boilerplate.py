@@ -0,0 +1,106 @@
+"""Tests for the one-pass boilerplate filter in extract.py"""
+
+import re
+from collections import Counter
+
+import pytest
+
+from extract import BOILERPLATE_PHRASES, BoilerplateFilter, ParagraphFilter, load_phrases, trie_regex
+
+PHRASES = ['sign in', 'sign in to', 'sign up', 'subscribe', 'c++ (beta)', '50% off?', 'a.b', 'x|y']
+
+TEXTS = [
+    'Please sign in to read the rest of this story.',
+    'Please sign in now, the rest of this story waits.',
+    'Nobody would sign up for this kind of protocol.',
+    'Signing into things is a protocol of its own kind.',
+    'The c++ (beta) compiler printed this paragraph again.',
+    'The c++ beta compiler printed this paragraph again.',
+    'Everything is 50% off? Only for paying readers today.',
+    'Everything is 50% off! Only for paying readers today.',
+    'An a.b test is not the same as an axb test at all.',
+    'Choose x|y when the protocol allows either one of them.',
+    'Choose x or y when the protocol allows either one.',
+    'SUBSCRIBE to get the next story of this protocol series.',
+    'Too short.',
+    'Just four words, honestly.',
+    'A perfectly ordinary paragraph about railway time and protocols.',
+]
+
+
+@pytest.mark.parametrize('phrases', [PHRASES, BOILERPLATE_PHRASES, ['a', 'ab', 'abc', 'abd', 'b']])
+def test_trie_regex_matches_like_a_flat_alternation(phrases):
+    trie = re.compile(trie_regex(phrases))
+    flat = re.compile('|'.join(re.escape(phrase) for phrase in phrases))
+
+    for text in TEXTS + [phrase.upper() for phrase in phrases] + phrases:
+        assert bool(trie.search(text.lower())) == bool(flat.search(text.lower())), text
+
+
+def test_prefix_overlaps_report_the_longest_phrase():
+    pattern = re.compile(trie_regex(['sign in', 'sign in to', 'sign']))
+
+    assert pattern.search('please sign in to read').group(0) == 'sign in to'
+    assert pattern.search('please sign in now').group(0) == 'sign in'
+    assert pattern.search('signal').group(0) == 'sign'
+    assert pattern.search('sig in') is None
+
+
+def test_metacharacters_match_literally():
+    pattern = re.compile(trie_regex(['c++ (beta)', '50% off?', 'a.b', 'x|y']))
+
+    for phrase in ['c++ (beta)', '50% off?', 'a.b', 'x|y']:
+        assert pattern.search(f'before {phrase} after').group(0) == phrase
+    for text in ['c+ (beta)', 'c++ beta', '50% of', 'axb', 'x', 'y']:
+        assert pattern.search(text) is None
+
+
+def test_matches_the_reference_filter():
+    reference = ParagraphFilter(PHRASES)
+    one_pass = BoilerplateFilter(PHRASES)
+
+    assert [one_pass(text) for text in TEXTS] == [reference(text) for text in TEXTS]
+
+
+def test_case_is_ignored_and_counted_under_the_phrase():
+    is_valid = BoilerplateFilter(['subscribe now', 'Sign In'])
+
+    assert not is_valid('SUBSCRIBE NOW to read the rest of the story.')
+    assert not is_valid('Subscribe Now to read the rest of the story.')
+    assert not is_valid('Please sIGN iN before reading any further here.')
+    assert is_valid('Subscribers read this protocol story for free.')
+
+    assert is_valid.hits == Counter({'subscribe now': 2, 'sign in': 1})
+
+
+def test_hit_counts_per_rule():
+    is_valid = BoilerplateFilter(PHRASES)
+    for text in TEXTS:
+        is_valid(text)
+
+    assert is_valid.hits == Counter({
+        'sign in to': 1,
+        'sign in': 1,
+        'sign up': 1,
+        'c++ (beta)': 1,
+        '50% off?': 1,
+        'a.b': 1,
+        'x|y': 1,
+        'subscribe': 1,
+        BoilerplateFilter.TOO_SHORT: 1,
+        BoilerplateFilter.TOO_FEW_WORDS: 1,
+    })
+
+    # Counts from worker copies are merged; taking them starts over
+    is_valid.merge_hits(Counter({'sign up': 2}))
+    hits = is_valid.take_hits()
+    assert hits['sign up'] == 3
+    assert is_valid.hits == Counter()
+
+
+def test_load_phrases_lowercases_and_skips_comments(tmp_path):
+    path = tmp_path / 'boilerplate.txt'
+    path.write_text('# A comment\n\nSubscribe Now\n  share this post  \n', encoding='utf-8')
+
+    assert load_phrases(str(path)) == ['subscribe now', 'share this post']
+    assert BoilerplateFilter.from_file(str(path)).phrases == ['subscribe now', 'share this post']
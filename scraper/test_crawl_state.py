@@ -0,0 +1,110 @@
+"""Tests for conditional GET state in crawl_state.py"""
+
+import threading
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+from crawl_state import CrawlState, parse_lastmod
+from fetchers import FetchResponse
+from records import Story
+
+URL = 'https://example.com/p/story'
+BODY = b'<html><body><article><p>Story text.</p></article></body></html>'
+STORY = Story('A story', url=URL, content=['Story text.'])
+
+
+def response(status: int = 200, content: bytes = BODY, **headers) -> FetchResponse:
+    return FetchResponse(URL, status, content, CaseInsensitiveDict(
+        {name.replace('_', '-'): value for name, value in headers.items()}))
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = CrawlState(str(tmp_path / 'crawl-state.sqlite'))
+    yield state
+    state.close()
+
+
+def test_conditional_headers_come_from_the_saved_response(state):
+    assert state.conditional_headers(URL) == {}
+
+    state.save(URL, response(ETag='"v1"', Last_Modified='Mon, 01 Jan 2024 00:00:00 GMT'), STORY)
+
+    assert state.conditional_headers(URL) == {
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT',
+    }
+    assert state.get(URL)['story'] == STORY
+    assert state.updated == 1
+
+
+def test_unchanged_story_on_304_or_identical_body(state):
+    assert state.unchanged_story(URL, response(304)) is None
+
+    state.save(URL, response(ETag='"v1"'), STORY)
+
+    assert state.unchanged_story(URL, response(304)) == STORY
+    assert state.unchanged_story(URL, response(200, ETag='"v2"')) == STORY
+    assert state.conditional_headers(URL) == {'If-None-Match': '"v2"'}  # Validators refreshed
+    assert state.unchanged_story(URL, response(200, b'<html>edited</html>')) is None
+    assert (state.not_modified, state.unchanged) == (1, 1)
+
+
+def test_fresh_story_follows_the_sitemap_lastmod(state):
+    state.lastmods[URL] = '2024-03-01'
+    state.save(URL, response(), STORY)
+
+    assert state.fresh_story(URL) == STORY
+    state.lastmods[URL] = '2024-03-01T00:00:00Z'
+    assert state.fresh_story(URL) == STORY
+    assert state.skipped == 2
+
+    state.lastmods[URL] = '2024-03-02'
+    assert state.fresh_story(URL) is None
+    state.lastmods[URL] = 'not a date'
+    assert state.fresh_story(URL) is None
+    assert state.fresh_story('https://example.com/p/other') is None
+
+
+def test_counters_add_up_across_threads(state):
+    state.save(URL, response(), STORY)
+
+    def revalidate():
+        for _ in range(50):
+            state.unchanged_story(URL, response(304))
+
+    threads = [threading.Thread(target=revalidate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert state.not_modified == 400
+
+
+def test_start_run_resets_the_counters(state):
+    state.save(URL, response(), STORY)
+    state.unchanged_story(URL, response(304))
+
+    state.start_run()
+
+    assert (state.skipped, state.not_modified, state.unchanged, state.updated) == (0, 0, 0, 0)
+    assert state.get(URL)['story'] == STORY
+
+
+def test_start_run_forgets_the_sitemap_lastmods(state):
+    state.lastmods[URL] = '2024-03-01'
+    state.save(URL, response(), STORY)
+
+    state.start_run()
+
+    assert state.fresh_story(URL) is None  # No lastmod seen this run yet
+    assert state.get(URL)['lastmod'] == '2024-03-01'
+
+
+def test_parse_lastmod():
+    assert parse_lastmod('2024-03-01') == parse_lastmod('2024-03-01T00:00:00+00:00')
+    assert parse_lastmod('2024-03-01T02:00:00+02:00') == parse_lastmod('2024-03-01')
+    assert parse_lastmod('') is None
+    assert parse_lastmod('yesterday') is None
@@ -0,0 +1,97 @@
+"""Tests for SimHash near-duplicate detection in dedupe.py"""
+
+import random
+
+from dedupe import FINGERPRINT_BITS, ParagraphDeduper, hamming, simhash
+from records import Story
+
+PARAGRAPH = ("Protocols are the engineered arrangements that let strangers coordinate at scale without "
+             "needing to trust one another, and they shape daily life in ways most people never notice "
+             "until they break down.")
+NEAR_COPY = PARAGRAPH + " Really."
+OTHER = "An entirely different paragraph about railway gauges and the history of standard time zones in Britain."
+
+
+def story(*content: str) -> Story:
+    return Story('Title', content=content)
+
+
+def test_simhash_is_stable_and_close_for_small_edits():
+    assert simhash(PARAGRAPH) == simhash(PARAGRAPH.upper())
+    assert simhash(PARAGRAPH) < 2 ** FINGERPRINT_BITS
+    assert hamming(simhash(PARAGRAPH), simhash(NEAR_COPY)) <= 3
+    assert hamming(simhash(PARAGRAPH), simhash(OTHER)) > 3
+
+
+def test_fingerprints_within_max_distance_share_a_band():
+    rng = random.Random(0)
+    for max_distance in (1, 3, 5):
+        deduper = ParagraphDeduper(max_distance=max_distance)
+        for _ in range(200):
+            fingerprint = rng.getrandbits(FINGERPRINT_BITS)
+            flipped = fingerprint
+            for bit in rng.sample(range(FINGERPRINT_BITS), max_distance):
+                flipped ^= 1 << bit
+
+            keys = deduper._band_keys(fingerprint)
+            assert len(keys) == max_distance + 1
+            assert any(a == b for a, b in zip(keys, deduper._band_keys(flipped)))
+
+
+def test_exact_and_near_duplicates_of_earlier_stories_are_dropped():
+    deduper = ParagraphDeduper()
+
+    assert deduper.filter(0, story(PARAGRAPH, OTHER)) == [PARAGRAPH, OTHER]
+    assert deduper.filter(1, story('Fresh text only this story has.', PARAGRAPH, NEAR_COPY)) == [
+        'Fresh text only this story has.'
+    ]
+
+    assert (deduper.paragraphs, deduper.exact, deduper.near) == (5, 1, 1)
+    assert [(story_id, i) for story_id, i, _ in deduper.duplicates] == [(1, 1), (1, 2)]
+    assert deduper.bytes_saved == len(f',"{PARAGRAPH}","{NEAR_COPY}"'.encode('utf-8'))
+
+
+def test_repeats_within_one_story_are_kept():
+    deduper = ParagraphDeduper()
+
+    assert deduper.filter(0, story(PARAGRAPH, PARAGRAPH, NEAR_COPY)) == [PARAGRAPH, PARAGRAPH, NEAR_COPY]
+    assert deduper.exact + deduper.near == 0
+
+
+def test_report_mode_keeps_everything():
+    deduper = ParagraphDeduper(drop=False)
+    deduper.filter(0, story(PARAGRAPH))
+
+    assert deduper.filter(1, story(PARAGRAPH, OTHER)) == [PARAGRAPH, OTHER]
+    assert deduper.exact == 1
+    assert deduper.bytes_saved > 0
+
+
+def test_the_oldest_story_keeps_its_paragraph():
+    stories = [
+        Story('Cross-post', url='https://example.com/a', date='2024-06-01', content=[OTHER, PARAGRAPH]),
+        Story('Original', url='https://example.com/b', date='2024-01-15', content=[NEAR_COPY]),
+        Story('Undated', url='https://example.com/0', content=[PARAGRAPH]),
+        Story('Same day', url='https://example.com/c', date='2024-01-15', content=[PARAGRAPH]),
+    ]
+    deduper = ParagraphDeduper()
+    deduper.scan(stories)
+
+    assert [deduper.filter(story_id, story) for story_id, story in enumerate(stories)] == [
+        [OTHER], [NEAR_COPY], [], []
+    ]
+    assert [(story_id, i) for story_id, i, _ in deduper.duplicates] == [(0, 1), (2, 0), (3, 0)]
+    # 'Same day' is a near copy of 'Original'; the others repeat 'Same day' exactly
+    assert (deduper.paragraphs, deduper.exact, deduper.near) == (5, 2, 1)
+
+
+def test_same_date_falls_back_to_url_order():
+    stories = [
+        Story('Later URL', url='https://example.com/b', date='2024-01-15', content=[PARAGRAPH]),
+        Story('Earlier URL', url='https://example.com/a', date='2024-01-15', content=[PARAGRAPH]),
+    ]
+    deduper = ParagraphDeduper()
+    deduper.scan(stories)
+
+    assert deduper.filter(0, stories[0]) == []
+    assert deduper.filter(1, stories[1]) == [PARAGRAPH]
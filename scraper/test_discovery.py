@@ -0,0 +1,40 @@
+"""Tests for sitemap parsing in discovery.py"""
+
+import os
+
+from discovery import PAGE, SITEMAP, iter_sitemap
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def test_image_and_video_locs_do_not_replace_the_page_loc():
+    entries = list(iter_sitemap(read_fixture('sitemap-images.xml')))
+
+    assert entries == [
+        (PAGE, 'https://protocolized.summerofprotocols.com/p/first-story', '2024-03-01'),
+        (PAGE, 'https://protocolized.summerofprotocols.com/p/second-story', ''),
+    ]
+
+
+def test_sitemap_index_entries():
+    content = b'''<?xml version="1.0"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://example.com/sitemap/2023</loc><lastmod>2023-12-31</lastmod></sitemap>
+  <sitemap><loc>https://example.com/sitemap/2024</loc></sitemap>
+</sitemapindex>'''
+
+    assert list(iter_sitemap(content)) == [
+        (SITEMAP, 'https://example.com/sitemap/2023', '2023-12-31'),
+        (SITEMAP, 'https://example.com/sitemap/2024', ''),
+    ]
+
+
+def test_sitemap_without_namespace():
+    content = b'<urlset><url><loc> https://example.com/p/a </loc></url></urlset>'
+
+    assert list(iter_sitemap(content)) == [(PAGE, 'https://example.com/p/a', '')]
@@ -0,0 +1,74 @@
+"""Tests that StoryExtractor extracts exactly what the reference selectors do"""
+
+import os
+
+import pytest
+
+from extract import ParagraphFilter, StoryExtractor
+from extract_reference import SelectorExtractor
+from parsing import PARSERS, parse_html
+from scrape import ProtocolizedScraper
+from scrape_all import ProtocolizedScraperEnhanced
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+PAGES = ['story-article.html', 'story-fallback.html', 'story-empty.html']
+SCRAPERS = [ProtocolizedScraper, ProtocolizedScraperEnhanced]
+
+is_valid_paragraph = ParagraphFilter()
+
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def story_extractor(scraper) -> StoryExtractor:
+    return StoryExtractor(scraper.TITLE_SELECTORS, scraper.SUBTITLE_SELECTORS,
+                          scraper.AUTHOR_SELECTOR, scraper.TAG_SELECTOR,
+                          author_excludes=getattr(scraper, 'AUTHOR_EXCLUDES', ()))
+
+
+@pytest.mark.parametrize('scraper', SCRAPERS)
+@pytest.mark.parametrize('page', PAGES)
+@pytest.mark.parametrize('parser', PARSERS)
+@pytest.mark.parametrize('targeted', [False, True])
+def test_single_pass_matches_the_reference(scraper, page, parser, targeted):
+    """Also on the strained tree, which keeps only the nodes the extractors read"""
+    content = read_fixture(page)
+    expected = SelectorExtractor.for_scraper(scraper).extract(parse_html(content, parser), is_valid_paragraph)
+
+    soup = parse_html(content, parser, targeted=targeted)
+    assert story_extractor(scraper).extract(soup, is_valid_paragraph) == expected
+
+
+def test_article_page_fields():
+    soup = parse_html(read_fixture('story-article.html'), targeted=True)
+    story = story_extractor(ProtocolizedScraperEnhanced).extract(soup, is_valid_paragraph)
+
+    assert story == {
+        'title': 'A Field Guide to Protocols',
+        'subtitle': 'How strangers learn tocoordinate',
+        'author': 'Ana Ortega, Bo Lindqvist',
+        'date': '2024-03-05',
+        'tags': ['Summer of Protocols', 'Stories', 'Fiction'],
+        'content': [
+            'Every protocol starts as a workaround that enough people agreed to repeat.',
+            'Railway time, standard gauges and shipping containers all began this way.',
+            'A protocol is a story that many people keep telling on purpose.',
+            'The hard part is never the first agreement but keeping it once it is invisible.',
+        ],
+    }
+
+
+def test_fallback_page_fields():
+    soup = parse_html(read_fixture('story-fallback.html'), targeted=True)
+    story = story_extractor(ProtocolizedScraperEnhanced).extract(soup, is_valid_paragraph)
+
+    assert (story['title'], story['subtitle'], story['author'], story['date']) == (
+        'Terminal Velocity', 'A story about queues', 'Cy Brandt', '')
+    assert story['tags'] == ['QueuesAirports and other very long tag names here', 'Queues',
+                             'Airports and other very long tag names here']
+    assert story['content'] == [
+        'This paragraph sits in the post-content container, which comes first in the order.',
+        'It should be the only container whose paragraphs are extracted for the story.',
+    ]
@@ -0,0 +1,138 @@
+"""Tests for the incremental word counts in generate_wordcloud.py"""
+
+import json
+from collections import Counter
+
+import pytest
+
+import generate_wordcloud
+from generate_wordcloud import WordCounts, count_words_counter, iter_index, merge_counts
+from records import Story
+
+ENGINES = ['counter', pytest.param('numpy', marks=pytest.mark.skipif(
+    generate_wordcloud.TermMatrix is None, reason='needs NumPy'))]
+
+
+def story(title: str, *content: str) -> Story:
+    return Story(title, content=content)
+
+
+STORIES = [
+    story('Protocols', 'Protocols coordinate strangers.', 'Railways needed standard time.'),
+    story('Standards', 'Standard gauges and standard time zones.'),
+    story('Protocols', 'Protocols coordinate strangers.', 'Railways needed standard time.'),  # Duplicate
+    story('Shipping', 'Containers changed shipping forever. Containers everywhere.'),
+]
+
+
+def full_count(stories):
+    return count_words_counter(list(stories))
+
+
+def assert_matches_full_count(counts: WordCounts, stories):
+    expected = full_count(stories)
+    assert counts.totals == expected
+    assert counts.most_common(50) == expected.most_common(50)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_update_matches_a_full_count(engine):
+    counts = WordCounts()
+    counts.update(STORIES, engine)
+
+    assert_matches_full_count(counts, STORIES)
+    assert (counts.counted, counts.reused) == (3, 1)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_edits_removals_and_reordering(engine):
+    counts = WordCounts()
+    counts.update(STORIES, engine)
+
+    edited = story('Standards', 'Standard gauges, standard containers and standard protocols.')
+    later = [STORIES[3], edited, STORIES[0], story('Bridges', 'Bridges bridges bridges.')]
+    counts.counted = counts.reused = 0
+    counts.update(later, engine)
+
+    assert_matches_full_count(counts, later)
+    assert (counts.counted, counts.reused) == (2, 2)
+
+    # Dropping one copy of a duplicated story takes only that copy's counts away
+    counts.update(STORIES[:3], engine)
+    counts.update(STORIES[:1], engine)
+    assert_matches_full_count(counts, STORIES[:1])
+
+    counts.update([], engine)
+    assert counts.totals == Counter()
+    assert counts.most_common() == []
+
+
+def test_add_and_commit_match_update():
+    counts = WordCounts()
+    for item in STORIES:
+        counts.add(item)
+    counts.commit()
+
+    assert_matches_full_count(counts, STORIES)
+    assert (counts.counted, counts.reused) == (3, 1)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'wordcloud-counts.json')
+    counts = WordCounts()
+    counts.update(STORIES, 'counter')
+    counts.save(path)
+
+    loaded = WordCounts.load(path)
+    assert loaded.order == counts.order
+    assert loaded.vectors == counts.vectors
+    assert loaded.totals == counts.totals
+
+    # Reusing the loaded vectors still tracks removals of duplicates
+    loaded.update(STORIES[:2], 'counter')
+    assert loaded.counted == 0
+    assert_matches_full_count(loaded, STORIES[:2])
+
+
+def test_counts_made_with_other_rules_are_ignored(tmp_path):
+    path = tmp_path / 'wordcloud-counts.json'
+    counts = WordCounts()
+    counts.update(STORIES, 'counter')
+    counts.save(str(path))
+
+    data = json.loads(path.read_text(encoding='utf-8'))
+    data['rules'] = 'something else'
+    path.write_text(json.dumps(data), encoding='utf-8')
+
+    assert WordCounts.load(str(path)).order == []
+    assert WordCounts.load(str(tmp_path / 'missing.json')).order == []
+
+
+def test_update_in_worker_processes_matches_a_full_count():
+    counts = WordCounts()
+    counts.update(iter(STORIES), 'counter', workers=2)
+
+    assert_matches_full_count(counts, STORIES)
+    assert (counts.counted, counts.reused) == (3, 1)
+
+
+def test_merge_counts_keeps_first_occurrence_order():
+    partials = [Counter(words.split()) for words in ['b a', 'c a', 'd b', 'e', 'a f', 'g']]
+    expected = Counter()
+    for partial in partials:
+        expected.update(partial)
+
+    merged = merge_counts(Counter(partial) for partial in partials)
+    assert list(merged.items()) == list(expected.items())
+    assert merge_counts([]) == Counter()
+
+
+def test_iter_index_streams_entries_across_reads(tmp_path):
+    entries = [{'title': f'Story {i}', 'content': ['x' * i, 'é"\\]']} for i in range(50)]
+    path = tmp_path / 'search-index.json'
+    path.write_text(json.dumps(entries, indent=1, ensure_ascii=False), encoding='utf-8')
+
+    assert list(iter_index(str(path), read_chars=16)) == entries
+
+    path.write_text('[]', encoding='utf-8')
+    assert list(iter_index(str(path))) == []
@@ -0,0 +1,37 @@
+"""Tests for the HTML cache and replay mode in html_cache.py"""
+
+from requests.structures import CaseInsensitiveDict
+
+from fetchers import FetchResponse
+from html_cache import CachingFetcher, HtmlCache
+
+URL = 'https://example.com/p/story'
+BODY = b'<html><body><article><p>Story text.</p></article></body></html>'
+
+
+class FakeFetcher:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, timeout=15, headers=None):
+        self.calls += 1
+        return FetchResponse(url, 200, BODY, CaseInsensitiveDict({'ETag': '"v1"', 'Set-Cookie': 'x'}))
+
+    def close(self):
+        pass
+
+
+def test_replay_returns_cached_responses_without_the_network(tmp_path):
+    fetcher = FakeFetcher()
+    CachingFetcher(fetcher, HtmlCache(str(tmp_path))).get(URL)
+    CachingFetcher(fetcher, HtmlCache(str(tmp_path))).get(URL)  # Same body, stored once
+    assert fetcher.calls == 2
+
+    replay = CachingFetcher(None, HtmlCache(str(tmp_path)), replay=True)
+    cached = replay.get(URL)
+    assert (cached.status_code, cached.content) == (200, BODY)
+    assert dict(cached.headers) == {'ETag': '"v1"'}
+
+    assert replay.get('https://example.com/p/missing').status_code == 404
+    assert replay.misses == 1
+    assert len(list((tmp_path / 'objects').rglob('*.html.gz'))) == 1
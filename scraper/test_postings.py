@@ -0,0 +1,82 @@
+"""Tests for the varint postings in postings.py"""
+
+import base64
+import hashlib
+import json
+
+import pytest
+
+from index_writer import IndexWriter
+from postings import PostingsBuilder, _read_varints, _write_varint, decode_postings
+from records import Story
+
+STORIES = [
+    Story('Summer of Protocols', 'An intro', 'Ana', 'https://example.com/a', '2024-01-01', ['protocols'],
+          ['Protocols protocols everywhere.', 'A second paragraph about protocols.']),
+    Story('Rails and tracks', '', 'Bo', 'https://example.com/b', '', [],
+          ['Nothing here.', 'Still nothing.', 'Finally protocols, and café protocols.']),
+    Story('Café society', 'Über alles', 'Ana, Bo', 'https://example.com/c', '2024-02-01', ['a', 'b'],
+          ['x ' * 200 + 'protocols']),
+]
+
+
+@pytest.mark.parametrize('value', [0, 1, 127, 128, 300, 16383, 16384, 2 ** 32 - 1, 2 ** 63])
+def test_varint_round_trip(value):
+    out = bytearray()
+    _write_varint(out, value)
+
+    assert list(_read_varints(bytes(out))) == [value]
+    assert len(out) == max(1, (value.bit_length() + 6) // 7)
+
+
+def test_varints_back_to_back():
+    values = [5, 0, 128, 1, 99999]
+    out = bytearray()
+    for value in values:
+        _write_varint(out, value)
+
+    assert list(_read_varints(bytes(out))) == values
+
+
+def test_postings_decode_to_what_was_added():
+    builder = PostingsBuilder()
+    tokens = [builder.add(story_id, story.content) for story_id, story in enumerate(STORIES)]
+
+    assert tokens == [8, 9, 201]
+    encoded = dict(builder.encoded())
+    assert decode_postings(encoded['protocols']) == [
+        (0, 0, [0, 1]),
+        (0, 1, [4]),
+        (1, 2, [1, 4]),  # Absolute paragraph index in a new story
+        (2, 0, [200]),
+    ]
+    assert decode_postings(encoded['café']) == [(1, 2, [3])]
+
+
+def test_json_postings_are_base64_of_the_raw_ones():
+    builder = PostingsBuilder()
+    for story_id, story in enumerate(STORIES):
+        builder.add(story_id, story.content)
+
+    data = builder.to_json(len(STORIES))
+    raw = dict(builder.encoded())
+    assert data['terms'] == sorted(raw)
+    for term, postings in zip(data['terms'], data['postings']):
+        assert base64.b64decode(postings) == raw[term]
+        assert decode_postings(postings) == decode_postings(raw[term])
+
+
+@pytest.mark.parametrize('shard_bytes', [None, 300])
+def test_paragraph_index_records_the_search_index_checksums(tmp_path, shard_bytes):
+    with IndexWriter(str(tmp_path), shard_bytes=shard_bytes) as writer:
+        for story in STORIES:
+            writer.add(story)
+
+    source = json.loads((tmp_path / 'paragraph-index.json').read_text(encoding='utf-8'))['source']
+    assert source['sha256'] == hashlib.sha256((tmp_path / 'search-index.json').read_bytes()).hexdigest()
+    if shard_bytes:
+        manifest = json.loads((tmp_path / 'search-index-manifest.json').read_text(encoding='utf-8'))
+        assert len(manifest['shards']) > 1
+        assert source['shards'] == [shard['sha256'] for shard in manifest['shards']]
+    else:
+        assert 'shards' not in source
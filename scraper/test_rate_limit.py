@@ -0,0 +1,195 @@
+"""Tests for the token bucket and adaptive limiter in rate_limit.py, on a fake clock"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+import pytest
+
+import rate_limit
+from rate_limit import AdaptiveRateLimiter, RateLimitedFetcher, TokenBucket, backoff_delay, parse_retry_after
+
+
+class FakeClock:
+    """Monotonic clock that only moves when something sleeps on it"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def limiter(clock, **options) -> AdaptiveRateLimiter:
+    return AdaptiveRateLimiter(clock=clock, sleep=clock.sleep, **options)
+
+
+def test_token_bucket_caps_the_rate(clock):
+    bucket = TokenBucket(rate=2, clock=clock, sleep=clock.sleep)
+    start = clock.now
+
+    for _ in range(5):
+        bucket.acquire()
+
+    assert clock.now - start == pytest.approx(2.0)
+    assert clock.sleeps == pytest.approx([0.5] * 4)
+
+
+def test_idle_bucket_bursts_up_to_its_capacity(clock):
+    bucket = TokenBucket(rate=2, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    clock.now += 10
+
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    assert clock.sleeps == pytest.approx([0.5])
+
+
+def test_invalid_rates_are_rejected():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+    with pytest.raises(ValueError):
+        AdaptiveRateLimiter(max_rate=1, min_rate=2)
+
+
+def test_429_halves_the_rate_and_pauses_until_retry_after(clock):
+    limits = limiter(clock, max_rate=4, min_rate=0.5)
+    limits.acquire()
+    start = clock.now
+
+    limits.record(429, {'Retry-After': '7'}, 0.1)
+    assert limits.rate == 2
+
+    limits.acquire()
+    assert clock.now - start == pytest.approx(7)
+    assert (limits.throttled, limits.paused_seconds) == (1, pytest.approx(7))
+
+
+def test_pauses_are_extended_never_shortened(clock):
+    limits = limiter(clock, max_rate=4, min_rate=0.5)
+
+    limits.record(429, {'Retry-After': '10'}, 0.1)
+    limits.record(503, {'Retry-After': '3'}, 0.1)
+    assert limits.paused_seconds == pytest.approx(10)
+
+    clock.now += 5
+    limits.record(429, {'Retry-After': '10'}, 0.1)
+    assert limits.paused_seconds == pytest.approx(15)  # Only the 5 s beyond the first pause
+
+    # Three decreases from 4/s, floored at min_rate
+    assert limits.rate == limits.lowest_rate == 0.5
+
+    start = clock.now
+    limits.acquire()
+    assert clock.now - start == pytest.approx(10)
+
+
+def test_backoff_without_retry_after_grows_until_a_success(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit.random, 'uniform', lambda low, high: high)  # No jitter
+    limits = limiter(clock, max_rate=4, min_rate=0.1)
+
+    pauses = []
+    for status in (429, 429, 503, 200, 429):
+        before = limits.paused_seconds
+        limits.record(status, {}, 0.1)
+        pauses.append(limits.paused_seconds - before)
+        clock.now += pauses[-1]
+
+    assert pauses == pytest.approx([2, 4, 8, 0, 2])
+
+
+def test_long_pauses_are_capped(clock):
+    limits = limiter(clock, max_pause=300)
+    limits.record(429, {'Retry-After': '3600'}, 0.1)
+
+    assert limits.paused_seconds == pytest.approx(300)
+
+
+def test_rate_climbs_on_fast_responses_and_falls_on_errors(clock):
+    limits = limiter(clock, max_rate=2, min_rate=0.5, start_rate=1, increase=0.25)
+
+    for _ in range(10):
+        limits.record(200, {}, 0.1)
+    assert limits.rate == 2  # Capped at max_rate
+
+    limits.record(200, {}, 5.0)  # Slow responses do not raise it
+    assert limits.rate == 2
+
+    limits.record(500, {}, 0.1)
+    assert limits.rate == 1
+    limits.record_error()
+    limits.record_error()
+    assert limits.rate == 0.5  # Floored at min_rate
+
+    assert (limits.requests, limits.errors, limits.throttled) == (14, 3, 0)
+    assert (limits.lowest_rate, limits.highest_rate) == (0.5, 2)
+    assert limits.paused_seconds == 0  # Only 429/503 pause
+
+    # Two tokens' worth of waiting at the new rate (one token was left)
+    start = clock.now
+    limits.acquire()
+    limits.acquire()
+    assert clock.now - start == pytest.approx(2)
+
+
+def test_parse_retry_after():
+    now = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+    http_date = format_datetime(now, usegmt=True)
+
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after(http_date, now=now.timestamp() - 30) == 30
+    assert parse_retry_after(http_date, now=now.timestamp() + 30) == 0
+    assert parse_retry_after('') is None
+    assert parse_retry_after('soon') is None
+
+
+def test_backoff_delay_bounds():
+    for attempt in range(8):
+        delay = min(60.0, 2.0 * 2 ** attempt)
+        assert delay / 2 <= backoff_delay(attempt) <= delay
+
+
+class Response:
+    def __init__(self, status_code: int, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class StubFetcher:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+
+    def get(self, url, timeout=15, headers=None):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def close(self):
+        pass
+
+
+def test_rate_limited_fetcher_records_every_request(clock):
+    limits = limiter(clock, max_rate=4, min_rate=0.5)
+    fetcher = RateLimitedFetcher(StubFetcher(Response(200), Response(429, {'Retry-After': '1'}),
+                                             TimeoutError('slow')), limits)
+
+    assert fetcher.get('https://example.com/a').status_code == 200
+    assert fetcher.get('https://example.com/b').status_code == 429
+    with pytest.raises(TimeoutError):
+        fetcher.get('https://example.com/c')
+
+    assert (limits.requests, limits.throttled, limits.errors) == (3, 1, 1)
+    assert limits.rate == 1  # Halved twice from 4/s
@@ -0,0 +1,119 @@
+"""Tests for BM25F ranking and query matching in search.py"""
+
+import pytest
+
+from binindex import BinaryIndexBuilder, MmapIndex
+from postings import PostingsBuilder
+from records import Story
+from search import InvertedIndex, SearchEngine, parse_query
+
+STORIES = [
+    Story('Railway time', 'How clocks agreed', 'Ana', 'https://example.com/0', '2024-01-01', [],
+          ['Before standard time every town kept its own noon.',
+           'Railways needed one timetable.',
+           'Standard time and railways arrived together.']),
+    Story('Shipping containers', '', 'Bo', 'https://example.com/1', '2024-02-01', [],
+          ['Containers made shipping a protocol.', 'Time standard sizes, not standard time.']),
+    Story('Notes', '', 'Cy', 'https://example.com/2', '', [],
+          ['A protocol for railway signals, railway bells and protocols in general.']),
+    Story('Protocol', '', 'Di', 'https://example.com/3', '', [],
+          ['Nothing else to see here.']),
+]
+
+
+def in_memory():
+    return InvertedIndex([story.to_dict() for story in STORIES])
+
+
+def memory_mapped(tmp_path):
+    content = PostingsBuilder()
+    builder = BinaryIndexBuilder(content)
+    for story_id, story in enumerate(STORIES):
+        builder.add(story_id, story, story.content, content.add(story_id, story.content))
+    builder.write(str(tmp_path / 'search-index.bin'))
+    return MmapIndex(str(tmp_path / 'search-index.bin'))
+
+
+def titles(results):
+    return [result['title'] for result in results]
+
+
+def test_parse_query():
+    assert parse_query('Protocol "Summer of  protocols" x-ray ""') == [
+        (['protocol'], False),
+        (['summer', 'of', 'protocols'], True),
+        (['x'], False),
+        (['ray'], False),
+    ]
+    assert parse_query('  ') == []
+
+
+def test_words_match_as_prefixes():
+    engine = SearchEngine(in_memory())
+
+    assert sorted(titles(engine.search('proto'))) == ['Notes', 'Protocol', 'Shipping containers']
+    assert sorted(titles(engine.search('rail'))) == ['Notes', 'Railway time']
+    assert engine.search('protocolz') == []
+
+
+def test_every_clause_must_match():
+    engine = SearchEngine(in_memory())
+
+    assert titles(engine.search('railway protocol')) == ['Notes']
+    assert engine.search('railway containers') == []
+
+
+def test_phrases_match_by_position():
+    engine = SearchEngine(in_memory())
+
+    results = engine.search('"standard time"')
+    assert sorted(titles(results)) == ['Railway time', 'Shipping containers']
+
+    # Only the paragraphs holding the phrase, not those with both words apart
+    railway = next(result for result in results if result['title'] == 'Railway time')
+    assert [paragraph['index'] for paragraph in railway['paragraphs']] == [0, 2]
+    shipping = next(result for result in results if result['title'] == 'Shipping containers')
+    assert [paragraph['index'] for paragraph in shipping['paragraphs']] == [1]
+
+    assert engine.search('"time railways"') == []
+
+
+def test_bm25f_ranking():
+    engine = SearchEngine(in_memory())
+
+    # A short title match outweighs content matches
+    results = engine.search('protocol')
+    assert titles(results)[0] == 'Protocol'
+    assert [result['score'] for result in results] == sorted((result['score'] for result in results), reverse=True)
+
+    # Without the title weight, two content occurrences beat one
+    content_only = SearchEngine(in_memory(), fields=('content',))
+    assert titles(content_only.search('protocol')) == ['Notes', 'Shipping containers']
+
+    assert titles(engine.search('protocol', limit=1)) == ['Protocol']
+
+
+def test_title_only_match_shows_the_opening_paragraph():
+    engine = SearchEngine(in_memory())
+
+    result = engine.search('clocks')[0]
+    assert result['title'] == 'Railway time'
+    assert result['paragraphs'] == [{'index': 0, 'text': STORIES[0].content[0]}]
+    assert (result['url'], result['date']) == ('https://example.com/0', '2024-01-01')
+
+
+def test_best_paragraphs_match_the_most_clauses():
+    engine = SearchEngine(in_memory())
+
+    result = engine.search('standard railways', max_paragraphs=1)[0]
+    assert result['title'] == 'Railway time'
+    assert [paragraph['index'] for paragraph in result['paragraphs']] == [2]
+
+
+@pytest.mark.parametrize('query', ['proto', 'rail', '"standard time"', 'railway protocol', 'time', 'ana'])
+def test_mmap_index_ranks_like_the_inverted_index(tmp_path, query):
+    index = memory_mapped(tmp_path)
+    try:
+        assert SearchEngine(index).search(query) == SearchEngine(in_memory()).search(query)
+    finally:
+        index.close()
@@ -0,0 +1,131 @@
+"""Tests for the response cache and index hot reload in server.py"""
+
+import json
+import os
+import threading
+
+import pytest
+
+from index_writer import IndexWriter
+from records import Story
+from server import LRUCache, SearchService, normalize_query
+
+STORIES = [
+    Story('Railway time', '', 'Ana', 'https://example.com/0', '2024-01-01', [],
+          ['Before standard time every town kept its own noon.']),
+    Story('Shipping containers', '', 'Bo', 'https://example.com/1', '2024-02-01', [],
+          ['Containers made shipping a protocol.']),
+]
+NEW_STORY = Story('Protocol bells', '', 'Cy', 'https://example.com/2', '', [],
+                  ['Bells were the first railway protocol.'])
+
+
+def write_docs(docs_dir, stories) -> None:
+    with IndexWriter(str(docs_dir)) as writer:
+        for story in stories:
+            writer.add(story)
+
+
+def titles(body: bytes):
+    return [result['title'] for result in json.loads(body)['results']]
+
+
+@pytest.fixture
+def service(tmp_path):
+    write_docs(tmp_path, STORIES)
+    service = SearchService(str(tmp_path), cache_size=4, check_interval=0)
+    yield service
+    service.engine.index.close()
+
+
+def test_lru_cache_evicts_the_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' is now the oldest
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_normalize_query():
+    assert normalize_query('  Protocol   TIME ') == 'protocol time'
+    assert normalize_query('"Standard\ttime"') == '"standard time"'
+
+
+def test_uses_the_binary_index_only_when_it_is_current(tmp_path, service):
+    assert type(service.engine.index).__name__ == 'MmapIndex'
+
+    os.utime(service.binary_path, ns=(0, 0))
+    older = SearchService(str(tmp_path))
+    assert type(older.engine.index).__name__ == 'InvertedIndex'
+
+
+def test_repeated_queries_come_from_the_cache(service):
+    body, cached = service.search('protocol', 10)
+    assert (titles(body), cached) == (['Shipping containers'], False)
+
+    again, cached = service.search('  PROTOCOL ', 10)
+    assert (again, cached) == (body, True)
+
+    # The limit is part of the key
+    assert service.search('protocol', 5)[1] is False
+
+
+def test_reload_swaps_in_the_new_index_and_clears_the_cache(tmp_path, service):
+    service.search('protocol', 10)
+    previous = service.engine.index
+    closed = []
+    previous.close = lambda: closed.append(True)
+
+    write_docs(tmp_path, STORIES + [NEW_STORY])
+    service._reload(service._file_signature())
+
+    body, cached = service.search('protocol', 10)
+    assert (sorted(titles(body)), cached) == (['Protocol bells', 'Shipping containers'], False)
+    assert closed == [True]
+
+
+def test_replaced_index_is_closed_by_its_last_search(tmp_path, service):
+    engine = service.engine
+    closed = []
+    engine.index.close = lambda: closed.append(True)
+    service._readers[engine] += 1  # A search still running on it
+
+    write_docs(tmp_path, STORIES + [NEW_STORY])
+    service._reload(service._file_signature())
+    assert closed == []
+
+    service._release(engine)
+    assert closed == [True]
+    assert engine not in service._readers
+
+
+def test_failed_reload_keeps_the_previous_index(tmp_path, service):
+    engine = service.engine
+    write_docs(tmp_path, STORIES + [NEW_STORY])
+
+    # Caught mid-write: the new binary index is cut short
+    path = tmp_path / 'search-index.bin'
+    path.write_bytes(path.read_bytes()[:path.stat().st_size // 2])
+    service._reload(service._file_signature())
+
+    assert service.engine is engine
+    assert not service._reloading  # The next check tries again
+    service.check_interval = 60
+    assert titles(service.search('protocol', 10)[0]) == ['Shipping containers']
+
+
+def test_changed_files_trigger_a_background_reload(tmp_path, service):
+    started = threading.Event()
+    service._reload = lambda signature: started.set()
+
+    service.search('protocol', 10)
+    assert not started.is_set()  # Nothing changed yet
+
+    write_docs(tmp_path, STORIES + [NEW_STORY])
+    service.search('protocol', 10)
+    assert started.wait(5)
@@ -0,0 +1,73 @@
+"""Tests that term_matrix.py tokenizes exactly like the word cloud's regex"""
+
+import random
+import re
+from collections import Counter
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from term_matrix import PACKED_LETTERS, TermMatrix  # noqa: E402
+
+WORD_RE = re.compile(r'\b[a-z]{3,}\b')
+
+TEXTS = [
+    'The quick brown fox jumps over the lazy dog.',
+    'ab abc abcd, under_score snake_case x2y abc9 9abc ABC Abc',
+    'café naïve résumé Ünïcode straße ﬁnance İstanbul',  # Non-ASCII letters touching ASCII runs
+    'emoji🙂abc abc🙂 日本語abc abc日本語 ½abc abc²',
+    'internationalization internationalizations antidisestablishmentarianism twelveletter',
+    '',
+    'tabs\tand\nnewlines\r\nbetween words and separators',
+]
+
+
+def regex_words(text: str):
+    return WORD_RE.findall(text.lower())
+
+
+def matrix_words(matrix: TermMatrix, story: int):
+    ids = matrix.term_ids[matrix.offsets[story]:matrix.offsets[story + 1]]
+    return [matrix.terms[i] for i in ids.tolist()]
+
+
+def test_same_words_as_the_regex():
+    matrix = TermMatrix.from_texts(TEXTS)
+
+    assert len(matrix) == len(TEXTS)
+    for i, text in enumerate(TEXTS):
+        assert matrix_words(matrix, i) == regex_words(text)
+
+
+def test_random_text_matches_the_regex():
+    rng = random.Random(0)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz' * 4 + 'ABC 0_.,-\n' * 3 + 'éßüİ日🙂́'
+    texts = [''.join(rng.choice(alphabet) for _ in range(rng.randrange(300))) for _ in range(200)]
+
+    # Small batches so words and stories are split across np.unique calls
+    matrix = TermMatrix.from_texts(texts, batch_chars=500)
+    for i, text in enumerate(texts):
+        assert matrix_words(matrix, i) == regex_words(text)
+
+
+def test_long_words_are_kept_whole():
+    words = ['a' * PACKED_LETTERS, 'a' * (PACKED_LETTERS + 1), 'b' * 40, 'a' * (PACKED_LETTERS + 1)]
+    matrix = TermMatrix.from_texts([' '.join(words)])
+
+    assert matrix_words(matrix, 0) == words
+    assert len(matrix.terms) == 3
+
+
+def test_counts_and_ranking_match_counter():
+    corpus = [text * 3 for text in TEXTS] + ['fox dog dog cat cat']
+    expected = Counter()
+    for text in corpus:
+        expected.update(regex_words(text))
+
+    matrix = TermMatrix.from_texts(corpus)
+    assert dict(zip(matrix.terms, matrix.counts().tolist())) == dict(expected)
+    assert matrix.most_common(10, exclude={'the'}) == [
+        (word, count) for word, count in expected.most_common() if word != 'the'
+    ][:10]
+    assert matrix.document_frequency()[matrix.vocabulary['dog']] == 2